@@ -0,0 +1,8 @@
+"""
+Micro-benchmarks for the hot paths. Run from the src directory, e.g.
+
+	python -m benchmarks.bench_report_decode
+
+benchmarks.suite runs the whole controller pipeline for 1 to 32 fake
+controllers and can save its results as JSON for comparison.
+"""
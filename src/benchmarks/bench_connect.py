@@ -0,0 +1,50 @@
+"""
+Time to construct a JoyCon with a cold and a warm calibration cache. The fake
+controller answers each subcommand after a simulated Bluetooth round trip.
+"""
+
+import sys, tempfile, time
+from pathlib import Path
+
+from pyjoycon import CalibrationCache
+
+from tests.fakes import FakeJoyCon, FakeJoyConDevice
+
+LATENCIES = (0.0, 0.008, 0.015, 0.030)
+
+
+def connect(cache, latency):
+	device = FakeJoyConDevice(latency=latency)
+	start = time.perf_counter()
+	joycon = FakeJoyCon(device=device, threaded=False, calibration_cache=cache)
+	elapsed = time.perf_counter() - start
+	assert joycon.color_body == (0x32, 0x32, 0x32)
+	joycon._close()
+	return elapsed, joycon.device_info_cached
+
+
+def measure(latency, rounds=5):
+	cold = warm = 0.0
+	for _ in range(rounds):
+		with tempfile.TemporaryDirectory() as tmp:
+			path = Path(tmp) / "calibration_cache.json"
+			elapsed, cached = connect(CalibrationCache(path), latency)
+			assert not cached
+			cold += elapsed
+			# a new cache object, like after restarting
+			elapsed, cached = connect(CalibrationCache(path), latency)
+			assert cached
+			warm += elapsed
+	return cold / rounds, warm / rounds
+
+
+def main():
+	latencies = [float(a) / 1000 for a in sys.argv[1:]] or LATENCIES
+	print(f"{'round trip ms':>13} {'cold ms':>9} {'warm ms':>9}")
+	for latency in latencies:
+		cold, warm = measure(latency)
+		print(f"{latency * 1000:13.1f} {cold * 1000:9.2f} {warm * 1000:9.2f}")
+
+
+if __name__ == "__main__":
+	main()
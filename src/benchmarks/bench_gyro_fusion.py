@@ -0,0 +1,109 @@
+"""
+GyroTrackingJoyCon's fusion filters vs. the old angleAxis integration: time
+per report, and the orientation error on synthetic rotations whose answer
+is known, the streams of tests.motion. tests.test_gyro_fusion checks the
+errors stay within bounds.
+"""
+
+import timeit
+
+from glm import vec3, quat, angleAxis
+from pyjoycon.fusion import MadgwickFilter, MahonyFilter, rotate
+from pyjoycon.gyro import TIMER_TICK, REPORT_TICKS
+from pyjoycon.wrappers import GYRO_IN_RAD
+
+from tests.fakes import FakeGyroJoyCon
+from tests.motion import STREAMS, q_angle, synthesize, tumble, up, v_angle
+
+
+class LegacyGyroTracker:
+	"""The update hook GyroTrackingJoyCon had before the fusion filters"""
+
+	def __init__(self, joycon):
+		self.joycon = joycon
+		self.imu = joycon.imu_decoder(1, GYRO_IN_RAD, joycon._ime_yz_coeff)
+		self.direction_X = vec3(1, 0, 0)
+		self.direction_Y = vec3(0, 1, 0)
+		self.direction_Z = vec3(0, 0, 1)
+		self.direction_Q = quat()
+
+	def update(self):
+		v = self.imu.decode(self.joycon._input_report)
+		for i in (3, 9, 15):
+			gx, gy, gz = v[i], v[i + 1], v[i + 2]
+			rotation \
+				= angleAxis(gx * (-1/86), self.direction_X) \
+				* angleAxis(gy * (-1/86), self.direction_Y) \
+				* angleAxis(gz * (-1/86), self.direction_Z)
+
+			self.direction_X *= rotation
+			self.direction_Y *= rotation
+			self.direction_Z *= rotation
+			self.direction_Q *= rotation
+
+
+def accuracy():
+	nominal = [REPORT_TICKS * TIMER_TICK / 3] * 256
+	filters = {
+		"madgwick": lambda j: None,
+		"mahony": lambda j: setattr(j, "fusion", MahonyFilter()),
+		"madgwick, fixed 5 ms": lambda j: setattr(j, "_sample_dt", nominal),
+		"gyro only": lambda j: setattr(j, "fusion", MadgwickFilter(beta=0)),
+	}
+	print(f"{'stream':32} {'filter':22} {'error deg':>10} {'tilt deg':>10}")
+	for stream, options in STREAMS.items():
+		for name, setup in filters.items():
+			joycon = FakeGyroJoyCon(threaded=False)
+			setup(joycon)
+			reports, truth = synthesize(joycon, **options)
+			for report in reports:
+				joycon._input_report = report
+				joycon._gyro_update_hook(joycon)
+			error, tilt = q_angle(joycon.fusion.q, truth), v_angle(up(joycon.fusion.q), up(truth))
+			print(f"{stream:32} {name:22} {error:10.2f} {tilt:10.2f}")
+			joycon._close()
+
+		legacy_joycon = FakeGyroJoyCon(threaded=False)
+		legacy = LegacyGyroTracker(legacy_joycon)
+		for report in reports:
+			legacy_joycon._input_report = report
+			legacy.update()
+		error = v_angle(legacy.direction_X, rotate(truth, (1.0, 0.0, 0.0)))
+		print(f"{stream:32} {'legacy (direction)':22} {error:10.2f} {'':>10}")
+		legacy_joycon._close()
+
+
+def speed(number=20000):
+	joycon = FakeGyroJoyCon(threaded=False)
+	reports, _ = synthesize(joycon, 1, tumble)
+	reports = reports[:64]
+	mahony = FakeGyroJoyCon(threaded=False, fusion="mahony")
+	legacy = LegacyGyroTracker(FakeGyroJoyCon(threaded=False))
+
+	state = {"i": 0}
+
+	def next_report(j):
+		state["i"] = i = (state["i"] + 1) & 63
+		j._input_report = reports[i]
+
+	cases = {
+		"legacy angleAxis hook": lambda: (next_report(legacy.joycon), legacy.update()),
+		"madgwick hook": lambda: (next_report(joycon), joycon._gyro_update_hook(joycon)),
+		"mahony hook": lambda: (next_report(mahony), mahony._gyro_update_hook(mahony)),
+		"baseline (report swap only)": lambda: (next_report(joycon),),
+	}
+	for name, case in cases.items():
+		best = min(timeit.repeat(case, number=number, repeat=5))
+		print(f"{name:36} {best / number * 1e6:8.2f} us/report")
+	for j in (joycon, mahony, legacy.joycon):
+		j._close()
+
+
+def main():
+	accuracy()
+	print()
+	speed()
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,57 @@
+"""Batched ImuDecoder vs. nine get_gyro_*(i) calls per access"""
+
+import random, timeit
+
+from pyjoycon import PythonicJoyCon
+from pyjoycon.wrappers import GYRO_IN_RAD
+
+from tests.fakes import FakeJoyCon, make_report
+
+
+class FakePythonicJoyCon(FakeJoyCon, PythonicJoyCon):
+	pass
+
+
+def legacy_gyro_in_rad(j):
+	c = GYRO_IN_RAD
+	c2 = c * j._ime_yz_coeff
+	return [
+		(j.get_gyro_x(i) * c, j.get_gyro_y(i) * c2, j.get_gyro_z(i) * c2)
+		for i in range(3)
+	]
+
+
+def main(number=20000):
+	rnd = random.Random(2)
+	reports = [
+		make_report(timer=i, imu=[rnd.randrange(-32768, 32768) for _ in range(18)])
+		for i in range(64)
+	]
+	joycon = FakePythonicJoyCon()
+	decoder = joycon.imu_decoder(1, GYRO_IN_RAD, joycon._ime_yz_coeff)
+	for report in reports:
+		joycon._input_report = report
+		new = joycon.gyro_in_rad
+		for old_xyz, new_xyz in zip(legacy_gyro_in_rad(joycon), new):
+			assert all(abs(a - b) < 1e-9 for a, b in zip(old_xyz, new_xyz)), (old_xyz, new_xyz)
+
+	state = {"i": 0}
+
+	def next_report():
+		state["i"] = i = (state["i"] + 1) & 63
+		joycon._input_report = reports[i]
+
+	cases = {
+		"gyro_in_rad legacy getters": lambda: (next_report(), legacy_gyro_in_rad(joycon)),
+		"gyro_in_rad property": lambda: (next_report(), joycon.gyro_in_rad),
+		"ImuDecoder.decode (reused buffer)": lambda: (next_report(), decoder.decode(joycon._input_report)),
+		"baseline (report swap only)": lambda: (next_report(),),
+	}
+	for name, case in cases.items():
+		best = min(timeit.repeat(case, number=number, repeat=5))
+		print(f"{name:36} {best / number * 1e6:8.2f} us/report")
+	joycon._close()
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,81 @@
+"""
+Allocations made by JoyCon._read_input_report() per report for each backend,
+measured with tracemalloc, and the time to read and handle a report.
+
+The hid and hidapi packages are emulated by devices returning bytes or a list
+of ints like they do, all backends read from a socketpair instead of hardware.
+"""
+
+import time, tracemalloc
+
+from tests.fakes import (
+	FakeJoyCon, SocketHidDevice, SocketHidapiDevice, SocketHidrawDevice,
+	make_report, socket_device,
+)
+
+BACKENDS = {
+	"hidapi (list)": SocketHidapiDevice,
+	"hid (bytes)": SocketHidDevice,
+	"hidraw (readinto)": SocketHidrawDevice,
+}
+
+
+def _overhead(samples=1000):
+	"""what reading the tracemalloc counters itself shows up as"""
+	tracemalloc.start()
+	total = 0
+	for _ in range(samples):
+		tracemalloc.reset_peak()
+		before = tracemalloc.get_traced_memory()[0]
+		total += tracemalloc.get_traced_memory()[1] - before
+	tracemalloc.stop()
+	return total / samples
+
+
+def measure(device_class, reports=200, rounds=5, overhead=0.0):
+	device, peer = socket_device(device_class)
+	joycon = FakeJoyCon(device=device, threaded=False)
+	report = make_report()
+	read, handle = joycon._read_input_report, joycon._handle_input_report
+
+	transient = allocating = count = 0
+	elapsed = 0.0
+	for _ in range(rounds):
+		# allocations, per report
+		for _ in range(reports):
+			peer.send(report)
+		tracemalloc.start()
+		for _ in range(reports):
+			tracemalloc.reset_peak()
+			before = tracemalloc.get_traced_memory()[0]
+			data = read()
+			peak = tracemalloc.get_traced_memory()[1] - before - overhead
+			handle(data)
+			transient += peak
+			allocating += peak > 0
+			count += 1
+		tracemalloc.stop()
+
+		# speed, untraced
+		for _ in range(reports):
+			peer.send(report)
+		start = time.perf_counter()
+		for _ in range(reports):
+			handle(read())
+		elapsed += time.perf_counter() - start
+
+	joycon._close()
+	peer.close()
+	return transient / count, allocating / count, elapsed / count
+
+
+def main():
+	print(f"{'backend':20} {'bytes/report':>12} {'reports allocating':>19} {'us/report':>10}")
+	overhead = _overhead()
+	for name, device_class in BACKENDS.items():
+		transient, allocating, seconds = measure(device_class, overhead=overhead)
+		print(f"{name:20} {transient:12.1f} {allocating:18.0%} {seconds * 1e6:10.2f}")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,133 @@
+"""
+OSC input dispatch of VRChat-like traffic: pythonosc's Dispatcher vs. the
+exact-match OscInputDispatcher. Most messages are avatar parameters nobody
+handles, a few are rumble paths.
+
+Prints the cost per message, then the CPU time of the receiving event loop
+thread while messages arrive over loopback UDP at 1k and 10k msgs/sec. With
+the relay on, unhandled messages are forwarded to a local socket: re-encoded
+with SimpleUDPClient like before, or as received by RawRelay.
+"""
+
+import asyncio, random, socket, threading, time
+
+from pythonosc.dispatcher import Dispatcher
+from pythonosc.osc_message_builder import OscMessageBuilder
+from pythonosc.udp_client import SimpleUDPClient
+
+from oscin import OscInputDispatcher, OscInputProtocol
+from oscout import RawRelay, UdpFanout
+
+RUMBLE_PATHS = ["/avatar/parameters/joyconrumble1", "/avatar/parameters/RightEar_IsGrabbed"]
+RATES = (1000, 10000)
+
+
+def message(address, value):
+	builder = OscMessageBuilder(address=address)
+	builder.add_arg(value)
+	return builder.build().dgram
+
+
+def vrchat_traffic(count=2000, parameters=300, rumble_share=0.02, seed=5):
+	rnd = random.Random(seed)
+	names = [f"/avatar/parameters/Param{i}" for i in range(parameters)]
+	out = []
+	for _ in range(count):
+		if rnd.random() < rumble_share:
+			out.append(message(rnd.choice(RUMBLE_PATHS), rnd.random()))
+		else:
+			value = rnd.choice((rnd.random(), rnd.randrange(256), rnd.random() < 0.5))
+			out.append(message(rnd.choice(names), value))
+	return out
+
+
+def dispatchers(relay_port=None):
+	"""(name, dispatch function) with the mappings main.py makes"""
+	def rumble(address, *args):
+		pass
+
+	legacy = Dispatcher()
+	fast = OscInputDispatcher()
+	for path in RUMBLE_PATHS:
+		legacy.map(path, rumble)
+		fast.map(path, rumble)
+	if relay_port:
+		client = SimpleUDPClient("127.0.0.1", relay_port)
+		legacy.set_default_handler(lambda key, *vals: client.send_message(key, vals))
+		fast.set_raw_default_handler(RawRelay(UdpFanout().sink("127.0.0.1", relay_port)).forward)
+	return [("pythonosc", legacy.call_handlers_for_packet), ("exact match", fast.dispatch)]
+
+
+def cost_per_message(dispatch, traffic, rounds=20):
+	client = ("127.0.0.1", 9000)
+	start = time.perf_counter()
+	for _ in range(rounds):
+		for dgram in traffic:
+			dispatch(dgram, client)
+	return (time.perf_counter() - start) / (rounds * len(traffic))
+
+
+async def receive_at_rate(dispatch, traffic, rate, seconds=1.0):
+	"""CPU seconds the loop thread spends while `rate` msgs/sec arrive"""
+	loop = asyncio.get_running_loop()
+
+	class Adapter:
+		def __init__(self):
+			self.count = 0
+
+		def dispatch(self, data, addr):
+			self.count += 1
+			dispatch(data, addr)
+
+	adapter = Adapter()
+	transport, _ = await loop.create_datagram_endpoint(
+		lambda: OscInputProtocol(adapter), local_addr=("127.0.0.1", 0))
+	port = transport.get_extra_info("sockname")[1]
+	total = int(rate * seconds)
+
+	def sender():
+		sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+		start = time.perf_counter()
+		for i in range(total):
+			sock.sendto(traffic[i % len(traffic)], ("127.0.0.1", port))
+			if i % 10 == 9:  # paced in bursts of 10
+				delay = start + (i + 1) / rate - time.perf_counter()
+				if delay > 0:
+					time.sleep(delay)
+		sock.close()
+
+	thread = threading.Thread(target=sender)
+	cpu = time.thread_time()
+	thread.start()
+	while thread.is_alive():
+		await asyncio.sleep(0.01)
+	await asyncio.sleep(0.05)  # let the rest arrive
+	cpu = time.thread_time() - cpu
+	transport.close()
+	return cpu, adapter.count / total
+
+
+async def amain():
+	traffic = vrchat_traffic()
+	# where the relay sends to, nobody reads it
+	sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+	sink.bind(("127.0.0.1", 0))
+	for relay in (False, True):
+		print(f"relay {'on' if relay else 'off'}")
+		print(f"  {'dispatcher':12} {'us/msg':>7} " + " ".join(
+			f"{f'cpu@{rate // 1000}k/s':>10} {'received':>8}" for rate in RATES))
+		for name, dispatch in dispatchers(sink.getsockname()[1] if relay else None):
+			row = f"  {name:12} {cost_per_message(dispatch, traffic) * 1e6:7.2f} "
+			for rate in RATES:
+				cpu, received = await receive_at_rate(dispatch, traffic, rate)
+				row += f"{cpu * 100:9.1f}% {received:8.0%} "
+			print(row)
+	sink.close()
+
+
+def main():
+	asyncio.run(amain())
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,89 @@
+"""
+Cost on the sending thread of one controller value sent to VRChat and to
+relay targets: a SimpleUDPClient per destination like before, each
+encoding and sending itself, vs. one UdpFanout with a sink per
+destination and the message encoded once. One relay target is a port
+nobody listens on, one is a socket nobody reads.
+"""
+
+import socket, threading, time
+
+from pythonosc.udp_client import SimpleUDPClient
+
+from oscout import SinkGroup, UdpFanout
+
+MESSAGES = 50000
+
+
+def receiver():
+	"""A socket read by a thread, like VRChat, and its received count"""
+	sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+	sock.bind(("127.0.0.1", 0))
+	count = [0]
+
+	def run():
+		try:
+			while True:
+				sock.recv(2048)
+				count[0] += 1
+		except OSError:
+			pass
+
+	threading.Thread(target=run, daemon=True).start()
+	return sock, count
+
+
+def destinations():
+	"""(name, port) of VRChat and the relay targets"""
+	vrchat, count = receiver()
+	unread = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+	unread.bind(("127.0.0.1", 0))
+	closed = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+	closed.bind(("127.0.0.1", 0))
+	closed_port = closed.getsockname()[1]
+	closed.close()
+	ports = [vrchat.getsockname()[1], unread.getsockname()[1], closed_port]
+	return ports, count, (vrchat, unread)
+
+
+def run(send, count):
+	times = []
+	start = time.perf_counter()
+	for i in range(MESSAGES):
+		t = time.perf_counter()
+		send("/input/Horizontal", (i % 200) / 100.0 - 1.0)
+		times.append(time.perf_counter() - t)
+	elapsed = time.perf_counter() - start
+	time.sleep(0.3)  # let the receiver catch up
+	times.sort()
+	return elapsed / MESSAGES, times[len(times) // 2], times[int(len(times) * 0.999)], count[0] / MESSAGES
+
+
+def main():
+	print(f"{MESSAGES} messages to 3 destinations")
+	print(f"  {'output':22} {'us/msg':>7} {'p50 us':>7} {'p99.9 us':>9} {'vrchat got':>10}")
+
+	ports, count, keep = destinations()
+	clients = [SimpleUDPClient("127.0.0.1", port) for port in ports]
+
+	def legacy(address, value):
+		for client in clients:
+			try:
+				client.send_message(address, value)
+			except OSError:
+				pass
+
+	fanout = UdpFanout()
+	group = SinkGroup([fanout.sink("127.0.0.1", port) for port in ports])
+	for name, send in (("SimpleUDPClient each", legacy), ("UdpFanout", group.send_message)):
+		count[0] = 0
+		mean, p50, p999, received = run(send, count)
+		print(f"  {name:22} {mean * 1e6:7.2f} {p50 * 1e6:7.2f} {p999 * 1e6:9.2f} {received:10.0%}")
+	for sink in fanout.sinks:
+		print("  sink %s:%s" % sink.target, f"sent={sink.sent} dropped={sink.dropped} errors={sink.errors}")
+	for sock in keep:
+		sock.close()
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,98 @@
+"""Reports/sec of JoyConX's OSC output: getter loop vs. compiled plan"""
+
+import itertools, logging, random, time
+
+from oscplan import compile_osc_plan, report_sources
+
+from tests.fakes import FakeJoyCon, make_report
+
+log = logging.getLogger("VRCJOYCON")
+
+# config path -> JoyCon getter used by the old JoyConX.get_status_getters()
+LEGACY_GETTERS = {
+	"battery.level": "get_battery_level",
+	"buttons.up": "get_button_up",
+	"buttons.down": "get_button_down",
+	"buttons.l": "get_button_l",
+	"buttons.zl": "get_button_zl",
+	"buttons.sl": "get_button_left_sl",
+	"buttons.capture": "get_button_capture",
+	"buttons.l-stick": "get_button_l_stick",
+	"analog-sticks.horizontal": "get_stick_left_horizontal",
+	"analog-sticks.vertical": "get_stick_left_vertical",
+	"gyro.x": "get_gyro_x",
+}
+
+
+def remap(x):
+	return (x - 0.0) * 2.0 / 4096.0 - 1.0
+
+
+def legacy_run(osc_outputs, send):
+	"""the old JoyConX.on_update_thread"""
+	for data in osc_outputs:
+		(prev, osc_path, getter, mapper) = data
+		if mapper:
+			val = mapper(getter())
+		else:
+			val = getter()
+		if prev != val:
+			data[0] = val
+			log.debug(f"send {osc_path} <- {val}")
+			send(osc_path, val)
+
+
+def main(seconds=1.0):
+	rnd = random.Random(3)
+	reports = [
+		make_report(
+			timer=i,
+			buttons=rnd.getrandbits(24) if i % 8 == 0 else 0,
+			stick_left=(2048 + rnd.randrange(-40, 40), 2048 + rnd.randrange(-40, 40)),
+			imu=[rnd.randrange(-500, 500) for _ in range(18)],
+		)
+		for i in range(256)
+	]
+	joycon = FakeJoyCon()
+	sources = report_sources(joycon.is_left())
+	sent = [0]
+
+	def send(osc_path, val):
+		sent[0] += 1
+
+	button_paths = [path for path in LEGACY_GETTERS if path.startswith("buttons.")]
+	cases = [(count, list(itertools.islice(itertools.cycle(LEGACY_GETTERS), count))) for count in (10, 50, 200)]
+	cases.append((f"{len(button_paths)} button", button_paths))
+	for count, paths in cases:
+		mappers = [remap if path.startswith("analog") else None for path in paths]
+
+		legacy = [
+			[None, f"/out/{i}", getattr(joycon, LEGACY_GETTERS[path]), mapper]
+			for i, (path, mapper) in enumerate(zip(paths, mappers))
+		]
+
+		def legacy_case(report):
+			joycon._input_report = report
+			legacy_run(legacy, send)
+
+		plan = compile_osc_plan(
+			[(sources[path], f"/out/{i}", mapper) for i, (path, mapper) in enumerate(zip(paths, mappers))],
+			send,
+			joycon.imu_decoder,
+		)
+
+		for name, case in (("getter loop", legacy_case), ("compiled plan", plan)):
+			sent[0] = 0
+			n = 0
+			start = time.perf_counter()
+			while time.perf_counter() - start < seconds:
+				for report in reports:
+					case(report)
+				n += len(reports)
+			elapsed = time.perf_counter() - start
+			print(f"{count:>8} mappings  {name:14} {n / elapsed:10.0f} reports/s  ({sent[0] / n:.1f} sends/report)")
+	joycon._close()
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,109 @@
+"""Single-pass report decode vs. the per-field getters of JoyCon"""
+
+import random, timeit
+
+from tests.fakes import FakeJoyCon, make_report
+
+
+def legacy_status(j):
+	"""get_status() as it was built from one getter call per field"""
+	return {
+		"battery": {
+			"charging": j.get_battery_charging(),
+			"level": j.get_battery_level(),
+		},
+		"buttons": {
+			"right": {
+				"y": j.get_button_y(),
+				"x": j.get_button_x(),
+				"b": j.get_button_b(),
+				"a": j.get_button_a(),
+				"sr": j.get_button_right_sr(),
+				"sl": j.get_button_right_sl(),
+				"r": j.get_button_r(),
+				"zr": j.get_button_zr(),
+			},
+			"shared": {
+				"minus": j.get_button_minus(),
+				"plus": j.get_button_plus(),
+				"r-stick": j.get_button_r_stick(),
+				"l-stick": j.get_button_l_stick(),
+				"home": j.get_button_home(),
+				"capture": j.get_button_capture(),
+				"charging-grip": j.get_button_charging_grip(),
+			},
+			"left": {
+				"down": j.get_button_down(),
+				"up": j.get_button_up(),
+				"right": j.get_button_right(),
+				"left": j.get_button_left(),
+				"sr": j.get_button_left_sr(),
+				"sl": j.get_button_left_sl(),
+				"l": j.get_button_l(),
+				"zl": j.get_button_zl(),
+			}
+		},
+		"analog-sticks": {
+			"left": {
+				"horizontal": j.get_stick_left_horizontal(),
+				"vertical": j.get_stick_left_vertical(),
+			},
+			"right": {
+				"horizontal": j.get_stick_right_horizontal(),
+				"vertical": j.get_stick_right_vertical(),
+			},
+		},
+		"accel": {"x": j.get_accel_x(), "y": j.get_accel_y(), "z": j.get_accel_z()},
+		"gyro": {"x": j.get_gyro_x(), "y": j.get_gyro_y(), "z": j.get_gyro_z()},
+	}
+
+
+def legacy_fields(j):
+	"""every field of the report, one getter each"""
+	return (
+		j.get_battery_level(), j.get_button_a(), j.get_button_b(), j.get_button_home(),
+		j.get_stick_left_horizontal(), j.get_stick_left_vertical(),
+		[(j.get_accel_x(i), j.get_accel_y(i), j.get_accel_z(i)) for i in range(3)],
+		[(j.get_gyro_x(i), j.get_gyro_y(i), j.get_gyro_z(i)) for i in range(3)],
+	)
+
+
+def main(number=20000):
+	rnd = random.Random(1)
+	reports = [
+		make_report(
+			timer=i,
+			buttons=rnd.getrandbits(24),
+			stick_left=(rnd.randrange(4096), rnd.randrange(4096)),
+			imu=[rnd.randrange(-32768, 32768) for _ in range(18)],
+		)
+		for i in range(64)
+	]
+	joycon = FakeJoyCon(threaded=False)
+	for report in reports:
+		joycon._handle_input_report(report)
+		assert legacy_status(joycon) == joycon.get_status(), "decoders disagree"
+
+	state = {"i": 0}
+
+	def next_report():
+		# handled like the reader does, so the sequence number advances and
+		# get_report() decodes once per report instead of hitting its cache
+		state["i"] = i = (state["i"] + 1) & 63
+		joycon._handle_input_report(reports[i])
+
+	cases = {
+		"get_status() legacy getters": lambda: (next_report(), legacy_status(joycon)),
+		"get_status() snapshot": lambda: (next_report(), joycon.get_status()),
+		"all fields legacy getters": lambda: (next_report(), legacy_fields(joycon)),
+		"all fields get_report()": lambda: (next_report(), joycon.get_report()),
+		"baseline (report handling only)": lambda: (next_report(),),
+	}
+	for name, case in cases.items():
+		best = min(timeit.repeat(case, number=number, repeat=5))
+		print(f"{name:32} {best / number * 1e6:8.2f} us/report")
+	joycon._close()
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,63 @@
+"""
+Cost of the always-on per controller counters: handling a report (decode,
+OSC mapping, queueing for the sender thread) with JoyConX's update hook
+as it is, and as it was before the counters. Also checks the estimate of
+dropped reports on a stream with gaps.
+"""
+
+import logging, sys, time
+
+from stats import ControllerStats
+
+from .suite import LoopbackReceiver, Pipeline, reports
+
+ROUNDS = 400
+
+
+def uncounted_update(self):
+	"""JoyConX.on_update_thread before the counters"""
+	changes = self._osc_changes
+	self.osc_plan(self._input_report)
+	if changes:
+		self._osc_stage.put(self.osc_scheduler, tuple(changes))
+		changes.clear()
+
+
+def per_report(handle, feed):
+	start = time.perf_counter()
+	for _ in range(ROUNDS):
+		for report in feed:
+			handle(report)
+	return (time.perf_counter() - start) / (ROUNDS * len(feed))
+
+
+def main():
+	sys.argv = sys.argv[:1]
+	import main as vrcjoycon
+	logging.getLogger("VRCJOYCON").setLevel(logging.WARNING)
+	pipeline = Pipeline(vrcjoycon, LoopbackReceiver(), 0.0)
+	feed = reports()
+
+	joycon = pipeline.controller(0, threaded=False)
+	handle = joycon._handle_input_report
+	joycon._osc_stage = vrcjoycon.osc_stage
+	counted = uncounted = 0.0
+	for _ in range(3):  # alternating, against drifting clocks
+		joycon._input_hooks[0] = lambda _: joycon.on_update_thread()
+		counted += per_report(handle, feed)
+		joycon._input_hooks[0] = lambda _: uncounted_update(joycon)
+		uncounted += per_report(handle, feed)
+	pipeline.close([joycon])
+
+	print(f"handling a report, counters off {uncounted / 3 * 1e6:6.2f} us")
+	print(f"handling a report, counters on  {counted / 3 * 1e6:6.2f} us ({counted / uncounted - 1:+.1%})")
+
+	stats = ControllerStats()
+	for i, report in enumerate(feed * 4):
+		if i % 50 != 49:
+			stats.report(report[1])
+	print(f"dropped reports seen {stats.dropped}, {len(feed) * 4 // 50} were dropped")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,335 @@
+"""
+End to end benchmark of main.py's controller pipeline without hardware:
+FakeJoyConDevices feed 0x30 reports to JoyConX objects built from the
+[osc_output.N] sections of config.ini, their OSC output goes to a loopback
+UDP socket. For each number of controllers it measures
+
+	reports/sec         reports handled by all controllers together
+	latency             from feeding a report to the end of its update hooks
+	                    (decoded, remapped and queued for the sender thread)
+	OSC datagrams/sec   received by the loopback socket
+	osc_rumble          cost of one rumble message through the OSC input
+
+and once, with tracemalloc, the bytes allocated per handled report and per
+rumble message. Reports are fed at the controller's 15 ms cadence, or with
+--cadence 0 as fast as they are read. Results can be saved as JSON and
+compared with an earlier run:
+
+	python -m benchmarks.suite --json new.json --compare old.json
+"""
+
+import argparse, asyncio, json, logging, platform, random, socket, sys, threading, time, tracemalloc
+
+from pythonosc.osc_message_builder import OscMessageBuilder
+
+from pyjoycon.constants import JOYCON_VENDOR_ID, JOYCON_L_PRODUCT_ID, JOYCON_R_PRODUCT_ID
+
+from tests.fakes import FakeJoyCon, FakeJoyConDevice, make_report
+
+CONTROLLER_COUNTS = (1, 2, 8, 32)
+CADENCE = 0.015
+# reports waiting in a device at full speed
+FULL_SPEED_DEPTH = 4
+
+
+def reports(seed=3):
+	"""256 reports, the index is the timer byte. Sticks jitter, buttons change now and then."""
+	rnd = random.Random(seed)
+	return [
+		make_report(
+			timer=i,
+			buttons=rnd.getrandbits(24) if i % 8 == 0 else 0,
+			stick_left=(2048 + rnd.randrange(-40, 40), 2048 + rnd.randrange(-40, 40)),
+			stick_right=(2048 + rnd.randrange(-40, 40), 2048 + rnd.randrange(-40, 40)),
+			imu=[rnd.randrange(-500, 500) for _ in range(18)],
+		)
+		for i in range(256)
+	]
+
+
+def percentile(values, fraction):
+	return values[min(int(len(values) * fraction), len(values) - 1)] if values else 0.0
+
+
+class LoopbackReceiver:
+	"""A UDP socket read by a thread, counting datagrams like VRChat would receive them"""
+
+	def __init__(self):
+		self.received = 0
+		self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+		self.sock.bind(("127.0.0.1", 0))
+		self.port = self.sock.getsockname()[1]
+		threading.Thread(target=self._run, daemon=True, name="LoopbackReceiver").start()
+
+	def _run(self):
+		try:
+			while True:
+				self.sock.recv(2048)
+				self.received += 1
+		except OSError:
+			pass
+
+
+class Pipeline:
+	"""main.py's module state with its OSC output going to `receiver`"""
+
+	def __init__(self, main, receiver, frequency, tracer=None):
+		self.main = main
+		main.tracer = tracer
+		main.osc_output = main.osc_fanout.sink("127.0.0.1", receiver.port, main.osc_sink_queue_size)
+		main.osc_frequency = frequency
+		main.osc_bundle = False
+		main.osc_stage = main.OscOutputStage()
+		if tracer:
+			main.osc_stage.on_sent = tracer.batch_sent
+		main.osc_stage.start()
+		main.listen_ip, main.listen_port = "127.0.0.1", 0
+		main.relay_port = -1
+		# binds the OSC input, the loop never runs: messages are dispatched directly
+		loop = asyncio.new_event_loop()
+		loop.run_until_complete(main.startOSC(loop))
+		self.rumble_paths = {
+			id: paths.splitlines()[0] for id, paths in main.config["osc.rumble"].items()
+		}
+
+	def controller(self, index, threaded=True):
+		"""a JoyConX like joycon_worker makes for controller `index`, ids 1, 3, ... are left"""
+		main = self.main
+		left = index % 2 == 0
+		section = "osc_output.%d" % (1 if left else 2)
+
+		class BenchJoyConX(FakeJoyCon, main.JoyConX):
+			pass
+
+		device = FakeJoyConDevice()
+		joycon = BenchJoyConX(
+			main.config[section] if section in main.config else None,
+			JOYCON_VENDOR_ID, JOYCON_L_PRODUCT_ID if left else JOYCON_R_PRODUCT_ID, "bench-%d" % index,
+			device=device, threaded=threaded, output_gap=main.output_gap, controller_id=str(index + 1),
+		)
+		id = str(index + 1)
+		joycon.rumble_mixer = main.RumbleMixer(main.rumble_combine, main.rumble_attack, main.rumble_decay)
+		main.joycons[id] = joycon
+		return joycon
+
+	def close(self, joycons):
+		for id, joycon in list(self.main.joycons.items()):
+			if joycon in joycons:
+				del self.main.joycons[id]
+		for joycon in joycons:
+			if joycon.osc_scheduler:
+				self.main.osc_stage.remove_scheduler(joycon.osc_scheduler)
+			joycon._close()
+
+
+def rumble_messages(pipeline, count):
+	out = []
+	paths = [path for id, path in sorted(pipeline.rumble_paths.items()) if int(id) <= count] \
+		or list(pipeline.rumble_paths.values())[:1]
+	for i in range(64):
+		builder = OscMessageBuilder(address=paths[i % len(paths)])
+		builder.add_arg((i % 8) / 7.0)
+		out.append(builder.build().dgram)
+	return out
+
+
+def measure_rumble(pipeline, count, rounds=50):
+	"""seconds per rumble message through OscInputDispatcher and osc_rumble"""
+	dispatch = pipeline.main.osc_input.dispatch
+	messages = rumble_messages(pipeline, count)
+	start = time.perf_counter()
+	for _ in range(rounds):
+		for dgram in messages:
+			dispatch(dgram, None)
+	return (time.perf_counter() - start) / (rounds * len(messages))
+
+
+def run(pipeline, receiver, count, cadence, seconds):
+	feed = reports()
+	joycons = [pipeline.controller(i) for i in range(count)]
+	fed = [[0.0] * 256 for _ in joycons]
+	latencies = [[] for _ in joycons]
+
+	for joycon, fed_at, samples in zip(joycons, fed, latencies):
+		def hook(joycon, fed_at=fed_at, samples=samples):
+			samples.append(time.perf_counter() - fed_at[joycon._input_report[1]])
+		joycon.register_update_hook(hook)
+
+	devices = [joycon.fake_device for joycon in joycons]
+	stop = threading.Event()
+
+	def feeder():
+		i = 0
+		next_due = time.perf_counter()
+		while not stop.is_set():
+			if cadence:
+				next_due += cadence
+				delay = next_due - time.perf_counter()
+				if delay > 0:
+					time.sleep(delay)
+			elif all(device.pending >= FULL_SPEED_DEPTH for device in devices):
+				time.sleep(0)
+				continue
+			report = feed[i & 0xFF]
+			for device, fed_at in zip(devices, fed):
+				if not cadence and device.pending >= FULL_SPEED_DEPTH:
+					continue
+				fed_at[i & 0xFF] = time.perf_counter()
+				device.feed(report)
+			i += 1
+
+	thread = threading.Thread(target=feeder, name="Feeder")
+	stage = pipeline.main.osc_stage
+	coalesced = stage.coalesced
+	received = receiver.received
+	thread.start()
+	start = time.perf_counter()
+	time.sleep(seconds)
+	stop.set()
+	thread.join()
+	elapsed = time.perf_counter() - start
+	time.sleep(0.1)  # let the sender thread and the receiver catch up
+
+	samples = sorted(sample for per_controller in latencies for sample in per_controller)
+	result = {
+		"controllers": count,
+		"reports_per_sec": len(samples) / elapsed,
+		"latency_us": {
+			name: percentile(samples, fraction) * 1e6
+			for name, fraction in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("max", 1.0))
+		},
+		"osc_datagrams_per_sec": (receiver.received - received) / elapsed,
+		"osc_values_coalesced": stage.coalesced - coalesced,
+		"osc_rumble_us": measure_rumble(pipeline, count) * 1e6,
+	}
+	pipeline.close(joycons)
+	return result
+
+
+def _overhead(samples=1000):
+	"""what reading the tracemalloc counters itself shows up as"""
+	tracemalloc.start()
+	total = 0
+	for _ in range(samples):
+		tracemalloc.reset_peak()
+		before = tracemalloc.get_traced_memory()[0]
+		total += tracemalloc.get_traced_memory()[1] - before
+	tracemalloc.stop()
+	return total / samples
+
+
+def measure_allocations(pipeline, count=2000):
+	"""bytes allocated per report by the update hooks and per rumble message"""
+	main = pipeline.main
+	stage = main.osc_stage
+	# not started: nothing is sent meanwhile, put() still queues like it would
+	main.osc_stage = main.OscOutputStage()
+	joycon = pipeline.controller(0, threaded=False)
+	handle = joycon._handle_input_report
+	dispatch = main.osc_input.dispatch
+	feed = reports()
+	messages = rumble_messages(pipeline, 1)
+	overhead = _overhead()
+
+	def traced(call, items):
+		total = allocating = 0
+		tracemalloc.start()
+		for i in range(count):
+			item = items[i % len(items)]
+			tracemalloc.reset_peak()
+			before = tracemalloc.get_traced_memory()[0]
+			call(item)
+			peak = tracemalloc.get_traced_memory()[1] - before - overhead
+			total += max(peak, 0)
+			allocating += peak > 0
+		tracemalloc.stop()
+		return {"bytes": total / count, "allocating": allocating / count}
+
+	result = {
+		"report": traced(handle, feed),
+		"osc_rumble": traced(lambda dgram: dispatch(dgram, None), messages),
+	}
+	pipeline.close([joycon])
+	main.osc_stage = stage
+	return result
+
+
+def compare(results, baseline):
+	"""prints new / old for the metrics of both runs"""
+	old = {run["controllers"]: run for run in baseline["runs"]}
+	print(f"compared with {baseline.get('saved', 'baseline')} (new / old)")
+	for run in results["runs"]:
+		before = old.get(run["controllers"])
+		if not before:
+			continue
+		print(f"  {run['controllers']:>3} controllers  reports/s {run['reports_per_sec'] / max(before['reports_per_sec'], 1e-9):5.2f}"
+			f"  p99 {run['latency_us']['p99'] / max(before['latency_us']['p99'], 1e-9):5.2f}"
+			f"  datagrams/s {run['osc_datagrams_per_sec'] / max(before['osc_datagrams_per_sec'], 1e-9):5.2f}"
+			f"  osc_rumble {run['osc_rumble_us'] / max(before['osc_rumble_us'], 1e-9):5.2f}")
+	for name, now in results["allocations"].items():
+		before = baseline.get("allocations", {}).get(name)
+		if before:
+			print(f"  {name:12} bytes {now['bytes']:.0f} vs {before['bytes']:.0f}")
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0], prog="python -m benchmarks.suite")
+	parser.add_argument("--controllers", type=int, nargs="+", default=CONTROLLER_COUNTS)
+	parser.add_argument("--cadence", type=float, default=CADENCE, help="seconds between reports, 0 = full speed")
+	parser.add_argument("--seconds", type=float, default=3.0, help="per controller count")
+	parser.add_argument("--frequency", type=float, default=0.0, help="[osc_output] frequency, 0 sends every change")
+	parser.add_argument("--json", help="save the results here")
+	parser.add_argument("--compare", help="results saved by an earlier run")
+	parser.add_argument("--trace", action="store_true", help="also print the latency histograms of main.py's tracing")
+	args = parser.parse_args()
+
+	# main.py parses its own command line when imported
+	sys.argv = sys.argv[:1]
+	import main as vrcjoycon
+	logging.getLogger("VRCJOYCON").setLevel(logging.WARNING)
+
+	receiver = LoopbackReceiver()
+	tracer = vrcjoycon.LatencyTracer() if args.trace else None
+	pipeline = Pipeline(vrcjoycon, receiver, args.frequency, tracer)
+	# readers end with a TimeoutError when their fake device is closed
+	excepthook = threading.excepthook
+	threading.excepthook = lambda hook_args: None if hook_args.exc_type is TimeoutError else excepthook(hook_args)
+
+	results = {
+		"saved": time.strftime("%Y-%m-%d %H:%M:%S"),
+		"python": platform.python_version(),
+		"platform": platform.platform(),
+		"cadence": args.cadence,
+		"frequency": args.frequency,
+		"runs": [],
+	}
+	mode = "full speed" if not args.cadence else f"a report every {args.cadence * 1000:g} ms"
+	print(f"{mode}, {args.seconds:g} s per run")
+	print(f"{'controllers':>11} {'reports/s':>10} {'p50 us':>8} {'p90 us':>8} {'p99 us':>8} {'max us':>8}"
+		f" {'datagrams/s':>11} {'coalesced':>9} {'rumble us':>9}")
+	for count in args.controllers:
+		run_result = run(pipeline, receiver, count, args.cadence, args.seconds)
+		results["runs"].append(run_result)
+		latency = run_result["latency_us"]
+		print(f"{count:>11} {run_result['reports_per_sec']:10.0f} {latency['p50']:8.0f} {latency['p90']:8.0f}"
+			f" {latency['p99']:8.0f} {latency['max']:8.0f} {run_result['osc_datagrams_per_sec']:11.0f}"
+			f" {run_result['osc_values_coalesced']:9} {run_result['osc_rumble_us']:9.2f}")
+
+	if tracer:
+		print(tracer.summary())
+		# the allocations are measured untraced
+		vrcjoycon.tracer = None
+	results["allocations"] = measure_allocations(pipeline)
+	for name, allocations in results["allocations"].items():
+		print(f"allocated per {name}: {allocations['bytes']:.0f} bytes, {allocations['allocating']:.0%} allocating")
+
+	if args.json:
+		with open(args.json, "w") as f:
+			json.dump(results, f, indent=1)
+	if args.compare:
+		with open(args.compare) as f:
+			compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,126 @@
+"""Finding controllers: one enumeration per tick, shared by all workers"""
+
+import asyncio, logging, socket
+
+log = logging.getLogger("VRCJOYCON")
+
+NETLINK_KOBJECT_UEVENT = 15
+# uevents come in bursts and udev still has to set permissions on the node
+UEVENT_SETTLE = 0.3
+
+
+def open_uevent_socket():
+	"""Netlink socket receiving kernel uevents (Linux), or None"""
+	if not hasattr(socket, "AF_NETLINK"):
+		return None
+	try:
+		sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT)
+	except OSError as e:
+		log.debug("No uevent notifications, polling for controllers: %s", e)
+		return None
+	try:
+		sock.bind((0, 1))  # multicast group 1: kernel events
+		sock.setblocking(False)
+	except OSError as e:
+		log.debug("No uevent notifications, polling for controllers: %s", e)
+		sock.close()
+		return None
+	return sock
+
+
+class DeviceDiscovery:
+	"""
+	Enumerates devices once per tick for everyone waiting, instead of each
+	worker enumerating on its own. Workers await wait_for(serial), discovery
+	mode registers a listener getting every enumeration result. Serials
+	match case-insensitively, like find_hidraw_path does.
+
+	Enumerates every `interval` seconds while anyone waits. Where hidraw
+	uevents can be received (Linux) it enumerates when one arrives instead,
+	and only every `notify_interval` seconds in case one got lost.
+	"""
+
+	def __init__(self, enumerate, interval=0.4421, notify_interval=5.0):
+		self.enumerate = enumerate
+		self.interval = interval
+		self.notify_interval = notify_interval
+		self.enumerations = 0
+		self.uevents = 0
+		self.present = []  # ids seen by the last enumeration
+		self._waiters = {}  # lower case serial: [futures]
+		self._listeners = []
+		self._wakeup = asyncio.Event()
+		self._uevent_socket = None
+
+	def wait_for(self, serial) -> asyncio.Future:
+		"""Resolves to `(vendor_id, product_id, serial)` once it is found"""
+		future = asyncio.get_running_loop().create_future()
+		self._waiters.setdefault(serial.lower(), []).append(future)
+		self._wakeup.set()
+		return future
+
+	def add_listener(self, callback):
+		"""`callback(ids)` is called with the result of every enumeration"""
+		self._listeners.append(callback)
+		self._wakeup.set()
+
+	def remove_listener(self, callback):
+		self._listeners.remove(callback)
+
+	def _scan(self):
+		ids = self.enumerate()
+		self.enumerations += 1
+		self.present = ids
+		for id in ids:
+			for future in self._waiters.pop((id[2] or "").lower(), ()):
+				if not future.done():
+					future.set_result(id)
+		# forget workers which stopped waiting
+		self._waiters = {
+			serial: futures for serial, futures in
+			((s, [f for f in fs if not f.done()]) for s, fs in self._waiters.items())
+			if futures
+		}
+		for callback in self._listeners:
+			callback(ids)
+
+	def _on_uevent(self):
+		changed = False
+		try:
+			while True:
+				changed |= b"SUBSYSTEM=hidraw" in self._uevent_socket.recv(8192)
+		except BlockingIOError:
+			pass
+		except OSError as e:  # e.g. ENOBUFS after an overflow, rescan anyway
+			log.debug("uevent socket: %s", e)
+			changed = True
+		if changed:
+			self.uevents += 1
+			asyncio.get_running_loop().call_later(UEVENT_SETTLE, self._wakeup.set)
+
+	async def run(self):
+		loop = asyncio.get_running_loop()
+		self._uevent_socket = open_uevent_socket()
+		if self._uevent_socket:
+			loop.add_reader(self._uevent_socket.fileno(), self._on_uevent)
+		interval = self.notify_interval if self._uevent_socket else self.interval
+		try:
+			while True:
+				waiting = bool(self._waiters or self._listeners)
+				if waiting:
+					try:
+						self._scan()
+					except Exception:
+						# e.g. a transient hid or sysfs error, every worker waits on this task
+						log.exception("Device enumeration failed, retrying")
+					waiting = bool(self._waiters or self._listeners)
+				try:
+					await asyncio.wait_for(self._wakeup.wait(), interval if waiting else None)
+				except asyncio.TimeoutError:
+					pass
+				self._wakeup.clear()
+		finally:
+			if self._uevent_socket:
+				loop.remove_reader(self._uevent_socket.fileno())
+				self._uevent_socket.close()
+				self._uevent_socket = None
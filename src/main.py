@@ -42,15 +42,20 @@ else:
 	print("\33]0;ChilloutVR/VRChat Joy-Con OSC Connector\a")
 
 
-from pyjoycon import JoyCon, get_device_ids, joycon
-from pythonosc import dispatcher, osc_server
-from pythonosc.udp_client import SimpleUDPClient
+from pyjoycon import JoyCon, CalibrationCache, ReportRecorder, get_device_ids, joycon
+from pyjoycon import hidraw
+from discovery import DeviceDiscovery
+from oscplan import compile_osc_plan, report_sources
+from oscout import CountingSink, OscOutputStage, OscScheduler, RawRelay, ReportBundler, SinkGroup, UdpFanout, MAX_DATAGRAM_SIZE
+from rumblemix import RumbleMixer, COMBINE_RULES
+from oscin import OscInputDispatcher, OscInputProtocol
+from stats import ControllerStats, publish_osc, write_prometheus
+from tracing import LatencyTracer
+from pythonosc.osc_message import OscMessage
 
-from functools import reduce
-import operator
 
 # from pprint import pprint
-import asyncio, argparse, sys, typing, functools
+import asyncio, argparse, sys, typing, functools, time
 
 # from contextlib import suppress
 # from asynccmd import Cmd
@@ -60,14 +65,57 @@ from aioconsole import AsynchronousCli
 
 autorestart = config.getboolean("main", "autorestart")
 notele = config.getboolean("main", "notele")
+hid_backend = config.get("main", "hid_backend", fallback="") or None
+# read all controllers from the event loop instead of one thread each (hidraw only)
+asyncio_input = hid_backend == "hidraw" and config.getboolean("main", "asyncio_input", fallback=False)
+# colors and IMU calibration per serial, relative to config.ini
+calibration_cache_path = config.get("main", "calibration_cache", fallback="")
+calibration_cache = CalibrationCache(configpath.parent / calibration_cache_path) if calibration_cache_path else None
+revalidate_calibration = config.getboolean("main", "revalidate_calibration", fallback=True)
+# minimum seconds between two output reports to a controller
+output_gap = config.getfloat("main", "output_gap", fallback=0.015)
+# latency histograms of every stage from HID read to UDP send and back, see do_trace
+tracer = LatencyTracer() if config.getboolean("main", "trace_latency", fallback=False) else None
 log.debug("Debug: %s", debug)
 log.debug("verbose: %s", verbose)
 log.debug("autorestart: %s", autorestart)
 log.debug("notele: %s", notele)
+log.debug("hid_backend: %s asyncio_input: %s", hid_backend, asyncio_input)
 listen_ip = config["listen"]["ip"]
 listen_port = int(config["listen"]["port"])
 
-osc_output = SimpleUDPClient(config["osc_output"]["ip"],int(config["osc_output"]["port"])) if config["osc_output"]["enabled"] else None
+# one socket for all OSC output: controller events and relays
+osc_fanout = UdpFanout()
+osc_sink_queue_size = config.getint("osc_output","sink_queue_size",fallback=256)
+osc_output = None
+if config.getboolean("osc_output","enabled"):
+	osc_output = osc_fanout.sink(config["osc_output"]["ip"],config["osc_output"]["port"],osc_sink_queue_size)
+	also = config.get("osc_output","also",fallback="").split()
+	if also:
+		osc_output = SinkGroup([osc_output]+[osc_fanout.sink(*dest.rsplit(":",1),osc_sink_queue_size) for dest in also])
+osc_bundle = config.getboolean("osc_output","bundle",fallback=False)
+osc_bundle_max_size = config.getint("osc_output","bundle_max_size",fallback=MAX_DATAGRAM_SIZE)
+osc_frequency = config.getfloat("osc_output","frequency",fallback=0)
+osc_buttons_immediate = config.getboolean("osc_output","buttons_immediate",fallback=True)
+osc_stage = OscOutputStage(config.getint("osc_output","queue_size",fallback=256)) if osc_output else None
+if osc_stage and tracer:
+	osc_stage.on_sent = tracer.batch_sent
+
+discovery = DeviceDiscovery(hidraw.get_device_ids if hid_backend == "hidraw" else get_device_ids)
+
+rumble_combine = config.get("rumble","combine",fallback="max")
+if rumble_combine not in COMBINE_RULES:
+	log.error("Unknown [rumble] combine = %s, using max", rumble_combine)
+	rumble_combine = "max"
+rumble_attack = config.getfloat("rumble","attack",fallback=0)
+rumble_decay = config.getfloat("rumble","decay",fallback=0)
+# seconds between two rumble updates, bounds the HID write rate
+rumble_tick = config.getfloat("rumble","tick",fallback=0.05)
+
+# publishing of the per controller counters, see do_stats
+stats_interval = config.getfloat("stats","interval",fallback=0)
+stats_osc = config.getboolean("stats","osc",fallback=False)
+stats_prometheus_file = config.get("stats","prometheus_file",fallback="")
 
 relay = config["relay"]
 relay_port = int(relay["port"])
@@ -189,25 +237,47 @@ REMAPPERS = [map_toggle,map_float_remap,map_int_remap,map_float,map_int,map_bool
 
 class JoyConX(JoyCon):
 
-	current_rumble = False
+	rumble_mixer: RumbleMixer = None
 	rumble_event = None
-	status_getters = False
-
-	def __init__(self, osc_outputs, *identifiers):
-		super().__init__(*identifiers)
+	osc_plan = None
+	osc_bundler = None
+	osc_scheduler = None
+	osc_counter = None
+	# monotonic receive time of the earliest rumble change not written yet, when tracing
+	rumble_received = None
+	rumble_traced = None
+
+	def __init__(self, osc_outputs, *identifiers, stats=None, controller_id=None, **kwargs):
+		self.controller_id = controller_id
+		super().__init__(*identifiers, **kwargs)
 		self.last_gyro_x = 0
 		self.last_a = 0
 		self.rumble_event = asyncio.Event()
+		self.stats = stats or ControllerStats()
 		self.osc_output = osc_output
-		self._build_osc(osc_outputs)
-		if osc_outputs:
-			self.register_update_hook(lambda _: self.on_update_thread())
+		if osc_outputs and self.osc_output:
+			self._build_osc(osc_outputs)
+		self.register_update_hook(lambda _: self.on_update_thread())
 		
 	def _build_osc(self,osc_outputs):
-		self.osc_outputs = []
-		status_getters = self.get_status_getters()
+		# datagrams and bytes this controller sends
+		sink = self.osc_counter = CountingSink(self.osc_output)
+		if osc_bundle:
+			# all values changed by one report go out as one datagram
+			self.osc_bundler = sink = ReportBundler(self.osc_counter,osc_bundle_max_size)
+		self.osc_scheduler = OscScheduler(sink,osc_frequency)
+		osc_stage.add_scheduler(self.osc_scheduler)
+
+		sources = report_sources(self.is_left())
+		mappings = []
 		for controller_path,osc_definition in osc_outputs.items():
 			mapper=None
+			interval = 0 if osc_buttons_immediate and controller_path.startswith("buttons.") else osc_frequency
+
+			# every:<seconds>:<definition> overrides the frequency for one mapping
+			if osc_definition.startswith("every:"):
+				(_,interval,osc_definition) = osc_definition.split(":",maxsplit=2)
+				interval = float(interval)
 			osc_path = osc_definition
 
 			for remapper in REMAPPERS:
@@ -216,94 +286,54 @@ class JoyConX(JoyCon):
 					log.info("remapping as requested: %s",osc_definition)
 					assert not mapper,"two mappers taking ownership"
 					(mapper,osc_path) = ret
-				
-			controller_path = controller_path.split(".")
-			try:
-				getter = reduce(operator.getitem, controller_path, status_getters)
-				if not callable(getter):
-					log.error("Omitting %s for %s: not a function",controller_path,id)
-					continue
-			except KeyError as e:
-				log.error("Omitting %s for %s",controller_path,id)
-				log.error(e)
-			self.osc_outputs.append([None,osc_path,getter,mapper])
+
+			source = sources.get(controller_path)
+			if source is None:
+				log.error("Omitting %s for %s: no such input",controller_path,self.serial)
+				continue
+			self.osc_scheduler.set_interval(osc_path,interval)
+			mappings.append((source,osc_path,mapper))
+		changes = self._osc_changes = []
+		self.osc_plan = compile_osc_plan(mappings,lambda osc_path,val: changes.append((osc_path,val)),self.imu_decoder)
 		# TODO: not needed? asyncio.run_coroutine_threadsafe()
 
-	def set_rumble(self, f: float):
-		self.rumble_event.set()
-		self.current_rumble = f
+	def set_rumble(self, f: float, source="cli"):
+		# wake the worker only if the mixed strength changes
+		if self.rumble_mixer.set(source, f):
+			if tracer is not None and self.rumble_received is None:
+				self.rumble_received = time.monotonic()
+			self.rumble_event.set()
 
 	def on_update_thread(self):
 		# print(self.serial,self.get_gyro_x())
-		for data in self.osc_outputs:
-			(prev,osc_path,getter,mapper) = data
-			if mapper:
-				val = mapper(getter())
+		stats = self.stats
+		stats.report(self._input_report[1])
+		if self.osc_plan is None:
+			return
+		# tracing compares with the report's arrival, taken on the monotonic clock
+		clock = time.perf_counter if tracer is None else time.monotonic
+		start = clock()
+		if tracer is not None:
+			history = self.history
+			arrival = history.timestamp(history.seq - 1)
+			tracer.record(self.controller_id, "hook", start - arrival)
+		# only decode and map here, the sending happens on the osc_stage thread
+		changes = self._osc_changes
+		self.osc_plan(self._input_report)
+		mapped = clock()
+		stats.map_time += mapped - start
+		if tracer is not None:
+			tracer.record(self.controller_id, "map", mapped - start)
+		if changes:
+			if tracer is None:
+				osc_stage.put(self.osc_scheduler,tuple(changes))
 			else:
-				val = getter()
-			if prev != val:
-				data[0] = val
-				log.debug(f"send {osc_path} <- {val}")
-				self.osc_output.send_message(osc_path,val)
-
-	def get_status_getters(self) -> dict:
-		if self.status_getters:
-			return self.status_getters
-		add_buttons =  {
-				"y": self.get_button_y,
-				"x": self.get_button_x,
-				"b": self.get_button_b,
-				"a": self.get_button_a,
-				"sr": self.get_button_right_sr,
-				"sl": self.get_button_right_sl,
-				"r": self.get_button_r,
-				"zr": self.get_button_zr,
-			} if self.is_right()  else {
-				"down": self.get_button_down,
-				"up": self.get_button_up,
-				"right": self.get_button_right,
-				"left": self.get_button_left,
-				"sr": self.get_button_left_sr,
-				"sl": self.get_button_left_sl,
-				"l": self.get_button_l,
-				"zl": self.get_button_zl,
-			}
-		buttons = {
-			"minus": self.get_button_minus,
-			"plus": self.get_button_plus,
-			"r-stick": self.get_button_r_stick,
-			"l-stick": self.get_button_l_stick,
-			"home": self.get_button_home,
-			"capture": self.get_button_capture,
-			"charging-grip": self.get_button_charging_grip,
-		}
-		buttons.update(add_buttons)
-		self.status_getters = {
-			"battery": {
-				"charging": self.get_battery_charging,
-				"level": self.get_battery_level,
-			},
-			"buttons": buttons,
-			"analog-sticks": {
-					"horizontal": self.get_stick_left_horizontal,
-					"vertical": self.get_stick_left_vertical,
-				} if self.is_left() else {
-					"horizontal": self.get_stick_right_horizontal,
-					"vertical": self.get_stick_right_vertical,
-				},
-			"accel": {
-				"x": self.get_accel_x,
-				"y": self.get_accel_y,
-				"z": self.get_accel_z,
-			},
-			"gyro": {
-				"x": self.get_gyro_x,
-				"y": self.get_gyro_y,
-				"z": self.get_gyro_z,
-			},
-		}
-		return self.status_getters
-	
+				# the rest is recorded by tracer.batch_sent on the osc_stage thread
+				osc_stage.put(self.osc_scheduler,tuple(changes),(self.controller_id,arrival,clock()))
+			changes.clear()
+		stats.hook_time += clock() - start
+		stats.hooked_reports += 1
+
 
 joycons: typing.Dict[str, JoyConX | None] = {
 	id: None for id, serial in controllers.items()
@@ -311,103 +341,132 @@ joycons: typing.Dict[str, JoyConX | None] = {
 # lock = threading.Lock()
 
 
+# per controller id, kept across reconnects
+controller_stats: typing.Dict[str, ControllerStats] = {}
+
 async def joycon_worker(joycon_serial, id):
 	for i in range(13):
 		if shutdown_everything:
 			break
-		joycon_id = False
-
-		while not joycon_id:
-			# TODO: move to thread spawning thread
-
-			for vendor_id, product_id, serial in get_device_ids():
-				if serial == joycon_serial:
-					joycon_id = (vendor_id, product_id, serial)
-					break
-
-			if joycon_id:
-				assert joycon_id[0]
-				break
-			if verbose:
-				log.debug(f"Finding {id}")
-			await asyncio.sleep(0.4421 if not verbose else 2.3)
+		if verbose:
+			log.debug(f"Finding {id}")
+		joycon_id = await discovery.wait_for(joycon_serial)
+		assert joycon_id[0]
 
 		name = "Controller-" + str(id)
 		log.info("Found JoyCon %s (%s)\n", name, joycon_id)
 		
 		osc_output_id = "osc_output."+str(id)
 		osc_outputs =  config[osc_output_id] if osc_output_id in config else  None
-		joycon = JoyConX(osc_outputs,*joycon_id)
+		start = time.perf_counter()
+		stats = controller_stats.setdefault(id, ControllerStats())
+		joycon = JoyConX(osc_outputs,*joycon_id,backend=hid_backend,threaded=not asyncio_input,
+			calibration_cache=calibration_cache,revalidate_calibration=revalidate_calibration,output_gap=output_gap,
+			stats=stats,controller_id=id)
+		stats.connected()
+		log.debug("Connected %s in %.0f ms (calibration %s)", name, (time.perf_counter() - start) * 1000,
+			"cached" if joycon.device_info_cached else "read")
+		if asyncio_input:
+			joycon.attach_to_loop(asyncio.get_running_loop())
+		rumble_paths = config["osc.rumble"].get(id, "").splitlines() if "osc.rumble" in config else []
+		joycon.rumble_mixer = RumbleMixer(rumble_combine, rumble_attack, rumble_decay, rumble_paths)
 		joycons[id] = joycon
-
-
-		joycon.set_player_lamp_on(
-			(int(id) + 1) % 3 + 1
-		)  # required to keep fake controller running
-
-		log.debug("Testing vibration")
-		await asyncio.sleep(1)
-
-		joycon.rumble_simple()
-		await asyncio.sleep(1.5)
-
-		joycon.rumble_simple()
-		await asyncio.sleep(0.5)
-
-		joycon.rumble_stop()
-		log.debug("Vibrated")
-		if notele:
-			await asyncio.sleep(0.02)
-
-			await asyncio.sleep(0.02)
-			joycon._write_output_report(b"\x01", b"\x03", b"\x00")
-
-		while not shutdown_everything and joycon.connected():
-			await joycon.rumble_event.wait()
-
-			status = joycon.current_rumble
-			if status:
-
-				joycon.rumble_simple()
-				if verbose:
-					# too spammy even for debug
-					log.debug("Vibrating %s @ %s", name, str(status))
-
-				await asyncio.sleep(0.35)
-
-			elif status is not False:
-				joycon.current_rumble = False
-				log.debug("STOP %s", name)
+		try:
+			joycon.set_player_lamp_on(
+				(int(id) + 1) % 3 + 1
+			)  # required to keep fake controller running
+
+			log.debug("Testing vibration")
+			await asyncio.sleep(1)
+
+			joycon.rumble_simple()
+			await asyncio.sleep(1.5)
+
+			joycon.rumble_simple()
+			await asyncio.sleep(0.5)
+
+			joycon.rumble_stop()
+			log.debug("Vibrated")
+			if notele:
+				await asyncio.sleep(0.02)
+
+				await asyncio.sleep(0.02)
+				joycon._write_output_report(b"\x01", b"\x03", b"\x00")
+
+			mixer = joycon.rumble_mixer
+			if tracer is not None and joycon.output_writer:
+				joycon.output_writer.on_rumble_written = functools.partial(trace_rumble_written, joycon)
+			while not shutdown_everything and joycon.connected():
+				now = time.monotonic()
+				strength = mixer.tick(now)
+				if joycon.rumble(strength, force=mixer.keepalive_due(now)):
+					mixer.written(now)
+					stats.rumble_writes += 1
+					if tracer is not None and joycon.rumble_received is not None:
+						trace_rumble(joycon, now)
+					if verbose:
+						# too spammy even for debug
+						log.debug("Vibrating %s @ %s", name, str(strength))
+
+				# one update per tick, however chatty the sources are
+				await asyncio.sleep(rumble_tick)
+				if not strength and not mixer.moving:
+					await joycon.rumble_event.wait()
 				joycon.rumble_event.clear()
-				joycon.rumble_stop()
+		finally:
+			# the reader and writer threads hold the JoyCon, it is never
+			# collected: close its device and threads here
+			joycon._close()
 
 		log.error("LOST JOYCON %s", name)
+		if joycon.osc_scheduler:
+			osc_stage.remove_scheduler(joycon.osc_scheduler)
 
 		del joycon
 		joycons[id] = False
 	log.critical(f"TOO MANY FAILURES, CLOSING {id}")
 
 
+def trace_rumble(joycon: JoyConX, now):
+	# the report is queued with the output writer, trace_rumble_written follows
+	received = joycon.rumble_traced = joycon.rumble_received
+	joycon.rumble_received = None
+	tracer.record(joycon.controller_id, "osc to worker", now - received)
+	if joycon.output_writer is None:  # written already
+		tracer.record(joycon.controller_id, "osc to hid", time.monotonic() - received)
+
+
+def trace_rumble_written(joycon: JoyConX, queued, written):
+	# on the writer thread
+	tracer.record(joycon.controller_id, "hid write", written - queued)
+	received = joycon.rumble_traced
+	if received is not None:  # not a keepalive
+		joycon.rumble_traced = None
+		tracer.record(joycon.controller_id, "osc to hid", written - received)
+
+
 controller_tasks = []
-server_osc: osc_server.AsyncIOOSCUDPServer = None
-osc_relayer: SimpleUDPClient = None
+osc_input: OscInputDispatcher = None
+osc_relayer: RawRelay = None
 
 #TODO: untested
 def gen_relay(relayinfo,dispatcher):
-	relay = SimpleUDPClient(relayinfo["ip"],int(relayinfo["port"]))
+	relay = RawRelay(osc_fanout.sink(relayinfo["ip"],relayinfo["port"],osc_sink_queue_size))
 	remappings={k:v for k,v in relayinfo.items() if k!="ip" and k!="port"}
 	for map_from,map_to in remappings.items():
 		log.info(" - Relaying '%s' as '%s'",map_from,map_to)
-		dispatcher.map(map_from, (lambda map_to=map_to: lambda _,*args: relay.send_message(map_to,args))() )
+		# only the address is swapped, the arguments are sent as received
+		dispatcher.map_raw(map_from, relay.renamer(map_to))
 
 async def startOSC(loop):
-	global server_osc, osc_relayer
+	global osc_input, osc_relayer
 
-	def default_handler(key, *vals):
+	def default_handler(dgram):
 		if osc_relayer:
-			osc_relayer.send_message(key, vals)
+			osc_relayer.forward(dgram)
 		if verbose:
-			logging.error("osc received unhandled: %s %s", key, vals)
+			message = OscMessage(dgram)
+			logging.error("osc received unhandled: %s %s", message.address, message.params)
 
 	def osc_rumble(id, address, *args):
 		log.debug(
@@ -436,9 +495,9 @@ async def startOSC(loop):
 			log.error("Unknown type received")
 
 		log.info(f"JoyCon {id}: set_rumble(rumble_strength={rumble_strength})")
-		j.set_rumble(rumble_strength)
+		j.set_rumble(rumble_strength, address)
 
-	d = dispatcher.Dispatcher()
+	d = osc_input = OscInputDispatcher()
 
 	for id, osc_paths in config["osc.rumble"].items():
 		for osc_path in osc_paths.splitlines():
@@ -453,19 +512,15 @@ async def startOSC(loop):
 
 			log.debug("Map %s <- %s", id, osc_path)
 	if relay_port > 0:
-		d.set_default_handler(default_handler)
+		d.set_raw_default_handler(default_handler)
 
-	server_osc = osc_server.AsyncIOOSCUDPServer((listen_ip, listen_port), d, loop)
 	log.info(f"[osc_server] listen_ip={listen_ip} listen_port={listen_port}")
-	(
-		transport,
-		protocol,
-	) = (
-		await server_osc.create_serve_endpoint()
-	)  # Create datagram endpoint and start serving
+	transport, protocol = await loop.create_datagram_endpoint(
+		lambda: OscInputProtocol(d), local_addr=(listen_ip, listen_port)
+	)
 
 	if relay_port > 0:
-		osc_relayer = SimpleUDPClient(relay["ip"], relay_port)
+		osc_relayer = RawRelay(osc_fanout.sink(relay["ip"], relay_port, osc_sink_queue_size))
 		log.info(
 			"Relaying other messages to {} on port {}".format(relay["ip"], relay_port)
 		)
@@ -521,9 +576,9 @@ async def startJoyCons():
 		print("ATTENTION: Start all joycons (to discover serial IDs")
 		print("THEN:    modify config.ini to set up proper ids for your osc...")
 		found = []
-		while not shutdown_everything:
 
-			for vendor_id, product_id, serial in get_device_ids():
+		def on_devices(ids):
+			for vendor_id, product_id, serial in ids:
 				if serial not in found:
 					found.append(serial)
 					id = len(found)
@@ -536,9 +591,12 @@ async def startJoyCons():
 					print("Type exit and press enter to save! Then restart vrcjoycon.")
 					config_save()
 
+		discovery.add_listener(on_devices)
+		while not shutdown_everything:
 			sys.stdout.write(".")
 			sys.stdout.flush()
 			await asyncio.sleep(2.123)
+		discovery.remove_listener(on_devices)
 		print("Stopping joycon discovery")
 		return
 
@@ -560,13 +618,95 @@ do_status_args = argparse.ArgumentParser(description="Random status info")
 
 import pprint
 async def do_status(reader, writer):
+	if osc_input:
+		print("OSC received=",osc_input.received,"handled=",osc_input.handled)
+	print("Device enumerations=",discovery.enumerations,"hidraw uevents=",discovery.uevents)
+	if osc_stage:
+		print("OSC output queue depth=",osc_stage.depth,"max depth=",osc_stage.max_depth,"batches=",osc_stage.batches,"coalesced=",osc_stage.coalesced)
+	for sink in osc_fanout.sinks:
+		print("OSC to %s:%s" % sink.target,"sent=",sink.sent,"bytes=",sink.bytes,"queued=",sink.depth,"dropped=",sink.dropped,"errors=",sink.errors)
 	for id,con in joycons.items():
 		print("JOYCON: ",id,"=",con)
 		if con:
 			print("        Connected=",con.connected(),"status=")
 			pprint.pprint(con.get_status())
+			if con.connected():
+				try:
+					voltage = await asyncio.wait_for(asyncio.wrap_future(con.send_subcommand(b"\x50")), 1)
+					print("        Battery voltage= %.2fV" % (int.from_bytes(voltage[2:4], "little") * 0.0025))
+				except TimeoutError:
+					print("        Battery voltage= no reply")
+			writer = con.output_writer
+			if writer:
+				print("        Output reports written=",writer.writes,"queued=",writer.depth,"dropped=",writer.dropped,
+					"rumble merged=",writer.rumble_superseded,"errors=",writer.errors,
+					"latency mean=%.1fms max=%.1fms" % (writer.mean_latency * 1000, writer.max_latency * 1000))
+			for subcommand, stats in con.subcommand_stats.items():
+				print("        Subcommand 0x%02x:" % subcommand, stats)
+			if con.osc_bundler:
+				print("        OSC bundles sent=",con.osc_bundler.datagrams_sent,"datagrams saved=",con.osc_bundler.datagrams_saved)
+			if con.osc_scheduler:
+				print("        OSC values coalesced=",con.osc_scheduler.coalesced)
+
+
+
+def collect_stats():
+	"""{controller id: {name: value}} for do_stats and the publishers"""
+	out = {}
+	for id, stats in controller_stats.items():
+		joycon = joycons.get(id)
+		# reports and OSC counts are of the current connection
+		values = stats.snapshot(joycon.history if joycon else None)
+		values["connected"] = bool(joycon and joycon.connected())
+		if joycon and joycon.osc_scheduler:
+			values["osc_messages"] = joycon.osc_scheduler.sent
+			values["osc_datagrams"] = joycon.osc_counter.datagrams
+			values["osc_bytes"] = joycon.osc_counter.bytes
+		out[id] = values
+	return out
+
+
+do_stats_args = argparse.ArgumentParser(description="Counters per controller. Per report map_us is "
+	"decoding and mapping it by the OSC plan, hook_us the whole update hook")
+
+
+async def do_stats(reader, writer):
+	for id, values in collect_stats().items():
+		print("JOYCON",id)
+		for name, value in values.items():
+			if isinstance(value, float):
+				value = "%.2f" % value
+			print("        %-18s %s" % (name, value))
+
+
+async def publish_stats():
+	# relative to config.ini, like the calibration cache
+	prometheus_path = configpath.parent / stats_prometheus_file if stats_prometheus_file else None
+	while not shutdown_everything:
+		await asyncio.sleep(stats_interval)
+		stats = collect_stats()
+		try:
+			if prometheus_path:
+				await asyncio.to_thread(write_prometheus, prometheus_path, stats)
+			if stats_osc and osc_output:
+				publish_osc(osc_output, stats)
+		except OSError as e:
+			log.error("Publishing stats failed: %s", e)
 
 
+do_trace_args = argparse.ArgumentParser(description="Latency histograms per controller and stage (needs trace_latency = 1)")
+do_trace_args.add_argument("--buckets", action="store_true", help="also print every bucket")
+do_trace_args.add_argument("--reset", action="store_true", help="start over afterwards")
+
+
+async def do_trace(reader, writer, buckets=False, reset=False):
+	if tracer is None:
+		print("Latency tracing is off, set trace_latency = 1 in [main]")
+		return
+	print(tracer.dump() if buckets else tracer.summary())
+	if reset:
+		tracer.reset()
+
 
 do_exit_args = argparse.ArgumentParser(description="Exits")
 
@@ -600,7 +740,34 @@ async def do_vibrate(reader, writer, id=1):
 		writer.write("no such joycon\n")
 
 
-CLI_CMDS = {"vibrate": (do_vibrate, do_vibrate_args), "status": (do_status, do_status_args), "exit": (do_exit, do_exit_args), "tasks": (do_tasks, do_tasks_args)}
+do_record_args = argparse.ArgumentParser(description="Records the input reports of a controller, replay with backend replay:<path>")
+do_record_args.add_argument("id", help="controller id")
+do_record_args.add_argument("path", nargs='?', help="file to record to, leave out to stop recording")
+do_record_args.add_argument("--compression", choices=("zlib", "zstd"), default=None)
+
+recorders: typing.Dict[str, ReportRecorder] = {}
+
+
+async def do_record(reader, writer, id, path=None, compression=None):
+	recorder = recorders.pop(id, None)
+	if recorder:
+		recorder.close()
+		print("Recorded",recorder.reports,"reports of",id)
+	if not path:
+		return
+	joycon = joycons.get(id)
+	if not joycon:
+		writer.write("no such joycon\n")
+		return
+	recorder = ReportRecorder(path, joycon.vendor_id, joycon.product_id, joycon.serial, compression)
+	# reads the calibration, waits for replies
+	await asyncio.to_thread(recorder.attach, joycon)
+	recorders[id] = recorder
+	log.info("Recording %s to %s", id, path)
+
+
+CLI_CMDS = {"vibrate": (do_vibrate, do_vibrate_args), "status": (do_status, do_status_args), "exit": (do_exit, do_exit_args), "tasks": (do_tasks, do_tasks_args),
+	"record": (do_record, do_record_args), "stats": (do_stats, do_stats_args), "trace": (do_trace, do_trace_args)}
 
 async def startCLI(loop):
 
@@ -612,10 +779,15 @@ async def amain():
 	loop = asyncio.get_event_loop()
 
 	await startOSC(loop)
-	
+	discoverytask=asyncio.create_task(discovery.run(),name="DeviceDiscovery")
+
 
 	jcstarter=asyncio.create_task(startJoyCons(),name="startJoyCons")
+	if osc_stage:
+		osc_stage.start()
 	clitask=asyncio.create_task(startCLI(loop),name="CLI")
+	if stats_interval > 0 and (stats_osc or stats_prometheus_file):
+		statstask=asyncio.create_task(publish_stats(),name="Stats")
 
 	while not shutdown_everything:
 		for task in controller_tasks:
@@ -631,6 +803,10 @@ async def amain():
 		await asyncio.wait([clitask],timeout=1.234)
 		
 	log.info("shutdown_everything=1")
+	for recorder in recorders.values():
+		recorder.close()  # writes the last chunk
+	if tracer is not None:
+		print(tracer.summary())
 	for task in asyncio.all_tasks():
 		task.cancel()
 
@@ -0,0 +1,144 @@
+"""OSC input: dispatching of received datagrams without parsing unhandled ones"""
+
+import asyncio, logging, re
+
+from pythonosc.dispatcher import Dispatcher
+from pythonosc.osc_message import OscMessage, ParseError
+
+log = logging.getLogger("VRCJOYCON")
+
+BUNDLE_PREFIX = b"#bundle\x00"
+# characters of OSC address patterns, see Dispatcher.handlers_for_address
+PATTERN_CHARS = re.compile(rb"[*?\[\]{}]")
+
+
+def osc_address(dgram: bytes):
+	"""The address of an OSC message datagram as bytes, None if malformed"""
+	end = dgram.find(b"\x00")
+	if end <= 0:
+		return None
+	return dgram[:end]
+
+
+def bundle_elements(dgram: bytes):
+	"""Yields the contents of a bundle, skipping its header and timetag"""
+	i, size = 16, len(dgram)
+	while i + 4 <= size:
+		length = int.from_bytes(dgram[i:i + 4], "big")
+		i += 4
+		if length <= 0 or i + length > size:
+			return
+		yield dgram[i:i + length]
+		i += length
+
+
+class _Raw:
+	"""marks handlers which take the datagram unparsed"""
+	__slots__ = ("handler",)
+
+	def __init__(self, handler):
+		self.handler = handler
+
+	def __call__(self, *args):  # never called by pythonosc, see _dispatch_patterns
+		raise TypeError("raw handler called with parsed arguments")
+
+
+class OscInputDispatcher:
+	"""
+	Looks the address bytes of each datagram up in a dict of exact addresses
+	before anything is parsed, so the many messages nobody handles cost a
+	find() and a dict lookup. Only handled messages are parsed.
+
+	Handlers are called like with pythonosc: handler(address, *args). Raw
+	handlers (map_raw, set_raw_default_handler) get the datagram bytes as
+	received and never cause parsing. While
+	any mapped address is a pattern, or for incoming address patterns, a
+	pythonosc Dispatcher with the same mappings is used instead.
+	"""
+
+	def __init__(self):
+		self.received = 0
+		self.handled = 0
+		self._exact = {}  # address bytes: [handlers]
+		self._default_handler = None
+		self._has_patterns = False
+		self._patterns = Dispatcher()
+
+	def map(self, address: str, handler):
+		self._exact.setdefault(address.encode(), []).append(handler)
+		self._patterns.map(address, handler)
+		if PATTERN_CHARS.search(address.encode()):
+			self._has_patterns = True
+
+	def map_raw(self, address: str, handler):
+		"""handler(datagram) for messages to `address`"""
+		self.map(address, _Raw(handler))
+
+	def set_default_handler(self, handler):
+		"""handler(address, *args) for messages no other handler takes"""
+		self._default_handler = handler
+		self._patterns.set_default_handler(handler)
+
+	def set_raw_default_handler(self, handler):
+		"""handler(datagram) for messages no other handler takes"""
+		self.set_default_handler(_Raw(handler))
+
+	def dispatch(self, dgram: bytes, client_address=None):
+		if dgram.startswith(BUNDLE_PREFIX):
+			for element in bundle_elements(dgram):
+				self.dispatch(element, client_address)
+			return
+		address = osc_address(dgram)
+		if address is None:
+			return
+		self.received += 1
+
+		if self._has_patterns:
+			self._dispatch_patterns(dgram, client_address)
+			return
+
+		handlers = self._exact.get(address)
+		if handlers is None:
+			if PATTERN_CHARS.search(address):  # incoming pattern
+				self._dispatch_patterns(dgram, client_address)
+				return
+			if self._default_handler is None:
+				return  # nobody wants it, never parsed
+			handlers = (self._default_handler,)
+		self.handled += 1
+		message = None
+		for handler in handlers:
+			if handler.__class__ is _Raw:
+				handler.handler(dgram)
+				continue
+			if message is None:
+				try:
+					message = OscMessage(dgram)
+				except ParseError:
+					return
+			handler(message.address, *message.params)
+
+	def _dispatch_patterns(self, dgram, client_address):
+		try:
+			message = OscMessage(dgram)
+		except ParseError:
+			return
+		handled = False
+		for handler in self._patterns.handlers_for_address(message.address):
+			if isinstance(handler.callback, _Raw):
+				handler.callback.handler(dgram)
+			else:
+				handler.invoke(client_address, message)
+			handled = True
+		self.handled += handled
+
+
+class OscInputProtocol(asyncio.DatagramProtocol):
+	def __init__(self, dispatcher: OscInputDispatcher):
+		self.dispatcher = dispatcher
+
+	def datagram_received(self, data, addr):
+		try:
+			self.dispatcher.dispatch(data, addr)
+		except Exception:
+			log.exception("Handling OSC message from %s failed", addr)
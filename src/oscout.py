@@ -0,0 +1,460 @@
+"""OSC output: encoding and sending of controller events"""
+
+import logging, select, socket, threading, time
+from collections import deque
+from collections.abc import Iterable
+
+from pythonosc.osc_message_builder import OscMessageBuilder
+
+log = logging.getLogger("VRCJOYCON")
+
+# "#bundle" and the timetag 1, meaning "immediately"
+BUNDLE_HEADER = b"#bundle\x00" + (1).to_bytes(8, "big")
+
+# Ethernet MTU minus IP and UDP headers, with some room for tunnels/VPNs
+MAX_DATAGRAM_SIZE = 1400
+
+
+def encode_message(address, value) -> bytes:
+	"""Same encoding as pythonosc's SimpleUDPClient.send_message, returns the datagram"""
+	builder = OscMessageBuilder(address=address)
+	if value is None:
+		values = []
+	elif not isinstance(value, Iterable) or isinstance(value, (str, bytes)):
+		values = [value]
+	else:
+		values = value
+	for val in values:
+		builder.add_arg(val)
+	return builder.build().dgram
+
+
+def pad_address(address: str) -> bytes:
+	"""An OSC address as it is encoded: NUL terminated, padded to 4 bytes"""
+	encoded = address.encode()
+	return encoded + b"\x00" * (4 - len(encoded) % 4)
+
+
+class UdpSink:
+	"""
+	One destination of a UdpFanout. A datagram is sent right away, or kept
+	in a bounded queue while the socket buffer is full, dropping the oldest
+	when `maxsize` wait. Errors (e.g. ICMP port unreachable) are counted,
+	never raised, so one bad destination does not hold up the others.
+
+	Senders on several threads (the output stage, the event loop) and the
+	fanout thread draining the queue share it under a lock; an empty queue
+	is sent to without taking it.
+	"""
+
+	def __init__(self, fanout, address, port, maxsize=256):
+		self.target = (address, port)
+		self.maxsize = maxsize
+		self.sent = 0
+		self.bytes = 0
+		self.dropped = 0
+		self.errors = 0
+		self._fanout = fanout
+		self._queue = deque()
+		self._lock = threading.Lock()
+
+	@property
+	def depth(self):
+		return len(self._queue)
+
+	def send_datagram(self, dgram):
+		if self._queue:  # keep the order
+			self._enqueue(dgram)
+			return
+		try:
+			self._fanout._sock.sendto(dgram, self.target)
+		except BlockingIOError:
+			self._enqueue(dgram)
+			return
+		except OSError as e:
+			self._error(e)
+			return
+		self.sent += 1
+		self.bytes += len(dgram)
+
+	def send_parts(self, parts):
+		"""Sends the concatenation of `parts` without building it, if possible"""
+		sendmsg = self._fanout._sendmsg
+		if sendmsg is None or self._queue:
+			self.send_datagram(b"".join(parts))
+			return
+		try:
+			size = sendmsg(parts, (), 0, self.target)
+		except BlockingIOError:
+			self._enqueue(b"".join(parts))
+			return
+		except OSError as e:
+			self._error(e)
+			return
+		self.sent += 1
+		self.bytes += size
+
+	def send_message(self, address, value):
+		self.send_datagram(encode_message(address, value))
+
+	def flush(self):
+		"""Messages are sent right away, nothing to do"""
+
+	def _enqueue(self, dgram):
+		queue = self._queue
+		with self._lock:
+			if len(queue) >= self.maxsize:
+				queue.popleft()
+				self.dropped += 1
+			queue.append(bytes(dgram))
+		self._fanout._wakeup.set()
+
+	def _error(self, e):
+		self.errors += 1
+		log.debug("OSC send to %s:%s failed: %s", *self.target, e)
+
+	def _drain(self, sock) -> bool:
+		"""Sends what is queued, returns False if the socket is full again"""
+		queue = self._queue
+		while queue:
+			# held from peeking to popping, so _enqueue cannot drop the
+			# datagram being sent and have another one popped instead
+			with self._lock:
+				dgram = queue[0]
+				try:
+					sock.sendto(dgram, self.target)
+				except BlockingIOError:
+					return False
+				except OSError as e:
+					self._error(e)
+				else:
+					self.sent += 1
+					self.bytes += len(dgram)
+				queue.popleft()
+		return True
+
+
+class CountingSink:
+	"""Counts the datagrams and bytes sent through `sink`, e.g. by one controller"""
+
+	def __init__(self, sink):
+		self.sink = sink
+		self.datagrams = 0
+		self.bytes = 0
+
+	def send_datagram(self, dgram):
+		self.datagrams += 1
+		self.bytes += len(dgram)
+		self.sink.send_datagram(dgram)
+
+	def send_message(self, address, value):
+		self.send_datagram(encode_message(address, value))
+
+	def flush(self):
+		self.sink.flush()
+
+
+class SinkGroup:
+	"""Encodes each message once and sends it to all `sinks`"""
+
+	def __init__(self, sinks):
+		self.sinks = list(sinks)
+
+	def send_datagram(self, dgram):
+		for sink in self.sinks:
+			sink.send_datagram(dgram)
+
+	def send_message(self, address, value):
+		self.send_datagram(encode_message(address, value))
+
+	def flush(self):
+		"""Messages are sent right away, nothing to do"""
+
+
+class UdpFanout:
+	"""
+	All OSC output goes through one shared non-blocking UDP socket, to any
+	number of UdpSinks. Sending never blocks the caller; what does not fit
+	in the socket buffer is queued per sink and sent by the "OSCFanout"
+	thread once the socket is writable again.
+	"""
+
+	def __init__(self):
+		self.sinks = []
+		self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+		self._sock.setblocking(False)
+		# scatter/gather where available (not on Windows)
+		self._sendmsg = getattr(self._sock, "sendmsg", None)
+		self._wakeup = threading.Event()
+		self._thread = threading.Thread(target=self._run, daemon=True, name="OSCFanout")
+		self._thread.start()
+
+	def sink(self, address, port, maxsize=256) -> UdpSink:
+		sink = UdpSink(self, address, int(port), maxsize)
+		self.sinks = self.sinks + [sink]  # copy on write, see _run
+		return sink
+
+	def _run(self):
+		while True:
+			self._wakeup.wait()
+			self._wakeup.clear()
+			while True:
+				full = [sink for sink in self.sinks if not sink._drain(self._sock)]
+				if not full:
+					break
+				select.select([], [self._sock], [], 0.1)
+
+
+class RawRelay:
+	"""
+	Forwards received datagrams without decoding them, so argument types and
+	values arrive unchanged.
+	"""
+
+	def __init__(self, sink: UdpSink):
+		self.sink = sink
+
+	def forward(self, dgram: bytes):
+		self.sink.send_datagram(dgram)
+
+	def renamer(self, address: str):
+		"""A handler forwarding datagrams with their address replaced by `address`"""
+		prefix = pad_address(address)
+		send_parts = self.sink.send_parts
+
+		def forward_renamed(dgram: bytes):
+			# the argument part starts after the padded old address, it is
+			# never copied where sendmsg is available
+			start = (dgram.find(b"\x00") // 4 + 1) * 4
+			send_parts((prefix, memoryview(dgram)[start:]))
+
+		return forward_renamed
+
+
+class ReportBundler:
+	"""
+	Collects the messages produced by one input report. flush() sends them
+	as OSC bundles of at most `max_size` bytes, a lone message is sent as is.
+	Not thread safe, use one per controller.
+	"""
+
+	def __init__(self, client, max_size=MAX_DATAGRAM_SIZE):
+		self.client = client
+		self.max_size = max_size
+		self.datagrams_sent = 0
+		self.datagrams_saved = 0
+		self._pending = []
+
+	def send_message(self, address, value):
+		self._pending.append(encode_message(address, value))
+
+	def flush(self):
+		pending = self._pending
+		if not pending:
+			return
+		if len(pending) == 1:
+			self.client.send_datagram(pending[0])
+			self.datagrams_sent += 1
+			pending.clear()
+			return
+
+		sent = 0
+		parts = [BUNDLE_HEADER]
+		size = len(BUNDLE_HEADER)
+		for dgram in pending:
+			element_size = 4 + len(dgram)
+			if size + element_size > self.max_size and len(parts) > 1:
+				self.client.send_datagram(b"".join(parts))
+				sent += 1
+				parts = [BUNDLE_HEADER]
+				size = len(BUNDLE_HEADER)
+			parts.append(len(dgram).to_bytes(4, "big"))
+			parts.append(dgram)
+			size += element_size
+		self.client.send_datagram(b"".join(parts))
+		sent += 1
+
+		self.datagrams_sent += sent
+		self.datagrams_saved += len(pending) - sent
+		pending.clear()
+
+
+class OscScheduler:
+	"""
+	Latest-value-wins output per OSC path. A value goes out right away if its
+	path was not sent within its interval, otherwise it is held until flush()
+	and replaced by newer values meanwhile. An interval of 0 never delays.
+
+	`sink` is a UdpSink, SinkGroup, CountingSink or ReportBundler. Only used from the OscOutputStage
+	thread, so it is not thread safe.
+	"""
+
+	def __init__(self, sink, default_interval=0.0):
+		self.sink = sink
+		self.default_interval = default_interval
+		self.intervals = {}
+		self.coalesced = 0
+		self.sent = 0
+		self._pending = {}
+		self._next_send = {}
+
+	def set_interval(self, osc_path, interval):
+		self.intervals[osc_path] = interval
+
+	def send_message(self, osc_path, value):
+		interval = self.intervals.get(osc_path, self.default_interval)
+		if interval <= 0:
+			self.sent += 1
+			self.sink.send_message(osc_path, value)
+		elif osc_path in self._pending:
+			self._pending[osc_path] = value
+			self.coalesced += 1
+		else:
+			now = time.monotonic()
+			if now >= self._next_send.get(osc_path, 0):
+				self._next_send[osc_path] = now + interval
+				self.sent += 1
+				self.sink.send_message(osc_path, value)
+			else:
+				self._pending[osc_path] = value
+
+	def end_report(self):
+		self.sink.flush()
+
+	def flush(self, now=None):
+		"""Sends the pending values which are due. Returns when the next one is due, or None."""
+		if not self._pending:
+			return None
+		now = now or time.monotonic()
+		next_due = None
+		sent = False
+		for osc_path, due in [(p, self._next_send[p]) for p in self._pending]:
+			if now >= due:
+				value = self._pending.pop(osc_path)
+				self._next_send[osc_path] = now + self.intervals.get(osc_path, self.default_interval)
+				self.sent += 1
+				self.sink.send_message(osc_path, value)
+				sent = True
+			elif next_due is None or due < next_due:
+				next_due = due
+		if sent:
+			self.sink.flush()
+		return next_due
+
+
+class OscOutputStage:
+	"""
+	Does all OSC encoding and sending on one sender thread, so a slow network
+	or logging never delays reading the controllers. Controller threads only
+	put() the values one report changed. The queue is bounded: when it is
+	full the oldest batch is folded into a backlog of the latest value per
+	scheduler and OSC path, which goes out before the queue. Nothing is lost
+	that way, a value is only sent once and then never repeated by the plan,
+	only values replaced by newer ones in the backlog are counted in
+	`coalesced`.
+
+	For latency tracing, `on_sent(trace, picked, sent)` is called with the
+	`trace` given to put() once its batch is sent: monotonic times of when
+	the sender thread took it and when the last send returned.
+	"""
+
+	def __init__(self, maxsize=256):
+		self.maxsize = maxsize
+		self.batches = 0
+		self.coalesced = 0
+		self.max_depth = 0
+		self.on_sent = None
+		self._schedulers = []
+		self._queue = deque()  # append is atomic, no lock needed
+		self._backlog = {}  # scheduler: {osc_path: value}, older than the queue
+		# taken to fold into the backlog and to pop, so a batch is never sent
+		# before an older one folded meanwhile
+		self._lock = threading.Lock()
+		self._wakeup = threading.Event()
+		self._thread = threading.Thread(target=self._run, daemon=True, name="OSCOutput")
+
+	@property
+	def depth(self):
+		return len(self._queue)
+
+	def add_scheduler(self, scheduler: OscScheduler):
+		# copy on write, the sender thread may be iterating the old list
+		self._schedulers = self._schedulers + [scheduler]
+
+	def remove_scheduler(self, scheduler: OscScheduler):
+		self._schedulers = [s for s in self._schedulers if s is not scheduler]
+
+	def start(self):
+		self._thread.start()
+
+	def put(self, scheduler: OscScheduler, changes, trace=None):
+		"""changes: sequence of (osc_path, value). Called from controller threads."""
+		queue = self._queue
+		if len(queue) >= self.maxsize:
+			self._fold_oldest()
+		queue.append((scheduler, changes, trace))
+		depth = len(queue)
+		if depth > self.max_depth:
+			self.max_depth = depth
+		self._wakeup.set()
+
+	def _fold_oldest(self):
+		with self._lock:
+			try:
+				scheduler, changes, _ = self._queue.popleft()
+			except IndexError:
+				return
+			pending = self._backlog.setdefault(scheduler, {})
+			before = len(pending)
+			pending.update(changes)
+			self.coalesced += len(changes) - (len(pending) - before)
+
+	def _send_backlog(self, backlog):
+		for scheduler, pending in backlog.items():
+			try:
+				for osc_path, value in pending.items():
+					scheduler.send_message(osc_path, value)
+				scheduler.end_report()
+			except OSError as e:
+				log.error("OSC send failed: %s", e)
+
+	def _run(self):
+		queue = self._queue
+		next_due = None
+		while True:
+			timeout = None if next_due is None else max(next_due - time.monotonic(), 0)
+			self._wakeup.wait(timeout)
+			self._wakeup.clear()
+			while True:
+				with self._lock:
+					if self._backlog:
+						backlog, self._backlog = self._backlog, {}
+					elif queue:
+						backlog = None
+						scheduler, changes, trace = queue.popleft()
+					else:
+						break
+				if backlog is not None:
+					self._send_backlog(backlog)
+					continue
+				self.batches += 1
+				picked = time.monotonic() if trace is not None else 0.0
+				try:
+					for osc_path, value in changes:
+						scheduler.send_message(osc_path, value)
+					scheduler.end_report()
+				except OSError as e:
+					log.error("OSC send failed: %s", e)
+				if trace is not None and self.on_sent is not None:
+					self.on_sent(trace, picked, time.monotonic())
+
+			next_due = None
+			now = time.monotonic()
+			for scheduler in self._schedulers:
+				try:
+					due = scheduler.flush(now)
+				except OSError as e:
+					log.error("OSC send failed: %s", e)
+					continue
+				if due is not None and (next_due is None or due < next_due):
+					next_due = due
@@ -0,0 +1,175 @@
+"""
+Compiles the mappings of an [osc_output.N] section into one function which is
+run on every raw 0x30 input report of a controller.
+"""
+
+import logging
+
+from pyjoycon.report import BUTTON_BITS
+
+log = logging.getLogger("VRCJOYCON")
+
+REPORT_SIZE = 49
+IMU_FIRST, IMU_END = 13, 49
+
+# Where each config path is read from the raw report:
+#   ("bits", byte, shift, mask)        buttons and battery
+#   ("stick", first_byte, vertical)    12 bit analog stick values
+#   ("imu", index)                     index into ImuDecoder.values (sample 0)
+
+
+def _button(name):
+	bit = BUTTON_BITS[name]
+	return ("bits", 3 + bit // 8, bit % 8, 1)
+
+
+_SHARED_SOURCES = {
+	"battery.charging": ("bits", 2, 4, 1),
+	"battery.level": ("bits", 2, 5, 7),
+	"buttons.minus": _button("minus"),
+	"buttons.plus": _button("plus"),
+	"buttons.r-stick": _button("r_stick"),
+	"buttons.l-stick": _button("l_stick"),
+	"buttons.home": _button("home"),
+	"buttons.capture": _button("capture"),
+	"buttons.charging-grip": _button("charging_grip"),
+	"accel.x": ("imu", 0),
+	"accel.y": ("imu", 1),
+	"accel.z": ("imu", 2),
+	"gyro.x": ("imu", 3),
+	"gyro.y": ("imu", 4),
+	"gyro.z": ("imu", 5),
+}
+
+_RIGHT_SOURCES = {
+	"buttons.y": _button("y"),
+	"buttons.x": _button("x"),
+	"buttons.b": _button("b"),
+	"buttons.a": _button("a"),
+	"buttons.sr": _button("right_sr"),
+	"buttons.sl": _button("right_sl"),
+	"buttons.r": _button("r"),
+	"buttons.zr": _button("zr"),
+	"analog-sticks.horizontal": ("stick", 9, False),
+	"analog-sticks.vertical": ("stick", 9, True),
+}
+
+_LEFT_SOURCES = {
+	"buttons.down": _button("down"),
+	"buttons.up": _button("up"),
+	"buttons.right": _button("right"),
+	"buttons.left": _button("left"),
+	"buttons.sr": _button("left_sr"),
+	"buttons.sl": _button("left_sl"),
+	"buttons.l": _button("l"),
+	"buttons.zl": _button("zl"),
+	"analog-sticks.horizontal": ("stick", 6, False),
+	"analog-sticks.vertical": ("stick", 6, True),
+}
+
+
+def report_sources(is_left: bool) -> dict:
+	"""config path (e.g. "buttons.a") -> source in the raw report"""
+	sources = dict(_SHARED_SOURCES)
+	sources.update(_LEFT_SOURCES if is_left else _RIGHT_SOURCES)
+	return sources
+
+
+def compile_osc_plan(mappings, send, make_imu_decoder=None):
+	"""
+	mappings: iterable of (source, osc_path, mapper or None)
+	send: send(osc_path, value), called for every value that changed
+	make_imu_decoder: returns an ImuDecoder, only called if an IMU source is mapped
+
+	Returns run(report). Each source is read once per report however many
+	mappings use it, bit fields are grouped by their byte and only groups
+	whose bytes changed since the previous report are evaluated.
+	"""
+	if log.isEnabledFor(logging.DEBUG):
+		_send = send
+
+		def send(osc_path, val):
+			log.debug("send %s <- %s", osc_path, val)
+			_send(osc_path, val)
+
+	# source -> outputs, outputs being [(slot, mapper, osc_path)]
+	outputs = {}
+	for slot, (source, osc_path, mapper) in enumerate(mappings):
+		outputs.setdefault(source, []).append((slot, mapper, osc_path))
+	prev = [None] * sum(len(o) for o in outputs.values())
+
+	bits, sticks, imu = {}, [], []
+	for source, outs in outputs.items():
+		kind = source[0]
+		outs = tuple(outs)
+		if kind == "bits":
+			_, byte, shift, mask = source
+			bits.setdefault(byte, []).append((shift, mask, outs))
+		elif kind == "stick":
+			_, first, vertical = source
+			sticks.append((first, vertical, outs))
+		elif kind == "imu":
+			imu.append((source[1], outs))
+		else:
+			raise ValueError(f"unknown source {source!r}")
+
+	bits = tuple((byte, tuple(fields)) for byte, fields in sorted(bits.items()))
+	stick_groups = {}
+	for first, vertical, outs in sticks:
+		stick_groups.setdefault(first, []).append((vertical, outs))
+	sticks = tuple((first, tuple(axes)) for first, axes in sorted(stick_groups.items()))
+	imu = tuple(imu)
+	imu_decode = make_imu_decoder().decode if imu else None
+
+	# Dependency index: the report bytes each group reads. A group is only
+	# evaluated when one of its bytes differs from the previous report, so a
+	# buttons only config costs a compare of bytes 3..5 for most reports.
+	dependencies = [(byte, byte + 1) for byte, _ in bits]
+	dependencies += [(first, first + 3) for first, _ in sticks]
+	if imu:
+		dependencies.append((IMU_FIRST, IMU_END))
+	log.debug("osc plan reads report bytes %s", dependencies)
+
+	last = bytearray(REPORT_SIZE)
+	primed = False
+
+	def run(report):
+		nonlocal primed
+		for byte, fields in bits:
+			b = report[byte]
+			if primed and b == last[byte]:
+				continue
+			for shift, mask, outs in fields:
+				raw = (b >> shift) & mask
+				for slot, mapper, osc_path in outs:
+					val = raw if mapper is None else mapper(raw)
+					if prev[slot] != val:
+						prev[slot] = val
+						send(osc_path, val)
+
+		for first, axes in sticks:
+			b0, b1, b2 = report[first], report[first + 1], report[first + 2]
+			if primed and b0 == last[first] and b1 == last[first + 1] and b2 == last[first + 2]:
+				continue
+			for vertical, outs in axes:
+				raw = (b1 >> 4) | (b2 << 4) if vertical else b0 | ((b1 & 0xF) << 8)
+				for slot, mapper, osc_path in outs:
+					val = raw if mapper is None else mapper(raw)
+					if prev[slot] != val:
+						prev[slot] = val
+						send(osc_path, val)
+
+		if imu and (not primed or report[IMU_FIRST:IMU_END] != last[IMU_FIRST:IMU_END]):
+			values = imu_decode(report)
+			for index, outs in imu:
+				raw = values[index]
+				for slot, mapper, osc_path in outs:
+					val = raw if mapper is None else mapper(raw)
+					if prev[slot] != val:
+						prev[slot] = val
+						send(osc_path, val)
+
+		last[:] = report
+		primed = True
+
+	return run
@@ -1,6 +1,11 @@
 from .joycon import JoyCon
+from .report import JoyConReport
+from .history import ReportHistory
+from .calibration_cache import CalibrationCache
+from .recording import ReportRecorder, ReplayDevice, read_recording
 from .wrappers import PythonicJoyCon  # as JoyCon
 from .gyro import GyroTrackingJoyCon
+from .fusion import MadgwickFilter, MahonyFilter
 from .event import ButtonEventJoyCon
 from .device import get_device_ids, get_ids_of_type
 from .device import is_id_L
@@ -12,9 +17,16 @@ __version__ = "0.2.4"
 
 __all__ = [
     "ButtonEventJoyCon",
+    "CalibrationCache",
     "GyroTrackingJoyCon",
     "JoyCon",
+    "JoyConReport",
+    "MadgwickFilter",
+    "MahonyFilter",
     "PythonicJoyCon",
+    "ReplayDevice",
+    "ReportHistory",
+    "ReportRecorder",
     "get_L_id",
     "get_L_ids",
     "get_R_id",
@@ -22,4 +34,5 @@ __all__ = [
     "get_device_ids",
     "get_ids_of_type",
     "is_id_L",
+    "read_recording",
 ]
@@ -0,0 +1,74 @@
+"""
+On-disk cache of the device info read from SPI flash at connect time
+(colors, IMU and stick calibration), keyed by controller serial.
+"""
+import json
+import os
+import threading
+import zlib
+from pathlib import Path
+
+CACHE_VERSION = 2
+
+DEVICE_INFO_KEYS = (
+    "color_body", "color_btn",
+    "accel_offset", "accel_coeff",
+    "gyro_offset", "gyro_coeff",
+    "stick_left", "stick_right",
+)
+
+
+def _checksum(info):
+    canonical = json.dumps([info.get(key) for key in DEVICE_INFO_KEYS])
+    return zlib.crc32(canonical.encode())
+
+
+class CalibrationCache:
+    """
+    A JSON file like `{"version": 2, "devices": {serial: info}}`, where info
+    holds the DEVICE_INFO_KEYS as lists of ints plus a crc32 `checksum` of
+    them. Entries with a wrong checksum and files of another version are
+    ignored. Safe to use from several reader threads.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._devices = self._load()
+
+    def _load(self):
+        try:
+            data = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(data, dict) or data.get("version") != CACHE_VERSION:
+            return {}
+        devices = data.get("devices")
+        return devices if isinstance(devices, dict) else {}
+
+    def get(self, serial):
+        """Cached info of `serial` (without the checksum), or None"""
+        if not serial:
+            return None
+        with self._lock:
+            entry = self._devices.get(serial)
+        if not isinstance(entry, dict) or any(key not in entry for key in DEVICE_INFO_KEYS):
+            return None
+        if entry.get("checksum") != _checksum(entry):
+            return None
+        return {key: entry[key] for key in DEVICE_INFO_KEYS}
+
+    def put(self, serial, info):
+        if not serial:
+            return
+        entry = {key: [int(i) for i in info[key]] for key in DEVICE_INFO_KEYS}
+        entry["checksum"] = _checksum(entry)
+        with self._lock:
+            if self._devices.get(serial) == entry:
+                return
+            self._devices[serial] = entry
+            data = json.dumps({"version": CACHE_VERSION, "devices": self._devices}, indent=1)
+            # replace atomically, a crash never leaves a half written file
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            tmp.write_text(data)
+            os.replace(tmp, self.path)
@@ -0,0 +1,176 @@
+"""
+IMU fusion filters: orientation from gyro rates, with the tilt corrected
+towards gravity as measured by the accelerometer.
+
+Both filters keep `q = (w, x, y, z)`, the rotation from the controller's
+frame to the world frame, whose z axis points up. Yaw is not observable
+from gravity and is only integrated. update() takes the 18 values of an
+ImuDecoder (three samples of accel xyz in g, gyro xyz in rad/s) and the
+seconds between two samples, and processes all three samples in one call.
+
+The accelerometer is only trusted while the mean of the three samples is
+between `accel_min` and `accel_max` g, i.e. when the controller is not
+being accelerated much.
+"""
+from math import sqrt
+
+_GYRO_OFFSETS = (3, 9, 15)
+
+
+class _Filter:
+    def __init__(self, accel_min=0.8, accel_max=1.2):
+        # against the sum of the three samples, which is compared squared
+        self._accel_range = (9 * accel_min * accel_min, 9 * accel_max * accel_max)
+        self.reset()
+
+    def reset(self, q=(1.0, 0.0, 0.0, 0.0)):
+        self.q = tuple(q)
+
+
+class MadgwickFilter(_Filter):
+    """
+    Madgwick's gradient descent filter. `beta` (rad/s) is how fast the tilt
+    follows the accelerometer, higher corrects drift faster but lets
+    accelerations disturb the tilt more.
+    """
+
+    def __init__(self, beta=0.05, **kwargs):
+        self.beta = beta
+        super().__init__(**kwargs)
+
+    def update(self, v, dt):
+        q0, q1, q2, q3 = self.q
+        h = 0.5 * dt
+        # the gyro samples are integrated one by one, the correction is
+        # computed once from the mean accel and the norm restored once
+        for i in _GYRO_OFFSETS:
+            gx, gy, gz = v[i] * h, v[i + 1] * h, v[i + 2] * h
+            q0, q1, q2, q3 = (
+                q0 - q1 * gx - q2 * gy - q3 * gz,
+                q1 + q0 * gx + q2 * gz - q3 * gy,
+                q2 + q0 * gy - q1 * gz + q3 * gx,
+                q3 + q0 * gz + q1 * gy - q2 * gx,
+            )
+
+        ax, ay, az = v[0] + v[6] + v[12], v[1] + v[7] + v[13], v[2] + v[8] + v[14]
+        norm = ax * ax + ay * ay + az * az
+        low, high = self._accel_range
+        if low < norm < high:
+            r = 1.0 / sqrt(norm)
+            ax *= r
+            ay *= r
+            az *= r
+            # gradient of the error between measured and estimated gravity
+            q0q0, q1q1, q2q2, q3q3 = q0 * q0, q1 * q1, q2 * q2, q3 * q3
+            s0 = 4.0 * q0 * (q2q2 + q1q1) + 2.0 * (q2 * ax - q1 * ay)
+            s1 = (4.0 * q1 * (q3q3 + q0q0 - 1.0 + 2.0 * (q1q1 + q2q2) + az)
+                  - 2.0 * (q3 * ax + q0 * ay))
+            s2 = (4.0 * q2 * (q0q0 + q3q3 - 1.0 + 2.0 * (q1q1 + q2q2) + az)
+                  + 2.0 * (q0 * ax - q3 * ay))
+            s3 = 4.0 * q3 * (q1q1 + q2q2) - 2.0 * (q1 * ax + q2 * ay)
+            norm = s0 * s0 + s1 * s1 + s2 * s2 + s3 * s3
+            if norm > 0.0:
+                r = 3.0 * dt * self.beta / sqrt(norm)
+                q0 -= s0 * r
+                q1 -= s1 * r
+                q2 -= s2 * r
+                q3 -= s3 * r
+
+        r = 1.0 / sqrt(q0 * q0 + q1 * q1 + q2 * q2 + q3 * q3)
+        self.q = (q0 * r, q1 * r, q2 * r, q3 * r)
+
+
+class MahonyFilter(_Filter):
+    """
+    Mahony's complementary filter: the cross product of measured and
+    estimated gravity is fed back into the gyro rates, proportionally with
+    `kp` and, to learn a gyro bias, integrated with `ki`.
+    """
+
+    def __init__(self, kp=1.0, ki=0.0, **kwargs):
+        self.kp = kp
+        self.ki = ki
+        super().__init__(**kwargs)
+
+    def reset(self, q=(1.0, 0.0, 0.0, 0.0)):
+        super().reset(q)
+        self.bias = (0.0, 0.0, 0.0)  # integral feedback, rad/s
+
+    def update(self, v, dt):
+        q0, q1, q2, q3 = self.q
+        bx, by, bz = self.bias
+
+        # the feedback is computed once from the mean accel and added to
+        # all three gyro samples
+        ax, ay, az = v[0] + v[6] + v[12], v[1] + v[7] + v[13], v[2] + v[8] + v[14]
+        norm = ax * ax + ay * ay + az * az
+        low, high = self._accel_range
+        if low < norm < high:
+            r = 1.0 / sqrt(norm)
+            ax *= r
+            ay *= r
+            az *= r
+            # gravity in the controller frame as the orientation has it
+            vx = 2.0 * (q1 * q3 - q0 * q2)
+            vy = 2.0 * (q0 * q1 + q2 * q3)
+            vz = q0 * q0 - q1 * q1 - q2 * q2 + q3 * q3
+            ex = ay * vz - az * vy
+            ey = az * vx - ax * vz
+            ez = ax * vy - ay * vx
+            if self.ki:
+                ki_dt = 3.0 * dt * self.ki
+                bx += ki_dt * ex
+                by += ki_dt * ey
+                bz += ki_dt * ez
+                self.bias = (bx, by, bz)
+            kp = self.kp
+            bx += kp * ex
+            by += kp * ey
+            bz += kp * ez
+
+        h = 0.5 * dt
+        for i in _GYRO_OFFSETS:
+            gx, gy, gz = (v[i] + bx) * h, (v[i + 1] + by) * h, (v[i + 2] + bz) * h
+            q0, q1, q2, q3 = (
+                q0 - q1 * gx - q2 * gy - q3 * gz,
+                q1 + q0 * gx + q2 * gz - q3 * gy,
+                q2 + q0 * gy - q1 * gz + q3 * gx,
+                q3 + q0 * gz + q1 * gy - q2 * gx,
+            )
+        r = 1.0 / sqrt(q0 * q0 + q1 * q1 + q2 * q2 + q3 * q3)
+        self.q = (q0 * r, q1 * r, q2 * r, q3 * r)
+
+
+FILTERS = {"madgwick": MadgwickFilter, "mahony": MahonyFilter}
+
+
+def rotate(q, v):
+    """`v` rotated by `q`, i.e. from the controller frame to the world frame"""
+    w, x, y, z = q
+    vx, vy, vz = v
+    # t = 2 * cross(q.xyz, v); v + w * t + cross(q.xyz, t)
+    tx = 2.0 * (y * vz - z * vy)
+    ty = 2.0 * (z * vx - x * vz)
+    tz = 2.0 * (x * vy - y * vx)
+    return (
+        vx + w * tx + y * tz - z * ty,
+        vy + w * ty + z * tx - x * tz,
+        vz + w * tz + x * ty - y * tx,
+    )
+
+
+def from_gravity(ax, ay, az):
+    """
+    The orientation without yaw in which the controller would measure
+    gravity as `(ax, ay, az)`, identity if nothing was measured
+    """
+    norm = sqrt(ax * ax + ay * ay + az * az)
+    if norm == 0.0:
+        return (1.0, 0.0, 0.0, 0.0)
+    ax, ay, az = ax / norm, ay / norm, az / norm
+    if az < -0.999999:
+        return (0.0, 1.0, 0.0, 0.0)  # upside down
+    # shortest rotation taking the measured gravity onto the world's up
+    w, x, y = 1.0 + az, ay, -ax
+    r = 1.0 / sqrt(w * w + x * x + y * y)
+    return (w * r, x * r, y * r, 0.0)
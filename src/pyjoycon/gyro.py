@@ -1,8 +1,19 @@
-from .wrappers import PythonicJoyCon
-from glm import vec2, vec3, quat, angleAxis, eulerAngles
+from .wrappers import PythonicJoyCon, ACCEL_IN_G
+from .fusion import FILTERS, rotate, from_gravity
+from glm import vec2, vec3, quat, eulerAngles
+from math import pi
 from typing import Optional
 import time
 
+# The calibrated gyro values are normalized to a coefficient of 0x343b, at
+# which the sensor reads 936 / 0x343b = 0.07 degrees per second per unit.
+GYRO_IN_RAD_PER_S = 936.0 / 0x343b * pi / 180
+
+# The report timer byte counts ~5 ms ticks: three per report in the
+# standard full mode, one per IMU sample.
+TIMER_TICK = 0.005
+REPORT_TICKS = 3
+
 
 class GyroTrackingJoyCon(PythonicJoyCon):
     """
@@ -10,10 +21,28 @@ class GyroTrackingJoyCon(PythonicJoyCon):
     and deduces the current rotation of the JoyCon. Can be used to create a
     pointer rotate an object or pointin a direction. Comes with the need to be
     calibrated.
+
+    The orientation comes from a fusion filter (see fusion.py), `fusion` is
+    "madgwick", "mahony" or a filter instance. Each report's three samples
+    are integrated over the time its timer byte says has passed, and the
+    tilt is pulled towards gravity as measured by the accelerometer.
     """
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, fusion="madgwick", **kwargs):
         super().__init__(*args, simple_mode=False, **kwargs)
 
+        self.fusion = FILTERS[fusion]() if isinstance(fusion, str) else fusion
+        # seconds per IMU sample by timer step since the previous report.
+        # Beyond one and a half of the usual step reports were lost, the
+        # three samples still only cover the last one: the usual step, as
+        # for a repeated timer.
+        nominal = REPORT_TICKS * TIMER_TICK / 3
+        self._sample_dt = [
+            step * TIMER_TICK / 3 if 0 < step <= REPORT_TICKS + REPORT_TICKS // 2 else nominal
+            for step in range(256)
+        ]
+        # only used from the update hook, so its buffer can be reused
+        self._fusion_imu = self.imu_decoder(ACCEL_IN_G, GYRO_IN_RAD_PER_S, self._ime_yz_coeff)
+
         # set internal state:
         self.reset_orientation()
 
@@ -35,6 +64,25 @@ class GyroTrackingJoyCon(PythonicJoyCon):
     def rotation(self) -> vec3:
         return -eulerAngles(self.direction_Q)
 
+    @property
+    def direction_X(self) -> vec3:
+        return vec3(rotate(self.fusion.q, (1.0, 0.0, 0.0)))
+
+    @property
+    def direction_Y(self) -> vec3:
+        return vec3(rotate(self.fusion.q, (0.0, 1.0, 0.0)))
+
+    @property
+    def direction_Z(self) -> vec3:
+        return vec3(rotate(self.fusion.q, (0.0, 0.0, 1.0)))
+
+    @property
+    def direction_Q(self) -> quat:
+        # from the world to the controller frame, the inverse of fusion.q,
+        # as the angleAxis integration this replaced accumulated it
+        w, x, y, z = self.fusion.q
+        return quat(w, -x, -y, -z)
+
     is_calibrating = False
 
     def calibrate(self, seconds=2):
@@ -56,10 +104,13 @@ class GyroTrackingJoyCon(PythonicJoyCon):
         self.set_gyro_calibration(gyro_offset)
 
     def reset_orientation(self):
-        self.direction_X = vec3(1, 0, 0)
-        self.direction_Y = vec3(0, 1, 0)
-        self.direction_Z = vec3(0, 0, 1)
-        self.direction_Q = quat()
+        """
+        Makes the current direction the forward one. The tilt is taken from
+        the latest accelerometer sample if there is one.
+        """
+        ax, ay, az = self._fusion_imu.values[12:15]
+        self.fusion.reset(from_gravity(ax, ay, az))
+        self._last_timer = None
 
     @staticmethod
     def _gyro_update_hook(self):
@@ -71,14 +122,8 @@ class GyroTrackingJoyCon(PythonicJoyCon):
                     self.calibration_acumulator += xyz
                 self.calibration_acumulations += 3
 
-        for gx, gy, gz in self.gyro_in_rad:
-            # TODO: find out why 1/86 works, and not 1/60 or 1/(60*30)
-            rotation \
-                = angleAxis(gx * (-1/86), self.direction_X) \
-                * angleAxis(gy * (-1/86), self.direction_Y) \
-                * angleAxis(gz * (-1/86), self.direction_Z)
-
-            self.direction_X *= rotation
-            self.direction_Y *= rotation
-            self.direction_Z *= rotation
-            self.direction_Q *= rotation
+        report = self._input_report
+        timer, last = report[1], self._last_timer
+        self._last_timer = timer
+        dt = self._sample_dt[(timer - last) & 0xFF if last is not None else 0]
+        self.fusion.update(self._fusion_imu.decode(report), dt)
@@ -0,0 +1,114 @@
+"""
+Direct access to Linux /dev/hidrawN devices, without hidapi.
+
+The device is a plain file descriptor, so it can be registered with an event
+loop (see JoyCon.attach_to_loop) instead of being read by a thread.
+"""
+import io
+import os
+from pathlib import Path
+
+from .constants import JOYCON_VENDOR_ID, JOYCON_PRODUCT_IDS
+
+SYSFS_HIDRAW = Path("/sys/class/hidraw")
+
+
+def _read_uevent(hidraw_dir):
+    try:
+        text = (hidraw_dir / "device" / "uevent").read_text()
+    except OSError:
+        return {}
+    return dict(line.split("=", 1) for line in text.splitlines() if "=" in line)
+
+
+def enumerate_hidraw():
+    """
+    returns a list of tuples like `(path, vendor_id, product_id, serial)`
+    """
+    out = []
+    if not SYSFS_HIDRAW.is_dir():
+        return out
+    for hidraw_dir in sorted(SYSFS_HIDRAW.iterdir()):
+        uevent = _read_uevent(hidraw_dir)
+        try:
+            # HID_ID=0005:0000057E:00002006 (bus:vendor:product)
+            _, vendor_id, product_id = uevent["HID_ID"].split(":")
+        except (KeyError, ValueError):
+            continue
+        out.append((
+            "/dev/" + hidraw_dir.name,
+            int(vendor_id, 16),
+            int(product_id, 16),
+            uevent.get("HID_UNIQ") or None,
+        ))
+    return out
+
+
+def find_hidraw_path(vendor_id, product_id, serial=None):
+    for path, vid, pid, uniq in enumerate_hidraw():
+        if vid != vendor_id or pid != product_id:
+            continue
+        if serial is None or (uniq or "").lower() == serial.lower():
+            return path
+    return None
+
+
+def get_device_ids():
+    """
+    like pyjoycon.get_device_ids, but only reads sysfs instead of having
+    hidapi enumerate every HID device
+    """
+    return [
+        (vendor_id, product_id, serial)
+        for _, vendor_id, product_id, serial in enumerate_hidraw()
+        if vendor_id == JOYCON_VENDOR_ID and product_id in JOYCON_PRODUCT_IDS
+    ]
+
+
+class HidrawDevice:
+    """
+    Implements the read/write/close subset of the hid packages used by JoyCon,
+    plus fileno() and set_blocking() for event loop use and readinto() for
+    reading into preallocated buffers.
+
+    In non-blocking mode read() raises BlockingIOError when no report is queued.
+    """
+
+    def __init__(self, path=None, fd=None):
+        """Opens `path`, or wraps an already open `fd` (taking ownership)"""
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_CLOEXEC) if fd is None else fd
+        # FileIO.readinto does not allocate, unlike os.read or os.readv([...])
+        self._file = io.FileIO(self._fd, "r+", closefd=False)
+
+    @classmethod
+    def open_joycon(cls, vendor_id, product_id, serial=None):
+        path = find_hidraw_path(vendor_id, product_id, serial)
+        if path is None:
+            raise IOError(f"no hidraw device for {vendor_id:04x}:{product_id:04x} {serial}")
+        return cls(path)
+
+    def fileno(self):
+        return self._fd
+
+    def set_blocking(self, blocking):
+        os.set_blocking(self._fd, blocking)
+
+    def read(self, size, timeout=None):
+        return os.read(self._fd, size)
+
+    def readinto(self, buffer):
+        """Reads one report into `buffer`, returns its size (0 at EOF)"""
+        size = self._file.readinto(buffer)
+        if size is None:  # non-blocking and nothing queued
+            raise BlockingIOError
+        return size
+
+    def write(self, data):
+        return os.write(self._fd, data)
+
+    def close(self):
+        if self._fd >= 0:
+            self._file.close()
+            os.close(self._fd)
+            self._fd = -1
@@ -0,0 +1,96 @@
+from array import array
+
+
+class ReportHistory:
+    """
+    Ring buffer of the last `capacity` input reports in one preallocated
+    bytearray. Every report gets a sequence number (0, 1, 2, ...), a monotonic
+    receive timestamp, and its timer byte (`report[1]`) can be read back.
+
+    All accessors return memoryviews into the ring, nothing is copied. A view
+    is overwritten `capacity` reports later, copy it if you need it longer or
+    check `is_valid(seq)` after using it.
+    """
+
+    def __init__(self, capacity=64, report_size=49):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.report_size = report_size
+        self.seq = 0  # sequence number of the next report, i.e. reports seen
+        # one more slot than capacity, so a read in progress never overwrites
+        # an entry which is still part of the history
+        self._slots_count = capacity + 1
+        self._buffer = bytearray(self._slots_count * report_size)
+        view = memoryview(self._buffer)
+        self._slots = [
+            view[i * report_size:(i + 1) * report_size]
+            for i in range(self._slots_count)
+        ]
+        # accel xyz, gyro xyz as int16 for each of the three IMU samples
+        self._imu = [
+            [slot[13 + 12 * i:25 + 12 * i].cast("h") for i in range(3)]
+            for slot in self._slots
+        ]
+        self._timestamps = array("d", bytes(8 * self._slots_count))
+
+    def __len__(self):
+        return min(self.seq, self.capacity)
+
+    def next_slot(self) -> memoryview:
+        """The buffer the next report goes to, for reading straight into it"""
+        return self._slots[self.seq % self._slots_count]
+
+    def commit(self, report, timestamp):
+        """Appends `report`, which may already be in `next_slot()`"""
+        index = self.seq % self._slots_count
+        slot = self._slots[index]
+        if report is not slot:
+            slot[:len(report)] = report
+        self._timestamps[index] = timestamp
+        self.seq += 1
+
+    @property
+    def first_seq(self):
+        """oldest sequence number still in the history"""
+        return max(0, self.seq - self.capacity)
+
+    def is_valid(self, seq):
+        return self.first_seq <= seq < self.seq
+
+    def _index(self, seq):
+        if not self.is_valid(seq):
+            raise IndexError(f"report {seq} is not in the history")
+        return seq % self._slots_count
+
+    def report(self, seq) -> memoryview:
+        return self._slots[self._index(seq)]
+
+    def timestamp(self, seq) -> float:
+        return self._timestamps[self._index(seq)]
+
+    def timer(self, seq) -> int:
+        return self._slots[self._index(seq)][1]
+
+    def since(self, seq):
+        """Yields `(seq, report)` for every report from `seq` on, oldest first"""
+        for s in range(max(seq, self.first_seq), self.seq):
+            yield s, self._slots[s % self._slots_count]
+
+    def last_imu(self, k):
+        """
+        The last `k` raw IMU samples, oldest first, as memoryviews of six
+        int16: accel xyz, gyro xyz. Each report holds three samples.
+        """
+        out = []
+        s = self.seq - 1
+        first = self.first_seq
+        while len(out) < k and s >= first:
+            samples = self._imu[s % self._slots_count]
+            for i in (2, 1, 0):
+                if len(out) == k:
+                    break
+                out.append(samples[i])
+            s -= 1
+        out.reverse()
+        return out
@@ -1,8 +1,18 @@
 from .constants import JOYCON_VENDOR_ID, JOYCON_PRODUCT_IDS
 from .constants import JOYCON_L_PRODUCT_ID, JOYCON_R_PRODUCT_ID
+from .report import JoyConReport, ReportDecoder, ImuDecoder
+from .history import ReportHistory
+from .subcommand import ReplyRouter
+from .rumble import RumbleEncoder
+from .writer import OutputWriter
+from . import hidraw
+from .recording import ReplayDevice
 import hid
+import asyncio
 import time
 import threading
+from collections import deque
+from concurrent.futures import Future
 from typing import Optional
 
 # TODO: disconnect, power off sequence
@@ -11,6 +21,10 @@ from typing import Optional
 class JoyCon:
     _INPUT_REPORT_SIZE = 49
     _INPUT_REPORT_PERIOD = 0.015
+    _SPI_CHUNK_SIZE = 0x1d
+    _SPI_PIPELINE = 4
+    _SPI_RETRIES = 3
+    _SUBCOMMAND_TIMEOUT = 0.5
     _RUMBLE_DATA = b'\x00\x01\x40\x40\x00\x01\x40\x40'
 
     vendor_id  : int
@@ -19,8 +33,29 @@ class JoyCon:
     simple_mode: bool
     color_body : (int, int, int)
     color_btn  : (int, int, int)
-
-    def __init__(self, vendor_id: int, product_id: int, serial: str = None, simple_mode=False):
+    # (center_x, center_y, below_x, below_y, above_x, above_y)
+    stick_left_calibration : (int, int, int, int, int, int)
+    stick_right_calibration: (int, int, int, int, int, int)
+
+    def __init__(self, vendor_id: int, product_id: int, serial: str = None, simple_mode=False,
+                 backend: str = None, threaded=True, history_size=64,
+                 calibration_cache=None, revalidate_calibration=False, output_gap=0.015):
+        """
+        backend: None picks the hid/hidapi package, "hidraw" opens /dev/hidrawN (Linux),
+            "replay:<path>" plays a recording back at its timing and
+            "replay-fast:<path>" as fast as it is read (see recording.py)
+        threaded: read input reports in a daemon thread. If False, call
+            attach_to_loop() to have an asyncio event loop read them instead.
+        history_size: how many input reports `self.history` keeps
+        calibration_cache: a CalibrationCache. On a hit for `serial` the SPI
+            flash reads of colors and calibration are skipped.
+        revalidate_calibration: after a cache hit, read the flash anyway on
+            the daemon thread before the first input report and update the
+            cache and calibration if they differ. Needs `threaded`.
+        output_gap: output reports are written by a thread at least this many
+            seconds apart, rumble first (see OutputWriter). None writes them
+            right away on the calling thread, as the replay backends always do.
+        """
         if vendor_id != JOYCON_VENDOR_ID:
             raise ValueError(f'vendor_id is invalid: {vendor_id!r}')
 
@@ -31,28 +66,62 @@ class JoyCon:
         self.product_id  = product_id
         self.serial      = serial
         self.simple_mode = simple_mode  # TODO: It's for reporting mode 0x3f
-        
+        self.backend     = backend
+
         # setup internal state
         self._input_hooks = []
         self._input_report = bytes(self._INPUT_REPORT_SIZE)
+        self.history = ReportHistory(history_size, self._INPUT_REPORT_SIZE)
         self._packet_number = 0
+        self._write_lock = threading.Lock()
+        self._replies = ReplyRouter()
+        self.rumble_encoder = RumbleEncoder()
+        self._report_decoder = ReportDecoder()
+        self._imu_decoders = [self._report_decoder]
+        self._report_snapshot = (None, None)
+        self._update_input_report_thread = None
+        self._loop = None
+        self._calibration_cache = calibration_cache
+        self.device_info_cached = False
         self.set_accel_calibration((0, 0, 0), (1, 1, 1))
         self.set_gyro_calibration((0, 0, 0), (1, 1, 1))
 
         # connect to joycon
         self._joycon_device = self._open(vendor_id, product_id, serial=serial)
-        self._read_joycon_data()
-        self._setup_sensors()
-
-        # start talking with the joycon in a daemon thread
-        self._update_input_report_thread \
-            = threading.Thread(target=self._update_input_report)
-        self._update_input_report_thread.setDaemon(True)
-        self._update_input_report_thread.start()
+        self._readinto = getattr(self._joycon_device, "readinto", None)
+        if isinstance(self._joycon_device, ReplayDevice):
+            # it answers in write(): while the writer held a subcommand back,
+            # waiting for its reply would read on through the recording
+            output_gap = None
+        self.output_writer = None if output_gap is None else \
+            OutputWriter(self._write_output_report_now, output_gap)
+        try:
+            self._read_joycon_data()
+            self._setup_sensors()
+            self._revalidate_calibration = \
+                threaded and revalidate_calibration and self.device_info_cached
+
+            # start talking with the joycon in a daemon thread
+            if threaded:
+                self._update_input_report_thread \
+                    = threading.Thread(target=self._update_input_report)
+                self._update_input_report_thread.setDaemon(True)
+                self._update_input_report_thread.start()
+        except BaseException:
+            # e.g. a failed SPI read: stop the writer thread, close the device
+            self._close()
+            raise
 
     def _open(self, vendor_id, product_id, serial):
         try:
-            if hasattr(hid, "device"):  # hidapi
+            if self.backend == "hidraw":
+                _joycon_device = hidraw.HidrawDevice.open_joycon(vendor_id, product_id, serial)
+            elif self.backend is not None and self.backend.startswith(("replay:", "replay-fast:")):
+                mode, path = self.backend.split(":", 1)
+                _joycon_device = ReplayDevice(path, realtime=mode == "replay")
+            elif self.backend is not None:
+                raise ValueError(f"unknown backend: {self.backend!r}")
+            elif hasattr(hid, "device"):  # hidapi
                 _joycon_device = hid.device()
                 _joycon_device.open(vendor_id, product_id, serial)
             elif hasattr(hid, "Device"):  # hid
@@ -66,112 +135,275 @@ class JoyCon:
 
     def _close(self):
         if hasattr(self, "_joycon_device"):
+            if self.output_writer is not None:
+                self.output_writer.close()
+            self.detach_from_loop()
             self._joycon_device.close()
             del self._joycon_device
 
     def _read_input_report(self) -> bytes:
+        if self._readinto is not None:
+            # no allocations: read straight into the next history slot, it
+            # stays valid for history_size reports after being handled
+            buffer = self.history.next_slot()
+            if not self._readinto(buffer):
+                raise TimeoutError("Controller read timed out")
+            return buffer
         data = self._joycon_device.read(self._INPUT_REPORT_SIZE)# notele mode will fail: timeout=1000*5
         if not data:
             raise TimeoutError("Controller read timed out")
         return bytes(data)
 
     def _write_output_report(self, command, subcommand, argument):
-        # TODO: add documentation
-        self._joycon_device.write(b''.join([
-            command,
-            self._packet_number.to_bytes(1, byteorder='little'),
-            self._RUMBLE_DATA,
-            subcommand,
-            argument,
-        ]))
-        self._packet_number = (self._packet_number + 1) & 0xF
-
-    def _send_subcmd_get_response(self, subcommand, argument) -> (bool, bytes):
-        # TODO: handle subcmd when daemon is running
+        """queues the report with the output writer, if there is one"""
+        if self.output_writer is not None:
+            self.output_writer.put(command, subcommand, argument)
+        else:
+            self._write_output_report_now(command, subcommand, argument)
+
+    def _write_output_report_now(self, command, subcommand, argument):
+        with self._write_lock:  # packet numbers must not repeat
+            self._joycon_device.write(b''.join([
+                command,
+                self._packet_number.to_bytes(1, byteorder='little'),
+                self._RUMBLE_DATA,
+                subcommand,
+                argument,
+            ]))
+            self._packet_number = (self._packet_number + 1) & 0xF
+
+    def send_subcommand(self, subcommand: bytes, argument: bytes = b'', timeout=None) -> Future:
+        """
+        Sends a subcommand. The Future resolves to its reply, the bytes of
+        the 0x21 report from the ACK byte on, or fails with TimeoutError if
+        none came within `timeout` seconds. Can be called from any thread
+        while input reports are read, use asyncio.wrap_future() to await it.
+        Round trip times are collected in `subcommand_stats`.
+        """
+        sent = time.monotonic()
+        future = self._replies.expect(
+            subcommand[0], argument, sent, timeout or self._SUBCOMMAND_TIMEOUT)
         self._write_output_report(b'\x01', subcommand, argument)
+        return future
+
+    @property
+    def subcommand_stats(self) -> dict:
+        """subcommand id: SubcommandStats"""
+        return self._replies.stats
+
+    def _wait_for_reply(self, future: Future) -> bytes:
+        thread = self._update_input_report_thread
+        if self._loop is not None or (
+                thread is not None and thread.is_alive()
+                and thread is not threading.current_thread()):
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                loop = None
+            if loop is not None and loop is self._loop:
+                raise RuntimeError("would block the loop reading replies, await "
+                                   "asyncio.wrap_future(send_subcommand(...)) instead")
+            # the reader resolves or expires it, unless reports stop coming
+            try:
+                return future.result(max(future.deadline - time.monotonic(), 0))
+            except TimeoutError:
+                self._replies.expire(max(time.monotonic(), future.deadline))
+                return future.result(0)
+        # nobody else reads the device: read until the reply is there
+        while not future.done():
+            self._handle_input_report(self._read_input_report(), time.monotonic())
+        return future.result()
 
-        report = self._read_input_report()
-        while report[0] != 0x21:  # TODO, avoid this, await daemon instead
-            report = self._read_input_report()
-
-        # TODO, remove, see the todo above
-        assert report[1:2] != subcommand, "THREAD carefully"
-
+    def _send_subcmd_get_response(self, subcommand, argument) -> (bool, bytes):
+        reply = self._wait_for_reply(self.send_subcommand(subcommand, argument))
         # TODO: determine if the cut bytes are worth anything
-
-        return report[13] & 0x80, report[13:]  # (ack, data)
+        return reply[0] & 0x80, reply  # (ack, data)
 
     def _spi_flash_read(self, address, size) -> bytes:
-        assert size <= 0x1d
-        argument = address.to_bytes(4, "little") + size.to_bytes(1, "little")
-        ack, report = self._send_subcmd_get_response(b'\x10', argument)
-        if not ack:
-            raise IOError("After SPI read @ {address:#06x}: got NACK")
-
-        if report[:2] != b'\x90\x10':
-            raise IOError("Something else than the expected ACK was recieved!")
-        assert report[2:7] == argument, (report[2:5], argument)
-
-        return report[7:size+7]
+        return self.spi_flash_read(address, size, pipeline=1)
+
+    def spi_flash_read(self, address, size, pipeline=None) -> bytes:
+        """
+        Reads `size` bytes of SPI flash from `address`, in requests of up to
+        0x1d bytes with up to `pipeline` of them in flight. Replies are matched
+        by the address and size they echo, so their order does not matter.
+        Requests which time out are sent again up to _SPI_RETRIES times.
+        """
+        pipeline = pipeline or self._SPI_PIPELINE
+        end = address + size
+        unsent = [
+            (chunk, min(self._SPI_CHUNK_SIZE, end - chunk))
+            for chunk in range(address, end, self._SPI_CHUNK_SIZE)
+        ]
+        unsent.reverse()  # pop() in address order
+        in_flight = deque()  # (chunk address, argument, future, retries)
+        out = bytearray(size)
+        while unsent or in_flight:
+            while unsent and len(in_flight) < pipeline:
+                chunk, chunk_size = unsent.pop()
+                argument = chunk.to_bytes(4, "little") + chunk_size.to_bytes(1, "little")
+                in_flight.append((chunk, argument, self.send_subcommand(b'\x10', argument), 0))
+
+            chunk, argument, future, retries = in_flight.popleft()
+            try:
+                reply = self._wait_for_reply(future)
+            except TimeoutError:
+                if retries == self._SPI_RETRIES:
+                    raise IOError(f"SPI read @ {chunk:#06x}: no reply")
+                in_flight.appendleft(
+                    (chunk, argument, self.send_subcommand(b'\x10', argument), retries + 1))
+                continue
+
+            if not reply[0] & 0x80:
+                raise IOError(f"After SPI read @ {chunk:#06x}: got NACK")
+            chunk_size = argument[4]
+            out[chunk - address:chunk - address + chunk_size] = reply[7:7 + chunk_size]
+        return bytes(out)
+
+    def _handle_input_report(self, report, arrival=None):
+        """`arrival`: monotonic time the read returned, now if not given"""
+        # TODO, handle input reports of type 0x3f
+        if arrival is None:
+            arrival = time.monotonic()
+        if self._replies:
+            self._replies.route(report, arrival)
+        if report[0] != 0x30:
+            return
+
+        # publish the report before its sequence number, see get_report()
+        self._input_report = report
+        self.history.commit(report, arrival)
+
+        for callback in self._input_hooks:
+            callback(self)
 
     def _update_input_report(self):  # daemon thread
+        if self._revalidate_calibration:
+            self._revalidate_device_info()
         while True:
-            report = self._read_input_report()
-            # TODO, handle input reports of type 0x21 and 0x3f
-            while report[0] != 0x30:
-                report = self._read_input_report()
-
-            self._input_report = report
-
-            for callback in self._input_hooks:
-                callback(self)
+            self._handle_input_report(self._read_input_report(), time.monotonic())
+
+    def attach_to_loop(self, loop):
+        """
+        Reads input reports from `loop` as they arrive instead of in a thread,
+        so any number of controllers share the event loop thread. Update hooks
+        then run on that thread. Needs `threaded=False` and a device with
+        fileno(), set_blocking() and read(), like the "hidraw" backend's
+        HidrawDevice. A bare socket lacks the latter two, wrap the fd of one
+        end of a socketpair in HidrawDevice(fd=...) to test without hardware.
+        """
+        if self._update_input_report_thread is not None:
+            raise RuntimeError("input reports are already read by a thread")
+        device = self._joycon_device
+        device.set_blocking(False)
+        loop.add_reader(device.fileno(), self._on_readable)
+        self._loop = loop
+
+    def detach_from_loop(self):
+        if self._loop is not None:
+            self._loop.remove_reader(self._joycon_device.fileno())
+            self._loop = None
+
+    def _on_readable(self):
+        try:
+            while True:  # drain everything queued
+                self._handle_input_report(self._read_input_report(), time.monotonic())
+        except BlockingIOError:
+            pass
+        except BaseException:
+            # like the daemon thread dying: stop reading, connected() is False
+            self.detach_from_loop()
+            raise
 
     def _read_joycon_data(self):
-        color_data = self._spi_flash_read(0x6050, 6)
-
-        # TODO: use this
-        # stick_cal_addr = 0x8012 if self.is_left else 0x801D
-        # stick_cal  = self._spi_flash_read(stick_cal_addr, 8)
+        cache = self._calibration_cache
+        info = cache.get(self.serial) if cache is not None else None
+        self.device_info_cached = info is not None
+        if info is None:
+            info = self._read_device_info()
+            if cache is not None:
+                cache.put(self.serial, info)
+        self._apply_device_info(info)
+
+    def _read_device_info(self) -> dict:
+        """colors and raw calibration from SPI flash, see CalibrationCache"""
+        # 0x6020 IMU, 0x603D left and right stick, 0x6050 colors
+        factory = self.spi_flash_read(0x6020, 0x36)
+        # 0x8010 left stick, 0x801B right stick, 0x8026 IMU, each after a magic
+        user = self.spi_flash_read(0x8010, 0x30)
+
+        def has_user_data(magic_address):
+            offset = magic_address - 0x8010
+            return user[offset:offset + 2] == b"\xB2\xA1"
+
+        left_stick  = user[0x02:0x0B] if has_user_data(0x8010) else factory[0x1D:0x26]
+        right_stick = user[0x0D:0x16] if has_user_data(0x801B) else factory[0x26:0x2F]
 
         # user IME data
-        if self._spi_flash_read(0x8026, 2) == b"\xB2\xA1":
+        if has_user_data(0x8026):
             # print(f"Calibrate {self.serial} IME with user data")
-            imu_cal = self._spi_flash_read(0x8028, 24)
+            imu_cal = user[0x18:0x30]
 
         # factory IME data
         else:
             # print(f"Calibrate {self.serial} IME with factory data")
-            imu_cal = self._spi_flash_read(0x6020, 24)
-
-        self.color_body = tuple(color_data[:3])
-        self.color_btn  = tuple(color_data[3:])
-
-        self.set_accel_calibration((
-                self._to_int16le_from_2bytes(imu_cal[ 0], imu_cal[ 1]),
-                self._to_int16le_from_2bytes(imu_cal[ 2], imu_cal[ 3]),
-                self._to_int16le_from_2bytes(imu_cal[ 4], imu_cal[ 5]),
-            ), (
-                self._to_int16le_from_2bytes(imu_cal[ 6], imu_cal[ 7]),
-                self._to_int16le_from_2bytes(imu_cal[ 8], imu_cal[ 9]),
-                self._to_int16le_from_2bytes(imu_cal[10], imu_cal[11]),
-            )
-        )
-        self.set_gyro_calibration((
-                self._to_int16le_from_2bytes(imu_cal[12], imu_cal[13]),
-                self._to_int16le_from_2bytes(imu_cal[14], imu_cal[15]),
-                self._to_int16le_from_2bytes(imu_cal[16], imu_cal[17]),
-            ), (
-                self._to_int16le_from_2bytes(imu_cal[18], imu_cal[19]),
-                self._to_int16le_from_2bytes(imu_cal[20], imu_cal[21]),
-                self._to_int16le_from_2bytes(imu_cal[22], imu_cal[23]),
-            )
-        )
+            imu_cal = factory[0x00:0x18]
+
+        color_data = factory[0x30:0x36]
+        imu_cal = [
+            self._to_int16le_from_2bytes(imu_cal[i], imu_cal[i + 1])
+            for i in range(0, 24, 2)
+        ]
+        return {
+            "color_body": list(color_data[:3]),
+            "color_btn": list(color_data[3:]),
+            "accel_offset": imu_cal[0:3],
+            "accel_coeff": imu_cal[3:6],
+            "gyro_offset": imu_cal[6:9],
+            "gyro_coeff": imu_cal[9:12],
+            "stick_left": self._decode_stick_calibration(left_stick, left=True),
+            "stick_right": self._decode_stick_calibration(right_stick, left=False),
+        }
+
+    @staticmethod
+    def _decode_stick_calibration(data, left):
+        """
+        9 bytes of flash to `[center_x, center_y, below_x, below_y, above_x,
+        above_y]`, the ranges below and above center being distances
+        """
+        values = []
+        for i in range(0, 9, 3):
+            values.append(((data[i + 1] << 8) & 0xF00) | data[i])
+            values.append((data[i + 2] << 4) | (data[i + 1] >> 4))
+        if left:  # stored as above, center, below
+            return values[2:4] + values[4:6] + values[0:2]
+        return values  # stored as center, below, above
+
+    def _apply_device_info(self, info):
+        self.color_body = tuple(info["color_body"])
+        self.color_btn  = tuple(info["color_btn"])
+        self.stick_left_calibration  = tuple(info["stick_left"])
+        self.stick_right_calibration = tuple(info["stick_right"])
+        self.set_accel_calibration(tuple(info["accel_offset"]), tuple(info["accel_coeff"]))
+        self.set_gyro_calibration(tuple(info["gyro_offset"]), tuple(info["gyro_coeff"]))
+
+    def _revalidate_device_info(self):
+        try:
+            info = self._read_device_info()
+        except (IOError, AssertionError):
+            # e.g. the reply to another subcommand came first, keep the cache
+            return
+        if info != self._calibration_cache.get(self.serial):
+            self._calibration_cache.put(self.serial, info)
+            self._apply_device_info(info)
 
     def _setup_sensors(self):
         # Enable 6 axis sensors
         self._write_output_report(b'\x01', b'\x40', b'\x01')
-        # It needs delta time to update the setting
-        time.sleep(0.02)
+        if self.output_writer is None:
+            # It needs delta time to update the setting, the output writer
+            # already spaces its reports by output_gap
+            time.sleep(0.02)
         # Change format of input report
         self._write_output_report(b'\x01', b'\x03', b'\x30')
 
@@ -198,6 +430,10 @@ class JoyCon:
             self._GYRO_COEFF_X = 0x343b / cx if cx != 0x343b else 1
             self._GYRO_COEFF_Y = 0x343b / cy if cy != 0x343b else 1
             self._GYRO_COEFF_Z = 0x343b / cz if cz != 0x343b else 1
+        for decoder in self._imu_decoders:
+            decoder.set_gyro_calibration(
+                (self._GYRO_OFFSET_X, self._GYRO_OFFSET_Y, self._GYRO_OFFSET_Z),
+                (self._GYRO_COEFF_X, self._GYRO_COEFF_Y, self._GYRO_COEFF_Z))
 
     def set_accel_calibration(self, offset_xyz=None, coeff_xyz=None):
         if offset_xyz:
@@ -209,11 +445,35 @@ class JoyCon:
             self._ACCEL_COEFF_X = 0x4000 / cx if cx != 0x4000 else 1
             self._ACCEL_COEFF_Y = 0x4000 / cy if cy != 0x4000 else 1
             self._ACCEL_COEFF_Z = 0x4000 / cz if cz != 0x4000 else 1
+        for decoder in self._imu_decoders:
+            decoder.set_accel_calibration(
+                (self._ACCEL_OFFSET_X, self._ACCEL_OFFSET_Y, self._ACCEL_OFFSET_Z),
+                (self._ACCEL_COEFF_X, self._ACCEL_COEFF_Y, self._ACCEL_COEFF_Z))
+
+    def imu_decoder(self, accel_scale=1.0, gyro_scale=1.0, yz_coeff=1) -> ImuDecoder:
+        """
+        Returns an ImuDecoder which follows the IMU calibration of this JoyCon.
+        `decoder.decode(joycon._input_report)` fills and returns the same list
+        of 18 values (three samples of accel xyz, gyro xyz) every time.
+        """
+        decoder = ImuDecoder(accel_scale, gyro_scale, yz_coeff)
+        decoder.set_accel_calibration(
+            (self._ACCEL_OFFSET_X, self._ACCEL_OFFSET_Y, self._ACCEL_OFFSET_Z),
+            (self._ACCEL_COEFF_X, self._ACCEL_COEFF_Y, self._ACCEL_COEFF_Z))
+        decoder.set_gyro_calibration(
+            (self._GYRO_OFFSET_X, self._GYRO_OFFSET_Y, self._GYRO_OFFSET_Z),
+            (self._GYRO_COEFF_X, self._GYRO_COEFF_Y, self._GYRO_COEFF_Z))
+        self._imu_decoders.append(decoder)
+        return decoder
 
     def register_update_hook(self, callback):
         self._input_hooks.append(callback)
         return callback  # this makes it so you could use it as a decorator
 
+    def unregister_update_hook(self, callback):
+        # a new list, the reader may be iterating the old one
+        self._input_hooks = [hook for hook in self._input_hooks if hook is not callback]
+
     def is_left(self):
         return self.product_id == JOYCON_L_PRODUCT_ID
 
@@ -359,64 +619,27 @@ class JoyCon:
             self._input_report[24 + sample_idx * 12])
         return (data - self._GYRO_OFFSET_Z) * self._GYRO_COEFF_Z
 
+    def get_report(self) -> JoyConReport:
+        """
+        Returns the latest input report decoded in one pass. The snapshot is
+        decoded once per report and never changes, so all values in it are
+        consistent with each other even while the daemon thread updates.
+        """
+        seq = self.history.seq
+        report = self._input_report
+        last_seq, snapshot = self._report_snapshot
+        if last_seq != seq:
+            snapshot = self._report_decoder.decode(report)
+            self._report_snapshot = (seq, snapshot)
+        return snapshot
+
     def get_status(self) -> dict:
-        return {
-            "battery": {
-                "charging": self.get_battery_charging(),
-                "level": self.get_battery_level(),
-            },
-            "buttons": {
-                "right": {
-                    "y": self.get_button_y(),
-                    "x": self.get_button_x(),
-                    "b": self.get_button_b(),
-                    "a": self.get_button_a(),
-                    "sr": self.get_button_right_sr(),
-                    "sl": self.get_button_right_sl(),
-                    "r": self.get_button_r(),
-                    "zr": self.get_button_zr(),
-                },
-                "shared": {
-                    "minus": self.get_button_minus(),
-                    "plus": self.get_button_plus(),
-                    "r-stick": self.get_button_r_stick(),
-                    "l-stick": self.get_button_l_stick(),
-                    "home": self.get_button_home(),
-                    "capture": self.get_button_capture(),
-                    "charging-grip": self.get_button_charging_grip(),
-                },
-                "left": {
-                    "down": self.get_button_down(),
-                    "up": self.get_button_up(),
-                    "right": self.get_button_right(),
-                    "left": self.get_button_left(),
-                    "sr": self.get_button_left_sr(),
-                    "sl": self.get_button_left_sl(),
-                    "l": self.get_button_l(),
-                    "zl": self.get_button_zl(),
-                }
-            },
-            "analog-sticks": {
-                "left": {
-                    "horizontal": self.get_stick_left_horizontal(),
-                    "vertical": self.get_stick_left_vertical(),
-                },
-                "right": {
-                    "horizontal": self.get_stick_right_horizontal(),
-                    "vertical": self.get_stick_right_vertical(),
-                },
-            },
-            "accel": {
-                "x": self.get_accel_x(),
-                "y": self.get_accel_y(),
-                "z": self.get_accel_z(),
-            },
-            "gyro": {
-                "x": self.get_gyro_x(),
-                "y": self.get_gyro_y(),
-                "z": self.get_gyro_z(),
-            },
-        }
+        return self.get_report().get_status()
+
+    def get_battery_voltage(self) -> float:
+        """battery voltage in volts (subcommand 0x50), waits for the reply"""
+        reply = self._wait_for_reply(self.send_subcommand(b'\x50'))
+        return int.from_bytes(reply[2:4], "little") * 0.0025
 
     def set_player_lamp_on(self, on_pattern: int):
         self._write_output_report(
@@ -438,7 +661,10 @@ class JoyCon:
 
     def _send_rumble(self,data=b'\x00\x00\x00\x00\x00\x00\x00\x00'):
         self._RUMBLE_DATA = data
-        self._write_output_report(b'\x10', b'', b'')
+        if self.output_writer is not None:
+            self.output_writer.put_rumble()  # sends the latest _RUMBLE_DATA
+        else:
+            self._write_output_report_now(b'\x10', b'', b'')
         
     def enable_vibration(self,enable=True):
         """Sends enable or disable command for vibration. Seems to do nothing."""
@@ -452,8 +678,23 @@ class JoyCon:
         """Instantly stops the rumble"""
         self._send_rumble()
 
+    def rumble(self, strength: float, force=False) -> bool:
+        """
+        HD rumble at `strength` 0..1, at the frequencies of `rumble_encoder`.
+        Only writes a report if the encoded rumble changed, or with `force`:
+        the controller stops after a while on its own, so resend it forced
+        to keep rumbling. Returns whether a report was written.
+        """
+        data = self.rumble_encoder.encode(strength)
+        if data == self._RUMBLE_DATA and not force:
+            return False
+        self._send_rumble(data)
+        return True
+
     def connected(self):
         """Are we still connected to the joycon?"""
+        if self._update_input_report_thread is None:
+            return self._loop is not None
         return self._update_input_report_thread.is_alive()
 
 	
@@ -0,0 +1,337 @@
+"""
+Recording of the raw input reports of a controller and replaying them as a
+device, for debugging and load testing without hardware.
+
+File format, all integers little endian:
+
+    header  b"JCREC\\x00" version:u8 0:u8 vendor_id:u16 product_id:u16
+            serial_length:u8 serial
+    chunk*  length:u32 codec:u8 start:f64 payload[length]
+
+A chunk holds the records written in a while, its payload is compressed
+with `codec` (0 none, 1 zlib, 2 zstd). Every chunk decodes on its own,
+so the file is append-only, is read one chunk at a time and a capture cut
+short by a crash loses at most its last chunk. Records in a payload:
+
+    0x01 report  delta_us:varint changed:7 bytes, one bit per report byte
+                 then the changed bytes. Both are against the previous
+                 report of the chunk (all zero at its start), the delta is
+                 to the previous report or to the chunk's start.
+    0x02 flash   address:u32 size:u16 data, SPI flash read at connect
+"""
+import struct
+import threading
+import time
+import zlib
+from collections import deque
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MAGIC = b"JCREC\x00"
+VERSION = 1
+CODECS = {None: 0, "zlib": 1, "zstd": 2}
+
+REPORT_SIZE = 49
+_MASK_SIZE = (REPORT_SIZE + 7) // 8
+
+RECORD_REPORT = 0x01
+RECORD_FLASH = 0x02
+
+# what JoyCon._read_device_info reads: factory calibration and colors, user calibration
+CALIBRATION_RANGES = ((0x6020, 0x36), (0x8010, 0x30))
+
+_HEADER = struct.Struct("<6sBBHHB")
+_CHUNK = struct.Struct("<IBd")
+_FLASH = struct.Struct("<IH")
+
+
+def _compressor(codec):
+    if codec == 1:
+        return zlib.compress
+    if codec == 2:
+        if zstandard is None:
+            raise ValueError("zstd compression needs the zstandard package")
+        return zstandard.ZstdCompressor().compress
+    return bytes
+
+
+def _decompressor(codec):
+    if codec == 1:
+        return zlib.decompress
+    if codec == 2:
+        if zstandard is None:
+            raise ValueError("zstd compressed recording needs the zstandard package")
+        return zstandard.ZstdDecompressor().decompress
+    if codec == 0:
+        return bytes
+    raise ValueError(f"unknown codec in recording: {codec}")
+
+
+def _write_varint(out, value):
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, i):
+    value = shift = 0
+    while True:
+        byte = data[i]
+        i += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, i
+        shift += 7
+
+
+class ReportRecorder:
+    """
+    Writes reports and flash reads to a new recording at `path`. Records are
+    collected and written as one chunk every `chunk_size` bytes, on flush()
+    and on close(). `compression` is None, "zlib" or "zstd".
+
+    attach() records a JoyCon: its calibration, then every 0x30 report from
+    an update hook, which close() unregisters. Record one controller per
+    recorder.
+    """
+
+    def __init__(self, path, vendor_id, product_id, serial, compression=None, chunk_size=0x10000):
+        if compression not in CODECS:
+            raise ValueError(f"unknown compression: {compression!r}")
+        self.codec = CODECS[compression]
+        self._compress = _compressor(self.codec)
+        self.chunk_size = chunk_size
+        self.reports = 0
+        self._lock = threading.Lock()
+        self._file = open(path, "wb")
+        serial = (serial or "").encode()
+        self._file.write(_HEADER.pack(MAGIC, VERSION, 0, vendor_id, product_id, len(serial)) + serial)
+        self._records = bytearray()
+        self._previous = bytes(REPORT_SIZE)
+        self._start = None  # timestamp of the first report
+        self._last = None  # of the previous report
+        self._chunk_base = None  # what the first delta of the chunk is against
+        self._attached = None  # (joycon, update hook)
+
+    @property
+    def closed(self):
+        return self._file is None
+
+    def attach(self, joycon):
+        """
+        Records the calibration of `joycon` now and its reports from now on.
+        Returns the update hook.
+        """
+        for address, size in CALIBRATION_RANGES:
+            self.write_flash(address, joycon.spi_flash_read(address, size))
+        history = joycon.history
+        hook = joycon.register_update_hook(
+            lambda joycon: self.write_report(joycon._input_report, history.timestamp(history.seq - 1)))
+        self._attached = (joycon, hook)
+        return hook
+
+    def write_flash(self, address, data):
+        with self._lock:
+            self._records.append(RECORD_FLASH)
+            self._records += _FLASH.pack(address, len(data))
+            self._records += data
+
+    def write_report(self, report, timestamp):
+        """`timestamp` in seconds, monotonic. Ignored once closed."""
+        with self._lock:
+            if self._file is None:
+                return
+            if self._start is None:
+                self._start = self._last = timestamp
+            if self._chunk_base is None:
+                self._chunk_base = self._last
+            records = self._records
+            records.append(RECORD_REPORT)
+            _write_varint(records, max(0, round((timestamp - self._last) * 1e6)))
+            self._last = timestamp
+
+            previous = self._previous
+            mask = 0
+            changed = bytearray()
+            for i in range(REPORT_SIZE):
+                byte = report[i]
+                if byte != previous[i]:
+                    mask |= 1 << i
+                    changed.append(byte)
+            records += mask.to_bytes(_MASK_SIZE, "little")
+            records += changed
+            self._previous = bytes(report[:REPORT_SIZE])
+            self.reports += 1
+            if len(records) >= self.chunk_size:
+                self._write_chunk()
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None:
+                self._write_chunk()
+
+    def _write_chunk(self):
+        if not self._records:
+            return
+        payload = self._compress(bytes(self._records))
+        start = 0.0 if self._chunk_base is None else self._chunk_base - self._start
+        self._file.write(_CHUNK.pack(len(payload), self.codec, start) + payload)
+        self._file.flush()
+        # the next chunk starts from scratch, so it can be decoded on its own
+        self._records = bytearray()
+        self._previous = bytes(REPORT_SIZE)
+        self._chunk_base = None
+
+    def close(self):
+        if self._attached is not None:
+            joycon, hook = self._attached
+            self._attached = None
+            joycon.unregister_update_hook(hook)
+        with self._lock:
+            if self._file is None:
+                return
+            self._write_chunk()
+            self._file.close()
+            self._file = None
+
+
+def read_header(path):
+    """(vendor_id, product_id, serial) of a recording"""
+    with open(path, "rb") as f:
+        return _read_header(f)
+
+
+def _read_header(f):
+    magic, version, _, vendor_id, product_id, serial_length = _HEADER.unpack(f.read(_HEADER.size))
+    if magic != MAGIC:
+        raise ValueError("not a Joy-Con recording")
+    if version != VERSION:
+        raise ValueError(f"unsupported recording version {version}")
+    return vendor_id, product_id, f.read(serial_length).decode()
+
+
+def read_recording(path):
+    """
+    Yields `(seconds, report)` for each report and `(None, (address, data))`
+    for each flash read, in the order recorded. Seconds count from the first
+    report. Reads one chunk at a time, a truncated last chunk is ignored.
+    """
+    with open(path, "rb") as f:
+        _read_header(f)
+        while True:
+            head = f.read(_CHUNK.size)
+            if len(head) < _CHUNK.size:
+                return
+            length, codec, start = _CHUNK.unpack(head)
+            payload = f.read(length)
+            if len(payload) < length:
+                return
+            yield from _read_chunk(_decompressor(codec)(payload), start)
+
+
+def _read_chunk(data, start):
+    report = bytearray(REPORT_SIZE)
+    seconds = start
+    i, size = 0, len(data)
+    while i < size:
+        kind = data[i]
+        i += 1
+        if kind == RECORD_REPORT:
+            delta, i = _read_varint(data, i)
+            seconds += delta / 1e6
+            mask = int.from_bytes(data[i:i + _MASK_SIZE], "little")
+            i += _MASK_SIZE
+            while mask:
+                low = mask & -mask
+                report[low.bit_length() - 1] = data[i]
+                i += 1
+                mask ^= low
+            yield seconds, bytes(report)
+        elif kind == RECORD_FLASH:
+            address, length = _FLASH.unpack_from(data, i)
+            i += _FLASH.size
+            yield None, (address, bytes(data[i:i + length]))
+            i += length
+        else:
+            raise ValueError(f"unknown record type {kind:#x} in recording")
+
+
+class ReplayDevice:
+    """
+    Plays a recording back like a hid device (read/write/close). Reports
+    come at their recorded timing, or as fast as they are read if not
+    `realtime`. Subcommands are acknowledged, SPI flash reads are answered
+    from the recorded calibration. read() returns b"" at the end.
+    """
+
+    def __init__(self, path, realtime=True):
+        self.realtime = realtime
+        self._records = read_recording(path)
+        self._flash = {}
+        self._replies = deque()
+        self._cond = threading.Condition()
+        self._start = None
+        self._closed = False
+        # the calibration is recorded before the first report
+        self._next = self._next_report()
+
+    def _next_report(self):
+        for seconds, record in self._records:
+            if seconds is None:
+                self._flash[record[0]] = record[1]
+            else:
+                return seconds, record
+        return None
+
+    def read(self, size, timeout=None):
+        with self._cond:
+            while not self._replies and not self._closed and self._next is not None:
+                seconds, report = self._next
+                if self._start is None:
+                    self._start = time.monotonic() - seconds
+                wait = self._start + seconds - time.monotonic() if self.realtime else 0
+                if wait <= 0:
+                    self._next = self._next_report()
+                    return report[:size]
+                self._cond.wait(wait)  # woken early by write()
+            if self._replies:
+                return self._replies.popleft()[:size]
+            return b""
+
+    def write(self, data):
+        data = bytes(data)
+        if data[0] == 0x01:
+            with self._cond:
+                self._replies.append(self._reply_to(data[10], data[11:]))
+                self._cond.notify()
+        return len(data)
+
+    def _reply_to(self, subcommand, argument):
+        reply = bytearray(REPORT_SIZE)
+        reply[0] = 0x21
+        reply[13] = 0x80
+        reply[14] = subcommand
+        if subcommand == 0x10:
+            address = int.from_bytes(argument[0:4], "little")
+            size = argument[4]
+            reply[13] = 0x90
+            reply[15:20] = argument[0:5]
+            reply[20:20 + size] = self._flash_read(address, size)
+        return bytes(reply)
+
+    def _flash_read(self, address, size):
+        out = bytearray(b"\xff" * size)  # not recorded, like erased flash
+        for start, data in self._flash.items():
+            first, last = max(start, address), min(start + len(data), address + size)
+            if first < last:
+                out[first - address:last - address] = data[first - start:last - start]
+        return bytes(out)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
@@ -0,0 +1,76 @@
+"""
+HD rumble encoding. Each motor takes 4 bytes: a high band and a low band,
+each with a frequency and an amplitude. The formulas are the ones found by
+reverse engineering the controller (see dekuNukem/Nintendo_Switch_Reverse_Engineering).
+"""
+from math import log2
+
+# no vibration, 160 Hz / 320 Hz at amplitude 0
+RUMBLE_NEUTRAL = b'\x00\x01\x40\x40'
+
+HIGH_FREQ_RANGE = (81.75, 1252.0)
+LOW_FREQ_RANGE = (40.875, 626.0)
+
+
+def _clamp(value, low, high):
+    return low if value < low else high if value > high else value
+
+
+def encode_frequency(freq: float) -> int:
+    return round(log2(freq / 10.0) * 32.0)
+
+
+def encode_amplitude(amp: float) -> int:
+    """0..1, higher amplitudes are not safe for the motors"""
+    amp = _clamp(amp, 0.0, 1.0)
+    if amp > 0.23:
+        return round(log2(amp * 8.7) * 32.0)
+    if amp > 0.12:
+        return round(log2(amp * 17.0) * 16.0)
+    if amp < 0.01:
+        return 0
+    # fit of the published table: 0.01 is 1, steps of 2**(1/4) up to 0.12
+    return round(log2(amp / 0.01) * 4.0) + 1
+
+
+def encode_rumble(high_freq: float, low_freq: float, amp: float) -> bytes:
+    """4 bytes for one motor, both bands at amplitude `amp`"""
+    encoded_amp = encode_amplitude(amp)
+    if encoded_amp == 0:
+        return RUMBLE_NEUTRAL
+    hf = (encode_frequency(_clamp(high_freq, *HIGH_FREQ_RANGE)) - 0x60) * 4
+    lf = encode_frequency(_clamp(low_freq, *LOW_FREQ_RANGE)) - 0x40
+    hf_amp = encoded_amp * 2
+    lf_amp = encoded_amp // 2 + 0x40
+    if encoded_amp % 2:
+        lf_amp += 0x8000
+    return bytes((
+        hf & 0xFF,
+        (hf_amp + (hf >> 8)) & 0xFF,
+        (lf + (lf_amp >> 8)) & 0xFF,
+        lf_amp & 0xFF,
+    ))
+
+
+class RumbleEncoder:
+    """
+    Strength 0..1 to the 8 bytes of rumble data of an output report (left
+    and right motor alike), looked up in a table of `levels` steps which is
+    computed once for the frequencies given.
+    """
+
+    def __init__(self, high_freq=320.0, low_freq=160.0, levels=256):
+        self.high_freq = high_freq
+        self.low_freq = low_freq
+        self._max_level = levels - 1
+        self.table = tuple(
+            encode_rumble(high_freq, low_freq, level / self._max_level) * 2
+            for level in range(levels)
+        )
+
+    def encode(self, strength: float) -> bytes:
+        if strength <= 0:
+            return self.table[0]
+        if strength >= 1:
+            return self.table[-1]
+        return self.table[round(strength * self._max_level)]
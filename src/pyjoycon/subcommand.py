@@ -0,0 +1,103 @@
+"""
+Matching of subcommand replies (0x21 input reports) to the requests waiting
+for them, so subcommands can be sent while the 0x30 stream is read.
+"""
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+
+class SubcommandStats:
+    """round trip times of one subcommand id, in seconds"""
+    __slots__ = ("sent", "replies", "timeouts", "total_latency", "max_latency")
+
+    def __init__(self):
+        self.sent = 0
+        self.replies = 0
+        self.timeouts = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    @property
+    def mean_latency(self):
+        return self.total_latency / self.replies if self.replies else 0.0
+
+    def __repr__(self):
+        return (f"SubcommandStats(sent={self.sent}, replies={self.replies}, "
+                f"timeouts={self.timeouts}, mean={self.mean_latency * 1000:.1f}ms, "
+                f"max={self.max_latency * 1000:.1f}ms)")
+
+
+def reply_key(subcommand_id, argument):
+    """SPI reads (0x10) are told apart by the address and size they echo"""
+    if subcommand_id == 0x10:
+        return (0x10, bytes(argument[:5]))
+    return subcommand_id
+
+
+class ReplyRouter:
+    """
+    Futures of sent subcommands, first in first out per reply_key. route()
+    is called by whoever reads the device with every input report. Futures
+    carry their `deadline`, a waiter which stops waiting then calls expire()
+    itself, as no report may come to expire them.
+    """
+
+    def __init__(self):
+        self.stats = {}  # subcommand id: SubcommandStats
+        self._pending = {}  # reply_key: deque of (future, sent, deadline)
+        self._lock = threading.Lock()
+
+    def __bool__(self):
+        return bool(self._pending)
+
+    def expect(self, subcommand_id, argument, sent, timeout) -> Future:
+        """Registers a reply to wait for, before the subcommand is written"""
+        future = Future()
+        future.deadline = sent + timeout
+        key = reply_key(subcommand_id, argument)
+        with self._lock:
+            self._pending.setdefault(key, deque()).append((future, sent, sent + timeout))
+            stats = self.stats.get(subcommand_id)
+            if stats is None:
+                stats = self.stats[subcommand_id] = SubcommandStats()
+            stats.sent += 1
+        return future
+
+    def route(self, report, now):
+        """Resolves the future `report` replies to and expires overdue ones"""
+        if report[0] == 0x21:
+            subcommand_id = report[14]
+            key = reply_key(subcommand_id, report[15:20])
+            with self._lock:
+                waiting = self._pending.get(key)
+                entry = waiting.popleft() if waiting else None
+                if waiting is not None and not waiting:
+                    del self._pending[key]
+                if entry is not None:
+                    stats = self.stats[subcommand_id]
+                    latency = now - entry[1]
+                    stats.replies += 1
+                    stats.total_latency += latency
+                    if latency > stats.max_latency:
+                        stats.max_latency = latency
+            if entry is not None and not entry[0].done():
+                # a copy, the report may be a reused buffer
+                entry[0].set_result(bytes(report[13:]))
+        self.expire(now)
+
+    def expire(self, now):
+        """Fails the futures whose deadline is up to `now` with TimeoutError"""
+        expired = []
+        with self._lock:
+            for key, waiting in list(self._pending.items()):
+                while waiting and waiting[0][2] <= now:
+                    expired.append((key, waiting.popleft()[0]))
+                if not waiting:
+                    del self._pending[key]
+            for key, _ in expired:
+                self.stats[key[0] if isinstance(key, tuple) else key].timeouts += 1
+        for key, future in expired:
+            if not future.done():
+                name = f"{key[0]:#04x} {key[1].hex()}" if isinstance(key, tuple) else f"{key:#04x}"
+                future.set_exception(TimeoutError(f"no reply to subcommand {name}"))
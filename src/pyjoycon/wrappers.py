@@ -1,5 +1,46 @@
+from collections.abc import Sequence
 from .joycon import JoyCon
 
+ACCEL_IN_G  = 4.0 / 0x4000
+GYRO_IN_DEG = 0.06103
+GYRO_IN_ROT = 0.0001694
+GYRO_IN_RAD = 0.0001694 * 3.1415926536
+
+
+class ImuSamples(Sequence):
+    """
+    The three (x, y, z) samples of one sensor, a view on the reused `values`
+    buffer of an ImuDecoder. Only the list and the view are reused: indexing
+    builds a new tuple for the sample and decoding allocates too (see
+    ImuDecoder).
+    Each PythonicJoyCon property returns the same view every time and the
+    next access overwrites it, so copy with list() to keep samples, and use
+    a decoder of your own (JoyCon.imu_decoder()) from other threads.
+    """
+    __slots__ = ("values", "first")
+
+    def __init__(self, values, first):
+        self.values = values
+        self.first = first
+
+    def __len__(self):
+        return 3
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(3)[i]]
+        if not -3 <= i < 3:
+            raise IndexError("sample index out of range")
+        j = self.first + 6 * (i % 3)
+        v = self.values
+        return (v[j], v[j + 1], v[j + 2])
+
+    def __eq__(self, other):
+        return isinstance(other, Sequence) and list(self) == list(other)
+
+    def __repr__(self):
+        return f"ImuSamples({list(self)})"
+
 
 # Preferably, this class gets merged into the
 # parent class if approved by the original author
@@ -10,7 +51,8 @@ class PythonicJoyCon(JoyCon):
      *  using properties instead of requiring java-style getters and setters,
      *  bundles related xy/xyz data in tuples
      *  bundles the multiple measurements of the
-        gyroscope and accelerometer into a list
+        gyroscope and accelerometer into a reused ImuSamples view,
+        decoded in one pass
      *  Adds the option to invert the y and z axis of the left joycon
         to make it match the right joycon. This is enabled by default
     """
@@ -18,6 +60,17 @@ class PythonicJoyCon(JoyCon):
     def __init__(self, *a, invert_left_ime_yz=True, **kw):
         super().__init__(*a, **kw)
         self._ime_yz_coeff = -1 if invert_left_ime_yz and self.is_left() else 1
+        c = self._ime_yz_coeff
+        self._imu        = self.imu_decoder(1, 1, c)
+        self._imu_in_deg = self.imu_decoder(ACCEL_IN_G, GYRO_IN_DEG, c)
+        self._imu_in_rad = self.imu_decoder(ACCEL_IN_G, GYRO_IN_RAD, c)
+        self._imu_in_rot = self.imu_decoder(ACCEL_IN_G, GYRO_IN_ROT, c)
+        # the views the accel and gyro properties return, see ImuSamples
+        self._imu_views = {
+            (decoder, first): ImuSamples(decoder.values, first)
+            for decoder in (self._imu, self._imu_in_deg, self._imu_in_rad, self._imu_in_rot)
+            for first in (0, 3)
+        }
 
     is_charging   = property(JoyCon.get_battery_charging)
     battery_level = property(JoyCon.get_battery_level)
@@ -65,78 +118,31 @@ class PythonicJoyCon(JoyCon):
             self.get_stick_right_vertical(),
         )
 
+    def _imu_samples(self, decoder, first) -> ImuSamples:
+        # decodes into the decoder's buffer the view is on, no new list or view
+        decoder.decode(self._input_report)
+        return self._imu_views[decoder, first]
+
     @property
     def accel(self):
-        c = self._ime_yz_coeff
-        return [
-            (
-                self.get_accel_x(i),
-                self.get_accel_y(i) * c,
-                self.get_accel_z(i) * c,
-            )
-            for i in range(3)
-        ]
+        return self._imu_samples(self._imu, 0)
 
     @property
     def accel_in_g(self):
-        c = 4.0 / 0x4000
-        c2 = c * self._ime_yz_coeff
-        return [
-            (
-                self.get_accel_x(i) * c,
-                self.get_accel_y(i) * c2,
-                self.get_accel_z(i) * c2,
-            )
-            for i in range(3)
-        ]
+        return self._imu_samples(self._imu_in_deg, 0)
 
     @property
     def gyro(self):
-        c = self._ime_yz_coeff
-        return [
-            (
-                self.get_gyro_x(i),
-                self.get_gyro_y(i) * c,
-                self.get_gyro_z(i) * c,
-            )
-            for i in range(3)
-        ]
+        return self._imu_samples(self._imu, 3)
 
     @property
     def gyro_in_deg(self):
-        c = 0.06103
-        c2 = c * self._ime_yz_coeff
-        return [
-            (
-                self.get_gyro_x(i) * c,
-                self.get_gyro_y(i) * c2,
-                self.get_gyro_z(i) * c2,
-            )
-            for i in range(3)
-        ]
+        return self._imu_samples(self._imu_in_deg, 3)
 
     @property
     def gyro_in_rad(self):
-        c = 0.0001694 * 3.1415926536
-        c2 = c * self._ime_yz_coeff
-        return [
-            (
-                self.get_gyro_x(i) * c,
-                self.get_gyro_y(i) * c2,
-                self.get_gyro_z(i) * c2,
-            )
-            for i in range(3)
-        ]
+        return self._imu_samples(self._imu_in_rad, 3)
 
     @property
     def gyro_in_rot(self):
-        c = 0.0001694
-        c2 = c * self._ime_yz_coeff
-        return [
-            (
-                self.get_gyro_x(i) * c,
-                self.get_gyro_y(i) * c2,
-                self.get_gyro_z(i) * c2,
-            )
-            for i in range(3)
-        ]
+        return self._imu_samples(self._imu_in_rot, 3)
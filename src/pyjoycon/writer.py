@@ -0,0 +1,110 @@
+"""
+Output reports of one controller, written by one thread with a minimum gap
+between reports, since the controller drops reports which come too fast.
+"""
+import threading
+import time
+from collections import deque
+
+
+class OutputWriter:
+    """
+    `write(command, subcommand, argument)` builds and writes a report, it is
+    only called from the writer thread.
+
+    Rumble goes before everything else and is latest-only: the rumble data
+    is taken when the report is written, so rumble updates queued meanwhile
+    are merged into one report (counted in `rumble_superseded`). Other
+    reports are written in order. When `maxsize` of them wait the oldest is
+    dropped and counted in `dropped`.
+
+    `on_rumble_written(queued_at, written_at)`, if set, is called on the
+    writer thread after each rumble report, with monotonic times.
+    """
+
+    def __init__(self, write, min_gap=0.015, maxsize=64, name="JoyConWriter"):
+        self.min_gap = min_gap
+        self.maxsize = maxsize
+        self.writes = 0
+        self.rumble_superseded = 0
+        self.dropped = 0
+        self.errors = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.on_rumble_written = None
+        self._write = write
+        self._queue = deque()  # (command, subcommand, argument, queued at)
+        self._rumble_since = None  # when the pending rumble was queued
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True, name=name)
+        self._thread.start()
+
+    @property
+    def depth(self):
+        return len(self._queue) + (self._rumble_since is not None)
+
+    @property
+    def mean_latency(self):
+        """seconds from queueing to written"""
+        return self.total_latency / self.writes if self.writes else 0.0
+
+    def put(self, command, subcommand, argument):
+        with self._cond:
+            if len(self._queue) >= self.maxsize:
+                self._queue.popleft()
+                self.dropped += 1
+            self._queue.append((command, subcommand, argument, time.monotonic()))
+            self._cond.notify()
+
+    def put_rumble(self):
+        with self._cond:
+            if self._rumble_since is not None:
+                self.rumble_superseded += 1
+            else:
+                self._rumble_since = time.monotonic()
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+    def _run(self):
+        last_write = 0.0
+        while True:
+            with self._cond:
+                while not self._queue and self._rumble_since is None and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+
+            wait = last_write + self.min_gap - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+
+            # take it only now, so rumble queued while waiting is merged
+            with self._cond:
+                if self._closed:
+                    return
+                if self._rumble_since is not None:
+                    report = (b'\x10', b'', b'', self._rumble_since)
+                    self._rumble_since = None
+                else:
+                    report = self._queue.popleft()
+
+            try:
+                self._write(*report[:3])
+            except Exception:  # e.g. disconnected, hid.HIDException
+                # keep running, or everything queued later waits forever
+                self.errors += 1
+                continue
+            finally:
+                last_write = time.monotonic()
+            latency = last_write - report[3]
+            self.writes += 1
+            self.total_latency += latency
+            if latency > self.max_latency:
+                self.max_latency = latency
+            if report[0] == b'\x10' and self.on_rumble_written is not None:
+                self.on_rumble_written(report[3], last_write)
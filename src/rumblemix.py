@@ -0,0 +1,92 @@
+"""Mixing of the rumble strengths several OSC sources set for one controller"""
+
+import time
+
+COMBINE_RULES = ("max", "sum", "priority")
+
+# seconds between resends of an unchanged rumble
+KEEPALIVE = 0.35
+
+
+class RumbleMixer:
+	"""
+	One slot per source (OSC path), combined into one strength 0..1:
+
+	max       the strongest source
+	sum       all sources added up, capped at 1
+	priority  the first active source in `priorities`, unknown sources last
+
+	A source stays until it is set to 0. `attack` and `decay` are the
+	seconds the output takes to rise from 0 to 1 and to fall from 1 to 0,
+	0 follows the sources immediately. tick() advances the envelope and
+	returns the output.
+
+	The controller stops rumbling on its own after a while: keepalive_due()
+	tells when an unchanged output should be written again, written() is
+	called after each write.
+	"""
+
+	def __init__(self, combine="max", attack=0.0, decay=0.0, priorities=(), keepalive=KEEPALIVE):
+		if combine not in COMBINE_RULES:
+			raise ValueError(f"unknown rumble combine rule: {combine!r}")
+		self.combine = combine
+		self.attack = attack
+		self.decay = decay
+		self.priorities = {source: i for i, source in enumerate(priorities)}
+		self.keepalive = keepalive
+		self.sources = {}
+		self.output = 0.0
+		self._target = 0.0
+		self._last_tick = None
+		self._last_write = None
+
+	def set(self, source, strength) -> bool:
+		"""Returns whether the mixed target changed"""
+		strength = min(max(float(strength), 0.0), 1.0)
+		if strength:
+			self.sources[source] = strength
+		else:
+			self.sources.pop(source, None)
+		target = self._mix()
+		if target == self._target:
+			return False
+		if not self.moving:
+			# the envelope starts now, not at the tick before it came to rest
+			self._last_tick = time.monotonic()
+		self._target = target
+		return True
+
+	def _mix(self):
+		sources = self.sources
+		if not sources:
+			return 0.0
+		if self.combine == "max":
+			return max(sources.values())
+		if self.combine == "sum":
+			return min(sum(sources.values()), 1.0)
+		first = min(sources, key=lambda source: self.priorities.get(source, len(self.priorities)))
+		return sources[first]
+
+	@property
+	def moving(self):
+		"""Is the envelope still on its way to the target?"""
+		return self.output != self._target
+
+	def tick(self, now=None) -> float:
+		now = time.monotonic() if now is None else now
+		elapsed = 0.0 if self._last_tick is None else now - self._last_tick
+		self._last_tick = now
+		target, output = self._target, self.output
+		if target > output:
+			output = target if self.attack <= 0 else min(target, output + elapsed / self.attack)
+		elif target < output:
+			output = target if self.decay <= 0 else max(target, output - elapsed / self.decay)
+		self.output = output
+		return output
+
+	def keepalive_due(self, now) -> bool:
+		"""Is the output rumbling and last written `keepalive` seconds ago?"""
+		return self.output > 0 and (self._last_write is None or now - self._last_write >= self.keepalive)
+
+	def written(self, now):
+		self._last_write = now
@@ -0,0 +1,116 @@
+"""Always-on counters per controller, and publishing them as OSC or a Prometheus text file"""
+
+import os, time
+
+# reports after a connect from which the usual timer step is learned
+LEARN_STEPS = 32
+
+
+class ControllerStats:
+	"""
+	Counters of one controller, kept across reconnects. The update hook
+	calls report() for every input report and adds up its own times, all
+	else is derived from the report history when a snapshot is taken.
+	Per report, `map_us` is the OSC plan: decoding the report and mapping
+	its changed values, `hook_us` the whole update hook including queueing
+	them for sending.
+
+	Dropped reports are estimated from the timer byte: its usual step
+	between two reports is learned after each connect, a step of more than
+	one and a half of it counts the reports which should have been in
+	between.
+	"""
+
+	def __init__(self):
+		self.connects = 0
+		self.dropped = 0
+		self.map_time = 0.0
+		self.hook_time = 0.0
+		self.hooked_reports = 0
+		self.rumble_writes = 0
+		self._last_timer = 0
+		self._gap_step = -1  # every step is a gap while learning
+		self._usual_step = 0
+		self._learning = []
+
+	def connected(self):
+		self.connects += 1
+		self._gap_step = -1
+		self._learning = []
+
+	def report(self, timer):
+		step = (timer - self._last_timer) & 0xFF
+		self._last_timer = timer
+		if step > self._gap_step:
+			self._gap(step)
+
+	def _gap(self, step):
+		learning = self._learning
+		if learning is None:
+			usual = self._usual_step
+			self.dropped += (step + usual // 2) // usual - 1
+			return
+		learning.append(step)
+		if len(learning) >= LEARN_STEPS:
+			# the first step is against the previous connection
+			steps = [s for s in learning[1:] if s]
+			if steps:
+				self._usual_step = usual = max(set(steps), key=steps.count)
+				self._gap_step = usual + usual // 2
+				self._learning = None
+			else:
+				learning.clear()
+
+	def snapshot(self, history=None) -> dict:
+		"""`history` is the ReportHistory of the current connection, if any"""
+		hooked = self.hooked_reports or 1
+		values = {
+			"connects": self.connects,
+			"dropped_reports": self.dropped,
+			"map_us": self.map_time / hooked * 1e6,
+			"hook_us": self.hook_time / hooked * 1e6,
+			"rumble_writes": self.rumble_writes,
+		}
+		if history is not None and history.seq:
+			last = history.seq - 1
+			first = history.first_seq
+			span = history.timestamp(last) - history.timestamp(first)
+			values["reports"] = history.seq
+			values["reports_per_sec"] = (last - first) / span if span > 0 else 0.0
+			values["since_last_report"] = time.monotonic() - history.timestamp(last)
+		return values
+
+
+# only ever go up, while connected
+COUNTERS = {"connects", "dropped_reports", "rumble_writes", "reports", "osc_messages", "osc_datagrams", "osc_bytes"}
+
+
+def format_prometheus(stats) -> str:
+	"""`stats`: {controller id: {name: value}}, as Prometheus text exposition"""
+	lines = []
+	names = sorted({name for values in stats.values() for name, value in values.items() if value is not None})
+	for name in names:
+		metric = "vrcjoycon_" + name
+		lines.append(f"# TYPE {metric} {'counter' if name in COUNTERS else 'gauge'}")
+		for id, values in stats.items():
+			value = values.get(name)
+			if value is not None:
+				lines.append(f'{metric}{{controller="{id}"}} {float(value):g}')
+	return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path, stats):
+	"""Replaces `path` atomically, for node_exporter's textfile collector"""
+	tmp = f"{path}.tmp"
+	with open(tmp, "w") as f:
+		f.write(format_prometheus(stats))
+	os.replace(tmp, path)
+
+
+def publish_osc(sink, stats, prefix="/vrcjoycon/stats"):
+	"""One message per value: <prefix>/<controller id>/<name>"""
+	for id, values in stats.items():
+		for name, value in values.items():
+			if value is not None:
+				sink.send_message(f"{prefix}/{id}/{name}", float(value))
+	sink.flush()
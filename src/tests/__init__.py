@@ -0,0 +1,7 @@
+"""
+Tests which need no controller, run from the src directory:
+
+	python -m unittest discover tests
+
+Fake controllers are in tests.fakes, the benchmarks use them too.
+"""
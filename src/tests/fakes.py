@@ -0,0 +1,203 @@
+"""
+Stand-ins for a hid device object, so JoyCon can be driven without
+hardware. Shared by the tests and the benchmarks.
+"""
+
+import os, socket, struct, threading
+
+from pyjoycon import JoyCon, GyroTrackingJoyCon
+from pyjoycon.constants import JOYCON_VENDOR_ID, JOYCON_L_PRODUCT_ID
+from pyjoycon.hidraw import HidrawDevice
+
+# factory IMU calibration as read from a real controller at 0x6020
+FACTORY_IMU_CAL = bytes.fromhex("e8ff6f00e1ff004000400040faff0000ffff3b343b343b34")
+COLORS = bytes.fromhex("323232ffffff")
+
+
+def pack_stick_calibration(*values):
+	"""six 12 bit values into the 9 bytes the flash stores them as"""
+	out = bytearray()
+	for a, b in zip(values[0::2], values[1::2]):
+		out += bytes((a & 0xFF, (a >> 8) | ((b & 0xF) << 4), b >> 4))
+	return bytes(out)
+
+
+# factory stick calibration at 0x603D, left stick as above, center, below
+# and right stick as center, below, above
+FACTORY_STICK_CAL = (
+	pack_stick_calibration(1400, 1350, 2040, 2060, 1390, 1340)
+	+ pack_stick_calibration(2050, 2030, 1380, 1370, 1410, 1360)
+)
+
+DEFAULT_FLASH = {
+	0x6020: FACTORY_IMU_CAL,
+	0x603D: FACTORY_STICK_CAL,
+	0x6050: COLORS,
+	0x8026: b"\xff\xff",
+}
+
+_IMU_STRUCT = struct.Struct("<18h")
+
+
+def make_report(timer=0, buttons=0, stick_left=(2048, 2048), stick_right=(2048, 2048), imu=None, battery=0x8E):
+	"""Builds a 0x30 input report. `buttons` is the 24 bit field of JoyConReport."""
+	lh, lv = stick_left
+	rh, rv = stick_right
+	report = bytearray(JoyCon._INPUT_REPORT_SIZE)
+	report[0] = 0x30
+	report[1] = timer & 0xFF
+	report[2] = battery
+	report[3:6] = buttons.to_bytes(3, "little")
+	report[6:9] = bytes((lh & 0xFF, (lh >> 8) | ((lv & 0xF) << 4), lv >> 4))
+	report[9:12] = bytes((rh & 0xFF, (rh >> 8) | ((rv & 0xF) << 4), rv >> 4))
+	report[13:49] = _IMU_STRUCT.pack(*(imu or (0,) * 18))
+	return bytes(report)
+
+
+class FakeJoyConDevice:
+	"""
+	Implements read/write/close like the hid packages do. SPI flash reads are
+	answered from `flash`, other subcommands get a plain ACK. Input reports
+	are taken from `feed()`; read() blocks while nothing is queued.
+	`latency` seconds pass between a write and its reply, like a round trip
+	over Bluetooth.
+	"""
+
+	def __init__(self, flash=None, latency=0.0):
+		self.flash = dict(DEFAULT_FLASH if flash is None else flash)
+		self.latency = latency
+		self.battery_voltage = 1600
+		self.written = []
+		self._queue = []
+		self._cond = threading.Condition()
+		self._closed = False
+
+	@property
+	def pending(self):
+		"""reports fed but not read yet"""
+		return len(self._queue)
+
+	def feed(self, *reports):
+		with self._cond:
+			self._queue.extend(reports)
+			self._cond.notify()
+
+	def read(self, size, timeout=None):
+		with self._cond:
+			while not self._queue and not self._closed:
+				self._cond.wait()
+			if self._closed:
+				return b""
+			return self._queue.pop(0)[:size]
+
+	def write(self, data):
+		data = bytes(data)
+		self.written.append(data)
+		reply = self.reply_to(data)
+		if reply:
+			if self.latency:
+				threading.Timer(self.latency, self.feed, (reply,)).start()
+			else:
+				self.feed(reply)
+		return len(data)
+
+	def reply_to(self, data):
+		"""The 0x21 reply a controller sends for an output report, or None"""
+		if data[0] != 0x01:
+			return None
+		subcommand, argument = data[10], data[11:]
+		reply = bytearray(JoyCon._INPUT_REPORT_SIZE)
+		reply[0] = 0x21
+		reply[13] = 0x80 if subcommand != 0x10 else 0x90
+		reply[14] = subcommand
+		if subcommand == 0x50:  # battery voltage, 2.5 mV units
+			reply[13] = 0xD0
+			reply[15:17] = self.battery_voltage.to_bytes(2, "little")
+		if subcommand == 0x10:
+			address = int.from_bytes(argument[0:4], "little")
+			size = argument[4]
+			reply[15:20] = argument[0:5]
+			reply[20:20 + size] = self._flash_read(address, size)
+		return bytes(reply)
+
+	def _flash_read(self, address, size):
+		out = bytearray(b"\xff" * size)  # erased flash
+		for start, data in self.flash.items():
+			first, last = max(start, address), min(start + len(data), address + size)
+			if first < last:
+				out[first - address:last - address] = data[first - start:last - start]
+		return bytes(out)
+
+	def close(self):
+		with self._cond:
+			self._closed = True
+			self._cond.notify_all()
+
+
+class FakeJoyCon(JoyCon):
+	"""JoyCon talking to a FakeJoyConDevice"""
+
+	def __init__(self, *args, device=None, **kwargs):
+		self.fake_device = device or FakeJoyConDevice()
+		if not args:
+			args = (JOYCON_VENDOR_ID, JOYCON_L_PRODUCT_ID, "fake")
+		super().__init__(*args, **kwargs)
+
+	def _open(self, vendor_id, product_id, serial):
+		return self.fake_device
+
+
+class SocketHidrawDevice(HidrawDevice):
+	"""hidraw backend on one end of a socketpair standing in for /dev/hidrawN"""
+
+	def __init__(self, sock, peer, flash=None):
+		super().__init__(fd=sock.detach())
+		self.peer = peer
+		self._controller = FakeJoyConDevice(flash)
+
+	def write(self, data):
+		reply = self._controller.reply_to(data)
+		if reply:
+			self.peer.send(reply)
+		return len(data)
+
+
+class SocketHidDevice:
+	"""Like hid.Device: read() returns a new bytes object per report"""
+
+	def __init__(self, sock, peer, flash=None):
+		self._fd = sock.detach()
+		self.peer = peer
+		self._controller = FakeJoyConDevice(flash)
+
+	def read(self, size, timeout=None):
+		return os.read(self._fd, size)
+
+	def write(self, data):
+		reply = self._controller.reply_to(data)
+		if reply:
+			self.peer.send(reply)
+		return len(data)
+
+	def close(self):
+		os.close(self._fd)
+
+
+class SocketHidapiDevice(SocketHidDevice):
+	"""Like hidapi's hid.device: read() returns a list of ints"""
+
+	def read(self, size, timeout=None):
+		return list(os.read(self._fd, size))
+
+
+def socket_device(device_class, flash=None):
+	"""
+	Returns (device, peer). Reports sent into `peer` are read by `device`,
+	subcommands written to `device` are answered like FakeJoyConDevice does.
+	"""
+	sock, peer = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+	return device_class(sock, peer, flash), peer
+
+
+class FakeGyroJoyCon(FakeJoyCon, GyroTrackingJoyCon):
+	pass
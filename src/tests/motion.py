@@ -0,0 +1,100 @@
+"""
+Synthetic rotations with a known answer, as raw 0x30 reports. They go
+through the IMU calibration and the timer byte like a real controller's
+reports would.
+"""
+
+import math, random
+
+from pyjoycon.fusion import rotate
+from pyjoycon.gyro import TIMER_TICK, REPORT_TICKS
+
+from .fakes import make_report
+
+
+def q_mul(a, b):
+	aw, ax, ay, az = a
+	bw, bx, by, bz = b
+	return (
+		aw * bw - ax * bx - ay * by - az * bz,
+		aw * bx + ax * bw + ay * bz - az * by,
+		aw * by - ax * bz + ay * bw + az * bx,
+		aw * bz + ax * by - ay * bx + az * bw,
+	)
+
+
+def q_conj(q):
+	return (q[0], -q[1], -q[2], -q[3])
+
+
+def q_rate(w, dt):
+	"""the rotation by the body rate `w` (rad/s) over `dt` seconds"""
+	angle = math.sqrt(sum(c * c for c in w)) * dt
+	if angle == 0:
+		return (1.0, 0.0, 0.0, 0.0)
+	s = math.sin(angle / 2) / (angle / dt)
+	return (math.cos(angle / 2), w[0] * s, w[1] * s, w[2] * s)
+
+
+def q_angle(a, b):
+	"""degrees between two orientations"""
+	dot = abs(sum(x * y for x, y in zip(a, b)))
+	return math.degrees(2 * math.acos(min(1.0, dot)))
+
+
+def v_angle(a, b):
+	dot = sum(x * y for x, y in zip(a, b))
+	norm = math.sqrt(sum(x * x for x in a) * sum(y * y for y in b))
+	return math.degrees(math.acos(max(-1.0, min(1.0, dot / norm))))
+
+
+def up(q):
+	"""the world's up in the controller frame, what tilt is judged by"""
+	return rotate(q_conj(q), (0.0, 0.0, 1.0))
+
+
+def synthesize(joycon, seconds, rate, bias=(0.0, 0.0, 0.0), steps=(REPORT_TICKS,), seed=1):
+	"""
+	Reports of a controller turning at `rate(t)` rad/s in its own frame,
+	the gyro reading off by `bias`. The timer advances by a step picked
+	from `steps` per report. Returns (reports, true orientation at the end).
+	"""
+	rnd = random.Random(seed)
+	terms = joycon._fusion_imu._terms
+	q = (1.0, 0.0, 0.0, 0.0)
+	t, timer, reports = 0.0, 0, []
+	while t < seconds:
+		step = rnd.choice(steps)
+		timer += step
+		dt = step * TIMER_TICK / 3
+		values = []
+		for _ in range(3):
+			t += dt
+			w = rate(t)
+			q = q_mul(q, q_rate(w, dt))
+			values += up(q)
+			values += (w[0] + bias[0], w[1] + bias[1], w[2] + bias[2])
+		imu = [
+			max(-32768, min(32767, round(value / factor) + offset))
+			for value, (i, offset, factor) in zip(values, terms)
+		]
+		reports.append(make_report(timer=timer, imu=imu))
+	return reports, q
+
+
+def tumble(t):
+	return (2.0 * math.sin(1.3 * t), 1.5 * math.cos(0.7 * t), math.sin(2.1 * t + 1))
+
+
+def pitch_and_back(t):
+	return (0.0, math.pi / 2 if t < 1 else 0.0 if t < 2 else -math.pi / 2, 0.0)
+
+
+STREAMS = {
+	"yaw 90 deg/s for 4 s": dict(seconds=4, rate=lambda t: (0.0, 0.0, math.pi / 2)),
+	"pitch 90 deg, hold, back": dict(seconds=3, rate=pitch_and_back),
+	"tumble 10 s": dict(seconds=10, rate=tumble),
+	"tumble 10 s, jittered timer": dict(seconds=10, rate=tumble, steps=(2, 3, 3, 4)),
+	"still 60 s, gyro bias 1 deg/s": dict(
+		seconds=60, rate=lambda t: (0.0, 0.0, 0.0), bias=(math.radians(1), 0.0, math.radians(1))),
+}
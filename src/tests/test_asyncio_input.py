@@ -0,0 +1,50 @@
+"""JoyCon.attach_to_loop with a socketpair standing in for /dev/hidrawN"""
+
+import asyncio, unittest
+
+from tests.fakes import FakeJoyCon, SocketHidrawDevice, make_report, socket_device
+
+
+class AttachToLoopTest(unittest.TestCase):
+	def setUp(self):
+		self.loop = asyncio.new_event_loop()
+		self.errors = []
+		self.loop.set_exception_handler(lambda loop, context: self.errors.append(context))
+		# a HidrawDevice on the fd of one end, the test writes reports into the other
+		self.device, self.peer = socket_device(SocketHidrawDevice)
+		self.joycon = FakeJoyCon(device=self.device, threaded=False)
+
+	def tearDown(self):
+		self.joycon._close()
+		self.peer.close()
+		self.loop.close()
+
+	def run_until(self, condition, timeout=2.0):
+		async def wait():
+			while not condition():
+				await asyncio.sleep(0.001)
+		self.loop.run_until_complete(asyncio.wait_for(wait(), timeout))
+
+	def test_hook_runs_on_the_loop(self):
+		timers = []
+		self.joycon.register_update_hook(lambda joycon: timers.append(joycon._input_report[1]))
+		self.joycon.attach_to_loop(self.loop)
+		self.assertTrue(self.joycon.connected())
+
+		for timer in range(1, 6):
+			self.peer.send(make_report(timer=timer))
+		self.run_until(lambda: len(timers) == 5)
+		self.assertEqual(timers, [1, 2, 3, 4, 5])
+		self.assertEqual(self.errors, [])
+
+	def test_error_detaches(self):
+		self.joycon.attach_to_loop(self.loop)
+		self.peer.close()  # reads return 0 bytes, like a device gone away
+		self.run_until(lambda: not self.joycon.connected())
+		self.assertIsNone(self.joycon._loop)
+		self.assertEqual(len(self.errors), 1)
+		self.assertIsInstance(self.errors[0]["exception"], TimeoutError)
+
+
+if __name__ == "__main__":
+	unittest.main()
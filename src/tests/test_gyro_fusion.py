@@ -0,0 +1,74 @@
+"""GyroTrackingJoyCon's orientation on synthetic rotations with a known answer"""
+
+import math, unittest
+
+from glm import eulerAngles
+
+from pyjoycon.gyro import REPORT_TICKS, TIMER_TICK
+
+from tests.fakes import FakeGyroJoyCon
+from tests.motion import STREAMS, q_angle, synthesize, up, v_angle
+
+# worst orientation error allowed at the end of each stream, in degrees
+MAX_TILT_ERROR = 3.0
+MAX_ERROR = 5.0
+
+
+def track(stream, fusion):
+	"""(error, tilt error) in degrees at the end of `stream`"""
+	joycon = FakeGyroJoyCon(threaded=False, fusion=fusion)
+	try:
+		reports, truth = synthesize(joycon, **STREAMS[stream])
+		for report in reports:
+			joycon._input_report = report
+			joycon._gyro_update_hook(joycon)
+		q = joycon.fusion.q
+		return q_angle(q, truth), v_angle(up(q), up(truth))
+	finally:
+		joycon._close()
+
+
+class AccuracyTest(unittest.TestCase):
+	def test_streams(self):
+		for stream in STREAMS:
+			for fusion in ("madgwick", "mahony"):
+				with self.subTest(stream=stream, fusion=fusion):
+					error, tilt = track(stream, fusion)
+					self.assertLess(tilt, MAX_TILT_ERROR)
+					# yaw is not observable from gravity, a gyro bias turns it
+					if "bias" not in stream:
+						self.assertLess(error, MAX_ERROR)
+
+
+class GyroTrackingJoyConTest(unittest.TestCase):
+	def setUp(self):
+		self.joycon = FakeGyroJoyCon(threaded=False)
+
+	def tearDown(self):
+		self.joycon._close()
+
+	def test_sample_dt(self):
+		nominal = REPORT_TICKS * TIMER_TICK / 3
+		dt = self.joycon._sample_dt
+		self.assertAlmostEqual(dt[REPORT_TICKS], nominal)
+		self.assertAlmostEqual(dt[REPORT_TICKS + 1], (REPORT_TICKS + 1) * TIMER_TICK / 3)
+		# a repeated timer and lost reports
+		self.assertEqual(dt[0], nominal)
+		self.assertEqual(dt[2 * REPORT_TICKS], nominal)
+		self.assertEqual(dt[255], nominal)
+
+	def test_rotation_convention(self):
+		# as before the fusion filters: direction_Q goes from the world to
+		# the controller frame, rotation is minus its euler angles
+		half = math.radians(30) / 2
+		self.joycon.fusion.reset((math.cos(half), 0.0, 0.0, math.sin(half)))
+		q = self.joycon.direction_Q
+		for got, expected in zip((q.w, q.x, q.y, q.z), (math.cos(half), 0.0, 0.0, -math.sin(half))):
+			self.assertAlmostEqual(got, expected, places=6)
+		rotation = self.joycon.rotation
+		self.assertEqual(tuple(rotation), tuple(-eulerAngles(q)))
+		self.assertAlmostEqual(math.degrees(rotation.z), 30.0, places=4)
+		self.assertAlmostEqual(self.joycon.direction.y, math.sin(2 * half), places=6)
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,205 @@
+"""JoyCon connecting, reading SPI flash and waiting for subcommand replies, on fake devices"""
+
+import threading, time, unittest
+
+from pyjoycon.subcommand import ReplyRouter
+
+from tests.fakes import FakeJoyCon, FakeJoyConDevice, make_report
+
+SPI_READ = 0x10
+
+
+def spi_argument(address, size):
+	return address.to_bytes(4, "little") + bytes((size,))
+
+
+def spi_reply(address, size, data=b""):
+	report = bytearray(FakeJoyCon._INPUT_REPORT_SIZE)
+	report[0] = 0x21
+	report[13] = 0x90
+	report[14] = SPI_READ
+	report[15:20] = spi_argument(address, size)
+	report[20:20 + len(data)] = data
+	return bytes(report)
+
+
+class NackDevice(FakeJoyConDevice):
+	"""NACKs SPI flash reads while `nack` is set"""
+
+	nack = True
+
+	def reply_to(self, data):
+		reply = super().reply_to(data)
+		if reply is not None and data[10] == SPI_READ and self.nack:
+			reply = reply[:13] + b"\x00" + reply[14:]
+		return reply
+
+
+class ShuffleDevice(FakeJoyConDevice):
+	"""Hands out the newest queued report first, so pipelined replies come reversed"""
+
+	def read(self, size, timeout=None):
+		with self._cond:
+			while not self._queue and not self._closed:
+				self._cond.wait()
+			if self._closed:
+				return b""
+			return self._queue.pop()[:size]
+
+
+class LossyDevice(FakeJoyConDevice):
+	"""
+	Leaves the first `drop` SPI reads of `address` unanswered and streams 0x30
+	reports every 5 ms while nothing else is queued, like a controller does.
+	"""
+
+	def __init__(self, address, drop):
+		super().__init__()
+		self.address = address
+		self.drop = drop
+
+	def reply_to(self, data):
+		if data[0] == 0x01 and data[10] == SPI_READ \
+				and int.from_bytes(data[11:15], "little") == self.address and self.drop:
+			self.drop -= 1
+			return None
+		return super().reply_to(data)
+
+	def read(self, size, timeout=None):
+		if not self._queue and not self._closed:
+			time.sleep(0.005)
+			return make_report()[:size]
+		return super().read(size, timeout)
+
+
+class ReplyRouterTest(unittest.TestCase):
+	def setUp(self):
+		self.router = ReplyRouter()
+
+	def test_spi_replies_in_any_order(self):
+		first = self.router.expect(SPI_READ, spi_argument(0x6020, 0x1d), 0.0, 1.0)
+		second = self.router.expect(SPI_READ, spi_argument(0x603d, 0x19), 0.0, 1.0)
+		self.router.route(spi_reply(0x603d, 0x19, b"second"), 0.01)
+		self.assertFalse(first.done())
+		self.assertEqual(second.result(0)[7:13], b"second")
+		self.router.route(spi_reply(0x6020, 0x1d, b"first"), 0.02)
+		self.assertEqual(first.result(0)[7:12], b"first")
+		self.assertFalse(self.router)
+		stats = self.router.stats[SPI_READ]
+		self.assertEqual((stats.sent, stats.replies, stats.timeouts), (2, 2, 0))
+		self.assertAlmostEqual(stats.max_latency, 0.02)
+
+	def test_same_subcommand_first_in_first_out(self):
+		first = self.router.expect(0x50, b"", 0.0, 1.0)
+		second = self.router.expect(0x50, b"", 0.0, 1.0)
+		reply = bytearray(FakeJoyCon._INPUT_REPORT_SIZE)
+		reply[0], reply[14] = 0x21, 0x50
+		self.router.route(reply, 0.01)
+		self.assertTrue(first.done())
+		self.assertFalse(second.done())
+
+	def test_unexpected_reply(self):
+		self.router.route(spi_reply(0x6020, 0x1d), 0.0)
+		self.assertFalse(self.router)
+
+	def test_expire(self):
+		early = self.router.expect(SPI_READ, spi_argument(0x6020, 0x1d), 0.0, 0.5)
+		late = self.router.expect(SPI_READ, spi_argument(0x603d, 0x19), 0.2, 0.5)
+		self.assertEqual((early.deadline, late.deadline), (0.5, 0.7))
+		self.router.expire(0.4)
+		self.assertFalse(early.done())
+		self.router.expire(0.5)
+		with self.assertRaises(TimeoutError):
+			early.result(0)
+		self.assertFalse(late.done())
+		# a 0x30 report expires them too
+		self.router.route(make_report(), 0.7)
+		with self.assertRaises(TimeoutError):
+			late.result(0)
+		self.assertFalse(self.router)
+		self.assertEqual(self.router.stats[SPI_READ].timeouts, 2)
+
+
+class SpiFlashReadTest(unittest.TestCase):
+	def connect(self, device, **kwargs):
+		joycon = FakeJoyCon(device=device, threaded=False, output_gap=None, **kwargs)
+		self.addCleanup(joycon._close)
+		return joycon
+
+	def test_replies_out_of_order(self):
+		device = ShuffleDevice(flash={0x6000: bytes(range(256))})
+		joycon = self.connect(device)
+		replies = []
+		route = joycon._replies.route
+		joycon._replies.route = lambda report, now: (replies.append(bytes(report[15:19])), route(report, now))
+		data = joycon.spi_flash_read(0x6000, 0x100)
+		self.assertEqual(data, bytes(range(256)))
+		addresses = [int.from_bytes(address, "little") for address in replies]
+		self.assertEqual(sorted(addresses), list(range(0x6000, 0x6100, 0x1d)))
+		self.assertNotEqual(addresses, sorted(addresses))
+
+	def test_retry_on_timeout(self):
+		device = LossyDevice(0x601d, drop=2)
+		joycon = self.connect(device)
+		joycon._SUBCOMMAND_TIMEOUT = 0.05
+		self.assertEqual(joycon.spi_flash_read(0x6000, 0x40), device._flash_read(0x6000, 0x40))
+		sent = [data[11:15] for data in device.written if data[0] == 0x01 and data[10] == SPI_READ]
+		self.assertEqual(sent.count((0x601d).to_bytes(4, "little")), 3)
+		self.assertEqual(joycon.subcommand_stats[SPI_READ].timeouts, 2)
+
+	def test_no_reply(self):
+		device = LossyDevice(0x601d, drop=100)
+		joycon = self.connect(device)
+		joycon._SUBCOMMAND_TIMEOUT = 0.02
+		with self.assertRaisesRegex(IOError, "SPI read @ 0x601d: no reply"):
+			joycon.spi_flash_read(0x6000, 0x40)
+		# sent once and retried
+		self.assertEqual(100 - device.drop, 1 + joycon._SPI_RETRIES)
+
+	def test_nack(self):
+		device = NackDevice()
+		device.nack = False
+		joycon = self.connect(device)
+		device.nack = True
+		with self.assertRaisesRegex(IOError, "After SPI read @ 0x6000: got NACK"):
+			joycon.spi_flash_read(0x6000, 0x10)
+
+
+class WaitForReplyTest(unittest.TestCase):
+	def test_timeout_without_input_reports(self):
+		device = FakeJoyConDevice()
+		joycon = FakeJoyCon(device=device, threaded=False)
+		self.addCleanup(joycon._close)
+		# stands in for the reader thread, blocked in read() as no report
+		# comes which would expire the wait
+		reader = threading.Thread(target=device.read, args=(joycon._INPUT_REPORT_SIZE,), daemon=True)
+		joycon._update_input_report_thread = reader
+		reader.start()
+		device.reply_to = lambda data: None
+		joycon._SUBCOMMAND_TIMEOUT = 0.05
+		start = time.monotonic()
+		with self.assertRaises(TimeoutError):
+			joycon.get_battery_voltage()
+		self.assertLess(time.monotonic() - start, 0.5)
+		self.assertEqual(joycon.subcommand_stats[0x50].timeouts, 1)
+
+
+class ConnectTest(unittest.TestCase):
+	def test_failed_connect_closes(self):
+		writers = []
+
+		class Controller(FakeJoyCon):
+			def _read_joycon_data(self):
+				writers.append(self.output_writer)
+				super()._read_joycon_data()
+
+		device = NackDevice()
+		with self.assertRaisesRegex(IOError, "NACK"):
+			Controller(device=device)
+		self.assertTrue(device._closed)
+		writers[0]._thread.join(1)
+		self.assertFalse(writers[0]._thread.is_alive())
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,153 @@
+"""ReportRecorder, read_recording and ReplayDevice on temporary recordings"""
+
+import os, tempfile, unittest
+
+from pyjoycon import JoyCon, ReplayDevice, ReportRecorder, read_recording
+from pyjoycon.constants import JOYCON_VENDOR_ID, JOYCON_L_PRODUCT_ID
+from pyjoycon.recording import CALIBRATION_RANGES, _CHUNK, _read_header
+
+from tests.fakes import COLORS, FakeJoyConDevice, make_report
+
+
+def reports(count):
+	return [make_report(timer=i, buttons=i * 0x10101 & 0xFFFFFF, imu=[i - 9] * 18) for i in range(count)]
+
+
+class RecordingTestCase(unittest.TestCase):
+	def setUp(self):
+		fd, self.path = tempfile.mkstemp(suffix=".jcrec")
+		os.close(fd)
+
+	def tearDown(self):
+		os.remove(self.path)
+
+	def record(self, reports, interval=0.015, **kwargs):
+		"""`reports` after the calibration of a FakeJoyConDevice"""
+		device = FakeJoyConDevice()
+		recorder = ReportRecorder(self.path, JOYCON_VENDOR_ID, JOYCON_L_PRODUCT_ID, "rec", **kwargs)
+		for address, size in CALIBRATION_RANGES:
+			recorder.write_flash(address, device._flash_read(address, size))
+		for i, report in enumerate(reports):
+			recorder.write_report(report, 100 + i * interval)
+		recorder.close()
+
+
+	def chunk_ends(self):
+		"""file offset after each chunk"""
+		ends = []
+		with open(self.path, "rb") as f:
+			_read_header(f)
+			while True:
+				head = f.read(_CHUNK.size)
+				if not head:
+					return ends
+				f.seek(_CHUNK.unpack(head)[0], os.SEEK_CUR)
+				ends.append(f.tell())
+
+
+class RecordingTest(RecordingTestCase):
+	def read(self):
+		"""(flash reads, reports, seconds) of the recording"""
+		flash, recorded, seconds = [], [], []
+		for t, record in read_recording(self.path):
+			if t is None:
+				flash.append(record)
+			else:
+				recorded.append(record)
+				seconds.append(t)
+		return flash, recorded, seconds
+
+	def check_round_trip(self, **kwargs):
+		written = reports(300)
+		self.record(written, chunk_size=1024, **kwargs)
+		self.assertGreaterEqual(len(self.chunk_ends()), 3)
+
+		flash, recorded, seconds = self.read()
+		device = FakeJoyConDevice()
+		self.assertEqual(flash, [
+			(address, device._flash_read(address, size)) for address, size in CALIBRATION_RANGES
+		])
+		self.assertEqual(recorded, written)
+		# from the first report, across chunk starts too
+		self.assertEqual(seconds[0], 0.0)
+		for i, t in enumerate(seconds):
+			self.assertAlmostEqual(t, i * 0.015, places=5)
+
+	def test_round_trip(self):
+		self.check_round_trip()
+
+	def test_round_trip_zlib(self):
+		self.check_round_trip(compression="zlib")
+
+	def test_unchanged_report(self):
+		# an all zero mask, nothing but the record type, delta and mask
+		written = [make_report(timer=1)] * 3
+		self.record(written)
+		self.assertEqual(self.read()[1], written)
+
+	def test_truncated_chunk(self):
+		written = reports(300)
+		self.record(written, chunk_size=1024)
+		ends = self.chunk_ends()
+		complete = self.read()[1]
+		with open(self.path, "r+b") as f:
+			f.truncate(ends[-1] - 10)
+		# the reports of every chunk before the cut one
+		recorded = self.read()[1]
+		self.assertGreater(len(recorded), 0)
+		self.assertLess(len(recorded), len(complete))
+		self.assertEqual(recorded, written[:len(recorded)])
+
+
+class ReplayTest(RecordingTestCase):
+	def connect(self, mode):
+		return JoyCon(JOYCON_VENDOR_ID, JOYCON_L_PRODUCT_ID, "rec",
+		              backend=f"{mode}:{self.path}", threaded=False)
+
+	def replay_all(self, joycon):
+		replayed = []
+		joycon.register_update_hook(lambda joycon: replayed.append(bytes(joycon._input_report)))
+		with self.assertRaises(TimeoutError):  # the end of the recording
+			while True:
+				joycon._handle_input_report(joycon._read_input_report())
+		return replayed
+
+	def test_connect_replays_every_report(self):
+		recorded = reports(300)
+		self.record(recorded)
+		joycon = self.connect("replay-fast")
+		try:
+			self.assertIsNone(joycon.output_writer)
+			self.assertEqual(joycon.color_body, tuple(COLORS[:3]))
+			self.assertEqual(self.replay_all(joycon), recorded)
+		finally:
+			joycon._close()
+
+	def test_flash_reads(self):
+		self.record(reports(3))
+		device = ReplayDevice(self.path, realtime=False)
+		expected = FakeJoyConDevice()._flash_read(0x6050, 6)
+		for address, size, data in ((0x6050, 6, expected), (0x7000, 4, b"\xff" * 4)):
+			argument = address.to_bytes(4, "little") + bytes((size,))
+			device.write(b"\x01\x00" + bytes(8) + b"\x10" + argument)
+			reply = device.read(JoyCon._INPUT_REPORT_SIZE)
+			self.assertEqual(reply[0], 0x21)
+			self.assertEqual(reply[14], 0x10)
+			self.assertEqual(reply[15:20], argument)
+			self.assertEqual(reply[20:20 + size], data)
+		# the reports after the replies
+		self.assertEqual(device.read(JoyCon._INPUT_REPORT_SIZE), reports(1)[0])
+		device.close()
+
+	def test_connect_to_a_short_recording(self):
+		recorded = reports(3)
+		self.record(recorded)
+		joycon = self.connect("replay-fast")
+		try:
+			self.assertEqual(self.replay_all(joycon), recorded)
+		finally:
+			joycon._close()
+
+
+if __name__ == "__main__":
+	unittest.main()
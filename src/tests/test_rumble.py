@@ -0,0 +1,69 @@
+"""HD rumble encoding against the published amplitude and frequency tables"""
+
+import unittest
+
+from pyjoycon.rumble import (
+	RUMBLE_NEUTRAL, RumbleEncoder, encode_amplitude, encode_frequency, encode_rumble,
+)
+
+# amplitude: (high band amplitude byte, low band amplitude word), as listed in
+# dekuNukem/Nintendo_Switch_Reverse_Engineering rumble_data_table.md
+AMPLITUDE_TABLE = {
+	0.0: (0x00, 0x0040),
+	0.01: (0x02, 0x8040),
+	0.012: (0x04, 0x0041),
+	0.5: (0x88, 0x0062),
+	1.0: (0xC8, 0x0072),
+}
+
+
+def amplitudes(data):
+	"""(high band amplitude byte, low band amplitude word) of 4 bytes at 320 Hz / 160 Hz"""
+	return data[1] & 0xFE, ((data[2] & 0x80) << 8) | data[3]
+
+
+class EncodeTest(unittest.TestCase):
+	def test_frequency(self):
+		# 160 Hz low band and 320 Hz high band, the neutral frequencies
+		self.assertEqual(encode_frequency(160.0), 0x80)
+		self.assertEqual(encode_frequency(320.0), 0xA0)
+		self.assertEqual(encode_frequency(40.875), 0x41)
+		self.assertEqual(encode_frequency(1252.0), 0xDF)
+
+	def test_amplitude_table(self):
+		for amp, expected in AMPLITUDE_TABLE.items():
+			with self.subTest(amp=amp):
+				self.assertEqual(amplitudes(encode_rumble(320.0, 160.0, amp)), expected)
+
+	def test_amplitude_is_clamped(self):
+		self.assertEqual(encode_amplitude(2.0), encode_amplitude(1.0))
+		self.assertEqual(encode_amplitude(-1.0), 0)
+		self.assertEqual(encode_amplitude(0.005), 0)
+
+	def test_neutral(self):
+		self.assertEqual(encode_rumble(320.0, 160.0, 0.0), RUMBLE_NEUTRAL)
+		self.assertEqual(encode_rumble(320.0, 160.0, 1.0), b"\x00\xc9\x40\x72")
+
+	def test_frequency_is_clamped(self):
+		self.assertEqual(encode_rumble(5000.0, 1.0, 0.5), encode_rumble(1252.0, 40.875, 0.5))
+
+
+class RumbleEncoderTest(unittest.TestCase):
+	def test_encode(self):
+		encoder = RumbleEncoder()
+		self.assertEqual(encoder.encode(0.0), RUMBLE_NEUTRAL * 2)
+		self.assertEqual(encoder.encode(-1.0), RUMBLE_NEUTRAL * 2)
+		self.assertEqual(encoder.encode(1.0), b"\x00\xc9\x40\x72" * 2)
+		self.assertEqual(encoder.encode(2.0), encoder.encode(1.0))
+		self.assertEqual(encoder.encode(0.5), encode_rumble(320.0, 160.0, 0.5) * 2)
+
+	def test_table_rises(self):
+		encoder = RumbleEncoder(levels=64)
+		self.assertEqual(len(encoder.table), 64)
+		levels = [amplitudes(data)[0] for data in encoder.table]
+		self.assertEqual(levels, sorted(levels))
+		self.assertEqual(levels[-1], 0xC8)
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,103 @@
+"""RumbleMixer's combine rules, envelope and keepalive"""
+
+import unittest
+
+from rumblemix import RumbleMixer
+
+
+class CombineTest(unittest.TestCase):
+	def test_max(self):
+		mixer = RumbleMixer("max")
+		mixer.set("/a", 0.3)
+		mixer.set("/b", 0.6)
+		self.assertEqual(mixer.tick(0.0), 0.6)
+
+	def test_sum_is_capped(self):
+		mixer = RumbleMixer("sum")
+		mixer.set("/a", 0.3)
+		mixer.set("/b", 0.4)
+		self.assertAlmostEqual(mixer.tick(0.0), 0.7)
+		mixer.set("/c", 0.5)
+		self.assertEqual(mixer.tick(0.0), 1.0)
+
+	def test_priority(self):
+		mixer = RumbleMixer("priority", priorities=("/high", "/low"))
+		mixer.set("/unknown", 0.9)
+		self.assertEqual(mixer.tick(0.0), 0.9)
+		mixer.set("/low", 0.5)
+		self.assertEqual(mixer.tick(0.0), 0.5)
+		mixer.set("/high", 0.2)
+		self.assertEqual(mixer.tick(0.0), 0.2)
+		# the next active source takes over when one stops
+		mixer.set("/high", 0)
+		self.assertEqual(mixer.tick(0.0), 0.5)
+		mixer.set("/low", 0)
+		self.assertEqual(mixer.tick(0.0), 0.9)
+
+	def test_unknown_rule(self):
+		with self.assertRaises(ValueError):
+			RumbleMixer("min")
+
+	def test_set_reports_target_changes(self):
+		mixer = RumbleMixer("max")
+		self.assertTrue(mixer.set("/a", 0.5))
+		self.assertFalse(mixer.set("/b", 0.4))
+		self.assertFalse(mixer.set("/a", 0.5))
+		self.assertTrue(mixer.set("/a", 0))
+		self.assertEqual(mixer.sources, {"/b": 0.4})
+
+	def test_strength_is_clamped(self):
+		mixer = RumbleMixer("max")
+		mixer.set("/a", 3)
+		self.assertEqual(mixer.tick(0.0), 1.0)
+		mixer.set("/a", -1)
+		self.assertEqual(mixer.sources, {})
+		self.assertEqual(mixer.tick(0.0), 0.0)
+
+
+class EnvelopeTest(unittest.TestCase):
+	def test_attack_and_decay(self):
+		mixer = RumbleMixer("max", attack=0.2, decay=0.4)
+		mixer.set("/a", 1.0)
+		mixer._last_tick = 0.0  # set() started the envelope now
+		self.assertAlmostEqual(mixer.tick(0.1), 0.5)
+		self.assertTrue(mixer.moving)
+		self.assertEqual(mixer.tick(0.3), 1.0)
+		self.assertFalse(mixer.moving)
+
+		# the source stops, the output decays to 0 and rests
+		mixer.set("/a", 0)
+		mixer._last_tick = 1.0
+		self.assertAlmostEqual(mixer.tick(1.1), 0.75)
+		self.assertEqual(mixer.tick(2.0), 0.0)
+		self.assertFalse(mixer.moving)
+
+	def test_immediate(self):
+		mixer = RumbleMixer("max")
+		mixer.set("/a", 0.7)
+		self.assertEqual(mixer.tick(0.0), 0.7)
+		mixer.set("/a", 0)
+		self.assertEqual(mixer.tick(0.0), 0.0)
+
+
+class KeepaliveTest(unittest.TestCase):
+	def test_resend_while_rumbling(self):
+		mixer = RumbleMixer("max", keepalive=0.35)
+		mixer.tick(0.0)
+		self.assertFalse(mixer.keepalive_due(0.0))  # nothing to keep alive
+
+		mixer.set("/a", 0.5)
+		mixer.tick(1.0)
+		self.assertTrue(mixer.keepalive_due(1.0))  # never written
+		mixer.written(1.0)
+		self.assertFalse(mixer.keepalive_due(1.2))
+		self.assertTrue(mixer.keepalive_due(1.35))
+		mixer.written(1.35)
+
+		mixer.set("/a", 0)
+		mixer.tick(2.0)
+		self.assertFalse(mixer.keepalive_due(2.0))
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,120 @@
+"""Latency tracing: histograms of how long each stage of the input and rumble paths takes"""
+
+import threading
+
+# linear up to 2 * SUB_BUCKETS us, then SUB_BUCKETS buckets per power of two (~3%)
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 1 << (SUB_BUCKET_BITS - 1)
+# up to ~17 minutes
+MAX_SHIFT = 26
+
+# the stages in the order they happen, for printing
+INPUT_STAGES = ("hook", "map", "queue", "send", "report to socket")
+RUMBLE_STAGES = ("osc to worker", "hid write", "osc to hid")
+
+
+class LatencyHistogram:
+	"""
+	HDR style histogram of microseconds: exact below 32 us, above that the
+	bucket width grows with the value so every bucket is within ~3%.
+	Recording is one index computation and one increment.
+	"""
+
+	def __init__(self):
+		self.counts = [0] * ((MAX_SHIFT + 2) * SUB_BUCKETS)
+		self.total = 0
+		self.max = 0
+
+	def record(self, seconds):
+		us = int(seconds * 1e6)
+		if us > self.max:
+			self.max = us
+		if us < 2 * SUB_BUCKETS:
+			index = us if us > 0 else 0
+		else:
+			shift = us.bit_length() - SUB_BUCKET_BITS
+			if shift > MAX_SHIFT:
+				shift, us = MAX_SHIFT, (2 << (MAX_SHIFT + SUB_BUCKET_BITS - 1)) - 1
+			index = (shift << (SUB_BUCKET_BITS - 1)) + (us >> shift)
+		self.counts[index] += 1
+		self.total += 1
+
+	@staticmethod
+	def bucket_range(index):
+		"""lowest and highest microseconds of a bucket"""
+		if index < 2 * SUB_BUCKETS:
+			return index, index
+		shift = index // SUB_BUCKETS - 1
+		low = (index % SUB_BUCKETS + SUB_BUCKETS) << shift
+		return low, low + (1 << shift) - 1
+
+	def percentile(self, fraction):
+		"""microseconds, the upper end of the bucket the percentile falls in"""
+		if not self.total:
+			return 0
+		wanted = max(1, round(self.total * fraction))
+		seen = 0
+		for index, count in enumerate(self.counts):
+			seen += count
+			if seen >= wanted:
+				return min(self.bucket_range(index)[1], self.max)
+		return self.max
+
+	def buckets(self):
+		"""(low us, high us, count) of the buckets which are not empty"""
+		return [(*self.bucket_range(index), count) for index, count in enumerate(self.counts) if count]
+
+
+class LatencyTracer:
+	"""
+	One LatencyHistogram per controller and stage. record() is called from
+	controller threads, the OSC sender thread, the writer threads and the
+	event loop; a lost increment between two threads only skews a count,
+	creating a histogram takes a lock.
+	"""
+
+	def __init__(self):
+		self.histograms = {}  # (controller id, stage): LatencyHistogram
+		self._lock = threading.Lock()
+
+	def histogram(self, id, stage) -> LatencyHistogram:
+		histogram = self.histograms.get((id, stage))
+		if histogram is None:
+			with self._lock:
+				histogram = self.histograms.setdefault((id, stage), LatencyHistogram())
+		return histogram
+
+	def record(self, id, stage, seconds):
+		self.histogram(id, stage).record(seconds)
+
+	def batch_sent(self, trace, picked, sent):
+		"""OscOutputStage.on_sent: `trace` is (id, report arrival, put)"""
+		id, arrival, put = trace
+		self.record(id, "queue", picked - put)
+		self.record(id, "send", sent - picked)
+		self.record(id, "report to socket", sent - arrival)
+
+	def reset(self):
+		with self._lock:
+			self.histograms = {}
+
+	def _sorted(self):
+		order = {stage: i for i, stage in enumerate(INPUT_STAGES + RUMBLE_STAGES)}
+		return sorted(self.histograms.items(), key=lambda item: (str(item[0][0]), order.get(item[0][1], len(order))))
+
+	def summary(self) -> str:
+		lines = [f"{'controller':>10} {'stage':18} {'count':>8} {'p50 us':>8} {'p90 us':>8} {'p99 us':>8} {'max us':>8}"]
+		for (id, stage), histogram in self._sorted():
+			lines.append(
+				f"{str(id):>10} {stage:18} {histogram.total:8} {histogram.percentile(0.5):8}"
+				f" {histogram.percentile(0.9):8} {histogram.percentile(0.99):8} {histogram.max:8}")
+		return "\n".join(lines)
+
+	def dump(self) -> str:
+		"""the summary and every non-empty bucket"""
+		lines = [self.summary()]
+		for (id, stage), histogram in self._sorted():
+			lines.append(f"{id} {stage}:")
+			for low, high, count in histogram.buckets():
+				lines.append(f"  {low:>9}-{high:<9} us {count:8}")
+		return "\n".join(lines)